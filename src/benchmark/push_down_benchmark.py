@@ -0,0 +1,81 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import argparse
+import time
+from typing import List
+
+from postbound.qal.base import TableReference, ColumnReference
+from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression
+from postbound.qal.predicates import as_predicate
+from postbound.qal.relalg import RelNode, Relation, Selection, ThetaJoin, Projection, Rename
+
+from src.optimizer.dependent_join import DependentJoin
+from src.optimizer.push_down_manager import PushDownManager
+from src.utils.utils import Utils
+
+
+def build_dependent_tree(operator_count: int) -> RelNode:
+    """
+    Builds a tree with a single dependent join whose dependent side consists of `operator_count` operators
+    (alternating selections and joins). The free variable is located at the bottom, so the dependent join has to be
+    pushed through all operators.
+    """
+    tab_t1 = TableReference("outer_table", "t1")
+    col_t1_id = ColumnReference("id", tab_t1)
+    outer_relation = Relation(tab_t1, [col_t1_id])
+
+    tab_d = Utils.create_domain_table()
+    col_d_id = ColumnReference("id", tab_d)
+    domain = Projection(Rename(outer_relation.mutate(as_root=True), {col_t1_id: col_d_id}),
+                        [ColumnExpression(col_d_id)])
+
+    tab_base = TableReference("table_0", "r0")
+    col_base_id = ColumnReference("id", tab_base)
+    dependent_node = Selection(Relation(tab_base, [col_base_id]),
+                               as_predicate(col_d_id, LogicalSqlOperators.Equal, col_base_id))
+
+    for index in range(1, operator_count):
+        tab = TableReference(f"table_{index}", f"r{index}")
+        col_id = ColumnReference("id", tab)
+        if index % 2:
+            dependent_node = ThetaJoin(dependent_node, Relation(tab, [col_id]),
+                                       as_predicate(col_base_id, LogicalSqlOperators.Equal, col_id))
+        else:
+            dependent_node = Selection(dependent_node, as_predicate(col_base_id, LogicalSqlOperators.Greater, index))
+
+    dependent_join = DependentJoin(domain, dependent_node)
+    join = ThetaJoin(outer_relation, dependent_join, as_predicate(col_d_id, LogicalSqlOperators.Equal, col_t1_id))
+    return Projection(join, [ColumnExpression(col_t1_id)])
+
+
+def measure_push_down(operator_counts: List[int], repetitions: int) -> List[tuple]:
+    push_down_manager = PushDownManager(Utils())
+    results = []
+
+    for operator_count in operator_counts:
+        execution_times = []
+        for _ in range(repetitions):
+            tree = build_dependent_tree(operator_count)
+            start_time = time.perf_counter()
+            push_down_manager.push_down(tree)
+            execution_times.append(time.perf_counter() - start_time)
+
+        best_time = min(execution_times)
+        results.append((operator_count, best_time, best_time / operator_count))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure the push-down time for growing dependent join trees.')
+    parser.add_argument('--operators', type=int, nargs='+', default=[10, 25, 50, 100, 150, 200])
+    parser.add_argument('--repetitions', type=int, default=5)
+
+    args = parser.parse_args()
+
+    print(f"{'Operators':>10} {'Push-down [ms]':>15} {'Per operator [µs]':>18}")
+    for operator_count, total_time, time_per_operator in measure_push_down(args.operators, args.repetitions):
+        print(f"{operator_count:>10} {total_time * 1000:>15.3f} {time_per_operator * 1e6:>18.3f}")
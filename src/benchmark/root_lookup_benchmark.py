@@ -0,0 +1,117 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import argparse
+import time
+from collections import deque
+from typing import List
+
+from postbound.qal.base import TableReference, ColumnReference
+from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression
+from postbound.qal.predicates import as_predicate
+from postbound.qal.relalg import RelNode, Relation, Selection, ThetaJoin, Projection, Rename
+
+from src.optimizer.dependent_join import DependentJoin
+from src.optimizer.push_down_manager import PushDownManager
+from src.query_generator.query_generator import QueryGenerator
+from src.utils.utils import Utils
+
+
+def build_job_sized_tree(subquery_count: int, relation_count: int) -> RelNode:
+    """
+    Builds a tree similar to the unnested JOB queries: an outer query joining `relation_count` relations and
+    `subquery_count` dependent joins, each of them over a subquery with `relation_count` relations.
+    """
+    outer_node = None
+    outer_columns = []
+    for index in range(relation_count):
+        tab = TableReference(f"outer_{index}", f"o{index}")
+        col_id = ColumnReference("id", tab)
+        relation = Relation(tab, [col_id])
+        outer_node = relation if outer_node is None else ThetaJoin(
+            outer_node, relation, as_predicate(outer_columns[0], LogicalSqlOperators.Equal, col_id))
+        outer_columns.append(col_id)
+
+    col_t1_id = outer_columns[0]
+    tab_d = Utils.create_domain_table()
+    col_d_id = ColumnReference("id", tab_d)
+
+    node = outer_node
+    for subquery_index in range(subquery_count):
+        domain = Projection(Rename(outer_node.mutate(as_root=True), {col_t1_id: col_d_id}),
+                            [ColumnExpression(col_d_id)])
+
+        dependent_node = None
+        for index in range(relation_count):
+            tab = TableReference(f"inner_{index}", f"s{subquery_index}_{index}")
+            col_id = ColumnReference("id", tab)
+            relation = Relation(tab, [col_id])
+            dependent_node = relation if dependent_node is None else ThetaJoin(
+                dependent_node, relation, as_predicate(col_d_id, LogicalSqlOperators.Equal, col_id))
+        dependent_node = Selection(dependent_node,
+                                   as_predicate(col_d_id, LogicalSqlOperators.Greater, subquery_index))
+
+        node = ThetaJoin(node, DependentJoin(domain, dependent_node),
+                         as_predicate(col_d_id, LogicalSqlOperators.Equal, col_t1_id))
+
+    return Projection(node, [ColumnExpression(col_t1_id)])
+
+
+def find_subquery_roots_by_string(node: RelNode, subquery_root_nodes: List[RelNode]) -> List[RelNode]:
+    """
+    The previous lookup of the subquery roots, comparing the string representation of every node.
+    """
+    found_nodes = []
+    for subquery_root_node in subquery_root_nodes:
+        queue = deque([node])
+        while queue:
+            current = queue.popleft()
+            if str(current) == str(subquery_root_node) and not any(current is n for n in found_nodes):
+                found_nodes.append(current)
+                break
+            queue.extend(current.children())
+    return found_nodes
+
+
+def measure_lookup(subquery_counts: List[int], relation_counts: List[int], repetitions: int) -> List[tuple]:
+    results = []
+
+    for subquery_count in subquery_counts:
+        for relation_count in relation_counts:
+            utils = Utils()
+            root, subquery_roots = PushDownManager(utils).push_down(
+                build_job_sized_tree(subquery_count, relation_count))
+            query_generator = QueryGenerator(utils)
+
+            string_times = []
+            provenance_times = []
+            for _ in range(repetitions):
+                start_time = time.perf_counter()
+                find_subquery_roots_by_string(root, subquery_roots)
+                string_times.append(time.perf_counter() - start_time)
+
+                start_time = time.perf_counter()
+                query_generator._find_subquery_root_nodes(root, subquery_roots)
+                provenance_times.append(time.perf_counter() - start_time)
+
+            results.append((subquery_count, relation_count, min(string_times), min(provenance_times)))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the lookup of subquery roots by string and by provenance.')
+    parser.add_argument('--subqueries', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--relations', type=int, nargs='+', default=[5, 10, 17])
+    parser.add_argument('--repetitions', type=int, default=5)
+
+    args = parser.parse_args()
+
+    print(f"{'Subqueries':>10} {'Relations':>10} {'str() [ms]':>12} {'Provenance [ms]':>16} {'Speedup':>8}")
+    for subquery_count, relation_count, string_time, provenance_time in measure_lookup(args.subqueries,
+                                                                                      args.relations,
+                                                                                      args.repetitions):
+        print(f"{subquery_count:>10} {relation_count:>10} {string_time * 1000:>12.3f} {provenance_time * 1000:>16.3f} "
+              f"{string_time / provenance_time:>8.1f}")
@@ -0,0 +1,92 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from src.execution.timeout import QueryTimeout, TimeoutGuard
+
+class Measurement(NamedTuple):
+    result: Any
+    """Result of the last timed execution."""
+
+    times: List[float]
+    """Client-side execution times in seconds (perf_counter), without the warmup runs."""
+
+    server_times: Optional[List[float]]
+    """Planning and execution times in seconds reported by EXPLAIN ANALYZE, None if not measured."""
+
+    timeouts: int = 0
+    """Number of timed executions that exceeded the timeout. Their time is the timeout, i.e. a lower bound."""
+
+    @property
+    def censored(self) -> bool:
+        """Whether the median time is only a lower bound, i.e. at least half of the executions timed out."""
+        return 2 * self.timeouts >= len(self.times) > 0
+
+
+class BenchmarkHarness:
+    """
+    Executes a query `warmup` times without measuring it and then `repetitions` times, measuring each execution with
+    perf_counter. The client-side times include the transfer of the result. With a `server_timing` function (e.g.
+    EXPLAIN ANALYZE), the query is additionally executed `repetitions` times to obtain the server-side times.
+
+    With a timeout guard, an execution exceeding the timeout is recorded with the timeout as (censored) time. If
+    `stop_on_timeout` is set, the query is not executed again after its first timeout.
+    """
+
+    def __init__(self, *, warmup: int = 0, repetitions: int = 1,
+                 server_timing: Optional[Callable[[str], float]] = None, timeout_guard: Optional[TimeoutGuard] = None,
+                 stop_on_timeout: bool = False):
+        if warmup < 0 or repetitions < 1:
+            raise ValueError("At least one repetition and no negative number of warmup runs are required")
+        self.warmup = warmup
+        self.repetitions = repetitions
+        self.server_timing = server_timing
+        self.timeout_guard = timeout_guard
+        self.stop_on_timeout = stop_on_timeout
+
+    def measure(self, execute: Callable[[], Any], query: Optional[str] = None) -> Measurement:
+        """
+        :param execute: Executes the query and returns its result.
+        :param query: SQL text for the server-side timing, which is skipped if no query is given.
+        """
+        execute = self._guarded(execute)
+
+        for _ in range(self.warmup):
+            try:
+                execute()
+            except QueryTimeout as e:
+                if self.stop_on_timeout:
+                    return Measurement(None, [e.timeout], None, 1)
+
+        result = None
+        times = []
+        timeouts = 0
+        for _ in range(self.repetitions):
+            start_time = time.perf_counter()
+            try:
+                result = execute()
+            except QueryTimeout as e:
+                times.append(e.timeout)
+                timeouts += 1
+                if self.stop_on_timeout:
+                    break
+                continue
+            times.append(time.perf_counter() - start_time)
+
+        # Abgebrochene Anfragen liefern keine Serverzeit
+        server_times = None
+        if self.server_timing is not None and query is not None and timeouts == 0:
+            try:
+                server_times = [self._guarded(lambda: self.server_timing(query))() for _ in range(self.repetitions)]
+            except QueryTimeout:
+                server_times = None
+        return Measurement(result, times, server_times, timeouts)
+
+    def _guarded(self, execute: Callable[[], Any]) -> Callable[[], Any]:
+        if self.timeout_guard is None:
+            return execute
+        return lambda: self.timeout_guard.run(execute)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+from typing import Any, Callable, NamedTuple, Optional, TYPE_CHECKING
+
+from postbound.qal import clauses, qal
+
+if TYPE_CHECKING:
+    from postbound.db import postgres
+
+
+class StagedExecution(NamedTuple):
+    result: Any
+    staging_time: float
+    query_time: float
+
+
+class DomainStaging:
+    """
+    Materializes the dup_elim_outerquery CTEs of a rewritten query into session temp tables before the query is
+    executed. Unlike the CTE, the temp table has an index on the correlation columns and statistics (ANALYZE), so that
+    PostgreSQL can estimate the join of the domain with the subquery.
+
+    The staged CTEs are removed from the WITH clause, their references (e.g. "dup_elim_outerquery AS d") then resolve to
+    the temp table of the same name.
+    """
+
+    def __init__(self, postgres_interface: postgres.PostgresInterface):
+        self.postgres_interface = postgres_interface
+        self.staged_tables = []
+
+    def execute(self, query: qal.SqlQuery | str,
+                execute: Optional[Callable[[str], Any]] = None) -> StagedExecution:
+        """
+        Stages the domains of the given query, executes it and drops the temp tables again. Queries without a
+        dup_elim_outerquery CTE (e.g. rewritten as SQL text) are executed unchanged.
+
+        :param execute: Executes the staged query, by default the execute_query method of the PostgresInterface.
+        """
+        execute = execute if execute is not None else self.postgres_interface.execute_query
+        # Auch bei einem Fehler während der Bereitstellung werden die bereits angelegten Tabellen entfernt
+        try:
+            start_time = time.perf_counter()
+            staged_query = self.stage(query)
+            staging_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            result = execute(str(staged_query))
+            query_time = time.perf_counter() - start_time
+        finally:
+            self.cleanup()
+
+        return StagedExecution(result, staging_time, query_time)
+
+    def stage(self, query: qal.SqlQuery | str) -> qal.SqlQuery | str:
+        """
+        Creates the temp tables for all dup_elim_outerquery CTEs and returns the query without these CTEs.
+        """
+        if not isinstance(query, qal.SqlQuery) or query.cte_clause is None:
+            return query
+
+        cte_queries = []
+        for cte_query in query.cte_clause.queries:
+            if cte_query.target_name.startswith("dup_elim_outerquery"):
+                # Vorherige, nicht bereitgestellte CTEs (z.B. outerquery) werden für die temporäre Tabelle benötigt
+                self._create_temp_table(cte_query, list(cte_queries))
+            else:
+                cte_queries.append(cte_query)
+
+        if not self.staged_tables:
+            return query
+
+        cte_clause = clauses.CommonTableExpression(cte_queries) if cte_queries else None
+        return qal.SqlQuery(cte_clause=cte_clause, select_clause=query.select_clause, from_clause=query.from_clause,
+                            where_clause=query.where_clause, groupby_clause=query.groupby_clause)
+
+    def cleanup(self) -> None:
+        cursor = self.postgres_interface.cursor()
+        for table_name in self.staged_tables:
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
+        self.staged_tables = []
+
+    def _create_temp_table(self, cte_query: clauses.WithQuery, previous_cte_queries: list[clauses.WithQuery]) -> None:
+        table_name = cte_query.target_name
+        domain_query = cte_query.query
+        if previous_cte_queries:
+            domain_query = qal.SqlQuery(cte_clause=clauses.CommonTableExpression(previous_cte_queries),
+                                        select_clause=domain_query.select_clause,
+                                        from_clause=domain_query.from_clause, where_clause=domain_query.where_clause)
+        column_names = [target.target_name or target.expression.column.name
+                        for target in cte_query.query.select_clause.targets]
+
+        cursor = self.postgres_interface.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
+        cursor.execute(f"CREATE TEMPORARY TABLE {table_name} AS {str(domain_query).rstrip().rstrip(';')};")
+        self.staged_tables.append(table_name)
+        cursor.execute(f"CREATE INDEX ON {table_name} ({', '.join(column_names)});")
+        cursor.execute(f"ANALYZE {table_name};")
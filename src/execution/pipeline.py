@@ -0,0 +1,56 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, NamedTuple, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class PipelineItem(NamedTuple):
+    task: object
+    result: object
+    wait_time: float
+    """Time the consumer was blocked waiting for the result, i.e. the producer fell behind."""
+
+
+def default_workers() -> int:
+    # Ein Kern bleibt für den Datenbankserver frei, damit die Messungen nicht mit dem Umschreiben konkurrieren
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def pipelined(tasks: Iterable[T], produce: Callable[[T], R], *, workers: Optional[int] = None,
+              depth: int = 4) -> Iterator[PipelineItem]:
+    """
+    Runs `produce` for the given tasks on a pool of worker processes and yields the results in the order of the tasks,
+    while the consumer works on the previous result. At most `depth` tasks are submitted ahead of the consumer (bounded
+    queue), so the producer neither runs arbitrarily far ahead nor keeps all results in memory.
+
+    `produce` must be picklable, i.e. a function at module level. An exception of `produce` is raised when the
+    consumer reaches its task.
+    """
+    if depth < 1:
+        raise ValueError("The depth of the pipeline must be positive")
+
+    task_iterator = iter(tasks)
+    pending: Deque[Tuple[T, Future]] = deque()
+
+    with ProcessPoolExecutor(max_workers=workers or default_workers()) as executor:
+        def submit_next() -> None:
+            for task in task_iterator:
+                pending.append((task, executor.submit(produce, task)))
+                return
+
+        for _ in range(depth):
+            submit_next()
+
+        while pending:
+            task, future = pending.popleft()
+            start_time = time.perf_counter()
+            result = future.result()
+            wait_time = time.perf_counter() - start_time
+
+            # Den frei gewordenen Platz sofort belegen, damit der nächste Auftrag während des Verbrauchs läuft
+            submit_next()
+            yield PipelineItem(task, result, wait_time)
@@ -0,0 +1,132 @@
+import contextlib
+import datetime
+import decimal
+import hashlib
+from typing import Any, Callable, Iterable, NamedTuple, Optional
+
+# Die Zeilen werden als Multimenge verglichen: Summe der Zeilen-Hashes modulo 2^128, unabhängig von der Reihenfolge
+DIGEST_MODULUS = 2 ** 128
+SERVER_DIGEST_MODULUS = 2 ** 64
+
+# Digest in der Datenbank: Summe der ersten 64 Bit des MD5-Hashes jeder Zeile. Wie bei canonical_value werden Zahlen
+# unabhängig vom Typ dargestellt (1, 1.0 und 1.00::numeric sind gleich), dazu wird jede Spalte über JSON (in der
+# Reihenfolge der Spalten) normalisiert. trim_scale() setzt PostgreSQL 13 voraus
+SERVER_DIGEST_QUERY = """
+SELECT count(*), coalesce(sum(('x' || substr(md5(row_text), 1, 16))::bit(64)::bigint::numeric), 0)
+FROM (SELECT (SELECT string_agg(CASE json_typeof(field.value)
+                                    WHEN 'number' THEN trim_scale(field.value::text::numeric)::text
+                                    WHEN 'null' THEN 'NULL'
+                                    ELSE field.value::text END, E'\\x1f' ORDER BY field.position)
+              FROM json_each(to_json(result_row)) WITH ORDINALITY AS field(key, value, position)) AS row_text
+      FROM ({query}) AS result_row) AS normalized_rows
+"""
+
+
+class ResultDigest(NamedTuple):
+    rows: int
+    digest: Optional[str]
+    """Order-insensitive digest of the rows, None if the rows have only been counted."""
+
+
+def canonical_value(value: Any) -> str:
+    """
+    Renders a value independent of its type where the rewrite may change the type, e.g. numbers (1, 1.0 and
+    Decimal("1.00") are equal) and timestamps.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float, decimal.Decimal)):
+        number = decimal.Decimal(str(value)) if isinstance(value, float) else decimal.Decimal(value)
+        if not number.is_finite():
+            return str(number)
+        number = number.normalize()
+        return f"{number:f}" if number != 0 else "0"
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return repr(value)
+
+
+def row_hash(row: Iterable[Any]) -> int:
+    text = "\x1f".join(canonical_value(value) for value in row)
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=16).digest(), "big")
+
+
+def digest_rows(rows: Iterable[Iterable[Any]]) -> ResultDigest:
+    """
+    Computes the order-insensitive digest of the given rows. Duplicate rows are counted, i.e. the digest identifies
+    the multiset of rows (up to hash collisions).
+    """
+    count = 0
+    total = 0
+    for row in rows:
+        count += 1
+        total = (total + row_hash(row)) % DIGEST_MODULUS
+    return ResultDigest(count, f"{total:032x}")
+
+
+class StreamingResultVerifier:
+    """
+    Executes queries through a server-side cursor (DECLARE ... CURSOR) and fetches the result in chunks of
+    `chunk_size` rows, so that the client never holds more than one chunk in memory. By default the digest of the rows
+    is computed while streaming. With `server_side_digest`, the rows are only counted while streaming and the digest
+    is computed by the database in a separate execution (`digest`), without transferring the rows. Both digests
+    compare numbers by value, but they are not comparable with each other.
+    """
+
+    def __init__(self, cursor: Callable[[], Any], *, chunk_size: int = 10_000, server_side_digest: bool = False):
+        """
+        :param cursor: Returns a DB-API cursor of the connection, e.g. PostgresInterface.cursor.
+        """
+        if chunk_size < 1:
+            raise ValueError("The chunk size must be positive")
+        self.cursor = cursor
+        self.chunk_size = chunk_size
+        self.server_side_digest = server_side_digest
+
+    def execute(self, query: str) -> ResultDigest:
+        query = query.strip().rstrip(";")
+        if self.server_side_digest:
+            count = sum(len(chunk) for chunk in self._stream(query))
+            return ResultDigest(count, None)
+        return digest_rows(row for chunk in self._stream(query) for row in chunk)
+
+    def digest(self, query: str, result: ResultDigest) -> ResultDigest:
+        """
+        Returns the given result if it already has a digest, otherwise the digest computed by the database.
+        """
+        if result.digest is not None:
+            return result
+        cursor = self.cursor()
+        cursor.execute(SERVER_DIGEST_QUERY.format(query=query.strip().rstrip(";")))
+        count, total = cursor.fetchone()
+        return ResultDigest(count, f"{int(total) % SERVER_DIGEST_MODULUS:016x}")
+
+    def _stream(self, query: str) -> Iterable[list]:
+        cursor = self.cursor()
+        if query[:7].upper() != "EXECUTE":
+            # Ein Cursor ohne WITH HOLD existiert nur innerhalb der Transaktion, die Zeilen werden nicht vorab erzeugt
+            cursor.execute("BEGIN;")
+            try:
+                cursor.execute(f"DECLARE result_stream NO SCROLL CURSOR FOR {query};")
+                while True:
+                    cursor.execute(f"FETCH FORWARD {self.chunk_size} FROM result_stream;")
+                    chunk = cursor.fetchall()
+                    if not chunk:
+                        break
+                    yield chunk
+                cursor.execute("CLOSE result_stream;")
+                cursor.execute("COMMIT;")
+            except BaseException:
+                with contextlib.suppress(Exception):
+                    cursor.execute("ROLLBACK;")
+                raise
+        else:
+            # Prepared Statements lassen sich nicht als Cursor deklarieren, das Ergebnis wird blockweise gelesen
+            cursor.execute(query)
+            while True:
+                chunk = cursor.fetchmany(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
@@ -0,0 +1,93 @@
+import math
+import random
+import statistics
+from typing import NamedTuple, Sequence
+
+# Quantile der t-Verteilung für zweiseitige 95%-Intervalle nach Freiheitsgraden, darüber Normalverteilung
+T_QUANTILES_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+                  10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101,
+                  19: 2.093, 20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980}
+Z_QUANTILE_95 = 1.960
+
+
+class TimingSummary(NamedTuple):
+    samples: int
+    median: float
+    mean: float
+    stddev: float
+    p95: float
+    ci_low: float
+    ci_high: float
+    """Bounds of the 95% confidence interval of the mean."""
+
+
+class SpeedupEstimate(NamedTuple):
+    speedup: float
+    """Median time of the original query divided by the median time of the rewritten query."""
+
+    ci_low: float
+    ci_high: float
+    """Bounds of the 95% bootstrap confidence interval of the speedup."""
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """
+    Returns the p-th percentile of the values with linear interpolation between the closest ranks.
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def t_quantile_95(degrees_of_freedom: int) -> float:
+    # Nächstkleinerer Tabelleneintrag, damit das Intervall eher zu breit als zu schmal ist
+    for tabulated in sorted(T_QUANTILES_95, reverse=True):
+        if degrees_of_freedom >= tabulated:
+            return T_QUANTILES_95[tabulated] if degrees_of_freedom <= 120 else Z_QUANTILE_95
+    return math.nan
+
+
+def summarize(samples: Sequence[float]) -> TimingSummary:
+    """
+    Summarizes the given execution times. Stddev and confidence interval need at least two samples and are NaN
+    otherwise.
+    """
+    if not samples:
+        return TimingSummary(0, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan)
+
+    mean = statistics.fmean(samples)
+    if len(samples) < 2:
+        return TimingSummary(1, samples[0], mean, math.nan, samples[0], math.nan, math.nan)
+
+    stddev = statistics.stdev(samples)
+    half_width = t_quantile_95(len(samples) - 1) * stddev / math.sqrt(len(samples))
+    return TimingSummary(len(samples), statistics.median(samples), mean, stddev, percentile(samples, 95),
+                         mean - half_width, mean + half_width)
+
+
+def estimate_speedup(original_samples: Sequence[float], rewritten_samples: Sequence[float], *,
+                     resamples: int = 1000, seed: int = 0) -> SpeedupEstimate:
+    """
+    Estimates the speedup of the rewritten query as ratio of the median times. The confidence interval is obtained by
+    resampling both sets of times with replacement (percentile bootstrap), which needs no assumption on the
+    distribution of the times.
+    """
+    if not original_samples or not rewritten_samples or statistics.median(rewritten_samples) <= 0:
+        return SpeedupEstimate(math.nan, math.nan, math.nan)
+
+    speedup = statistics.median(original_samples) / statistics.median(rewritten_samples)
+    if len(original_samples) < 2 and len(rewritten_samples) < 2:
+        return SpeedupEstimate(speedup, math.nan, math.nan)
+
+    generator = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        original_median = statistics.median(generator.choices(original_samples, k=len(original_samples)))
+        rewritten_median = statistics.median(generator.choices(rewritten_samples, k=len(rewritten_samples)))
+        if rewritten_median > 0:
+            ratios.append(original_median / rewritten_median)
+    return SpeedupEstimate(speedup, percentile(ratios, 2.5), percentile(ratios, 97.5))
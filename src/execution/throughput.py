@@ -0,0 +1,147 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import contextlib
+import math
+import random
+import statistics
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional, Sequence, Tuple
+
+from src.execution.stats import percentile
+
+# Perzentile der Latenz, die für jeden Lauf berichtet werden
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+
+
+class ThroughputResult(NamedTuple):
+    variant: str
+    """Name of the query mix, e.g. "original" or "rewritten"."""
+
+    connections: int
+    executed: int
+    errors: int
+    elapsed: float
+    """Wall-clock time from the common start of all connections until the last one has finished."""
+
+    queries_per_second: float
+    mean_latency: float
+    latency_percentiles: dict[int, float]
+    mean_latency_by_query: dict[str, float]
+
+
+class ContentionReport(NamedTuple):
+    slowdown: float
+    """Mean latency with N connections relative to the mean latency with a single connection."""
+
+    scaling_efficiency: float
+    """Throughput with N connections relative to N times the throughput of a single connection."""
+
+
+def contention_report(baseline: ThroughputResult, result: ThroughputResult) -> ContentionReport:
+    # Ohne Konkurrenz um Sperren, Puffer und CPU wären die Latenzen gleich und der Durchsatz wüchse linear
+    slowdown = result.mean_latency / baseline.mean_latency if baseline.mean_latency else math.nan
+    ideal_throughput = baseline.queries_per_second * result.connections / baseline.connections
+    scaling_efficiency = result.queries_per_second / ideal_throughput if ideal_throughput else math.nan
+    return ContentionReport(slowdown, scaling_efficiency)
+
+
+class ThroughputBenchmark:
+    """
+    Runs a query mix concurrently over a pool of connections, one thread per connection. Each connection executes all
+    queries of the mix `rounds` times in its own random order, so that the connections do not run the same query at
+    the same time. All connections start together after they have been opened.
+
+    The connections are created by `connect`, which returns a DB-API connection (or any object with a `cursor()`
+    method, e.g. a PostgresInterface). A local database such as SQLite can therefore stand in for PostgreSQL.
+    """
+
+    def __init__(self, connect: Callable[[], Any], *, connections: int = 4, rounds: int = 1, seed: int = 0):
+        if connections < 1:
+            raise ValueError("The pool needs at least one connection")
+        if rounds < 1:
+            raise ValueError("The query mix must be executed at least once")
+        self.connect = connect
+        self.connections = connections
+        self.rounds = rounds
+        self.seed = seed
+
+    def run(self, variant: str, queries: Sequence[Tuple[str, str]],
+            connections: Optional[int] = None) -> ThroughputResult:
+        """
+        Executes the given (name, query) mix on all connections and measures the latency of each execution, including
+        fetching the result.
+        """
+        connections = connections or self.connections
+        latencies = [[] for _ in range(connections)]
+        errors = [0] * connections
+        start_barrier = threading.Barrier(connections + 1)
+        failures = []
+
+        def worker(index: int) -> None:
+            try:
+                connection = self.connect()
+            except Exception as e:
+                failures.append(e)
+                start_barrier.abort()
+                return
+
+            try:
+                cursor = connection.cursor()
+                order = [query for _ in range(self.rounds) for query in queries]
+                random.Random(self.seed + index).shuffle(order)
+                start_barrier.wait()
+
+                for query_name, query in order:
+                    start_time = time.perf_counter()
+                    try:
+                        cursor.execute(query)
+                        cursor.fetchall()
+                    except Exception:
+                        errors[index] += 1
+                        with contextlib.suppress(Exception):
+                            connection.rollback()
+                        continue
+                    latencies[index].append((query_name, time.perf_counter() - start_time))
+            except threading.BrokenBarrierError:
+                return
+            except Exception as e:
+                # Ohne Abbruch der Barriere würde run() auf diese Verbindung warten
+                failures.append(e)
+                start_barrier.abort()
+            finally:
+                close = getattr(connection, "close", None)
+                if close is not None:
+                    with contextlib.suppress(Exception):
+                        close()
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(connections)]
+        for thread in threads:
+            thread.start()
+        try:
+            start_barrier.wait()
+        except threading.BrokenBarrierError:
+            for thread in threads:
+                thread.join()
+            raise RuntimeError(f"Could not open {connections} connections") from (failures[0] if failures else None)
+
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+
+        measurements = [measurement for connection_latencies in latencies for measurement in connection_latencies]
+        values = [latency for _, latency in measurements]
+        by_query = {}
+        for query_name, latency in measurements:
+            by_query.setdefault(query_name, []).append(latency)
+
+        return ThroughputResult(variant, connections, len(values), sum(errors), elapsed,
+                                len(values) / elapsed if elapsed > 0 else math.nan,
+                                statistics.fmean(values) if values else math.nan,
+                                {p: percentile(values, p) for p in LATENCY_PERCENTILES},
+                                {query_name: statistics.fmean(query_latencies)
+                                 for query_name, query_latencies in sorted(by_query.items())})
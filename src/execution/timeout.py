@@ -0,0 +1,72 @@
+import threading
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# SQLSTATE von PostgreSQL für abgebrochene Anweisungen (statement_timeout und pg_cancel_backend)
+QUERY_CANCELED_SQLSTATE = "57014"
+
+
+class QueryTimeout(Exception):
+    def __init__(self, timeout: float):
+        super().__init__(f"Query exceeded the timeout of {timeout}s")
+        self.timeout = timeout
+
+
+def is_query_canceled(error: Optional[BaseException]) -> bool:
+    # Die Datenbankanbindung kann den Fehler des Treibers in eine eigene Ausnahme verpacken
+    while error is not None:
+        if getattr(error, "sqlstate", None) == QUERY_CANCELED_SQLSTATE or getattr(error, "pgcode", None) == \
+                QUERY_CANCELED_SQLSTATE or "canceling statement" in str(error):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class TimeoutGuard:
+    """
+    Aborts executions that exceed `timeout` seconds and raises a QueryTimeout instead. The server is expected to abort
+    the statement itself (statement_timeout), the guard additionally cancels the execution from the client `grace`
+    seconds after the timeout, in case the server does not abort it in time.
+
+    The server-side timeout only applies to the guarded executions: `set_timeout` is called with the timeout before
+    and with None after each execution, so that other statements of the session (e.g. prewarming or DDL) are not
+    aborted.
+    """
+
+    def __init__(self, timeout: float, cancel: Callable[[], None], *, grace: float = 1.0,
+                 set_timeout: Optional[Callable[[Optional[float]], None]] = None):
+        """
+        :param cancel: Cancels the statement running on the connection, e.g. the cancel() method of a psycopg
+                       connection. Called from another thread.
+        :param set_timeout: Sets (or with None resets) the server-side timeout of the session.
+        """
+        if timeout <= 0:
+            raise ValueError("The timeout must be positive")
+        self.timeout = timeout
+        self.cancel = cancel
+        self.grace = grace
+        self.set_timeout = set_timeout
+
+    def run(self, execute: Callable[[], T]) -> T:
+        cancelled = threading.Event()
+
+        def cancel() -> None:
+            cancelled.set()
+            self.cancel()
+
+        if self.set_timeout is not None:
+            self.set_timeout(self.timeout)
+        timer = threading.Timer(self.timeout + self.grace, cancel)
+        timer.daemon = True
+        timer.start()
+        try:
+            return execute()
+        except Exception as e:
+            if cancelled.is_set() or is_query_canceled(e):
+                raise QueryTimeout(self.timeout) from e
+            raise
+        finally:
+            timer.cancel()
+            if self.set_timeout is not None:
+                self.set_timeout(None)
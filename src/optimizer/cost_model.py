@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import abc
+from typing import NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from postbound.db import postgres
+    from postbound.qal import qal
+
+
+class RewriteDecision(NamedTuple):
+    use_rewrite: bool
+    original_cost: float
+    rewritten_cost: float
+
+
+class CostModel(abc.ABC):
+    """
+    Estimates the cost of a query. The decision between the original (nested) and the rewritten (unnested) query is
+    based on these estimates, so that any cost model - e.g. a stub with fixed costs - can be plugged in.
+    """
+
+    @abc.abstractmethod
+    def estimate_cost(self, query: qal.SqlQuery | str) -> float:
+        raise NotImplementedError
+
+    def choose_query(self, original_query: qal.SqlQuery | str, rewritten_query: qal.SqlQuery | str) -> \
+            tuple[qal.SqlQuery | str, RewriteDecision]:
+        """
+        Returns the rewritten query if it is estimated to be cheaper than the original query, otherwise the original
+        query. The decision is returned together with both cost estimates.
+        """
+        original_cost = self.estimate_cost(original_query)
+        rewritten_cost = self.estimate_cost(rewritten_query)
+        decision = RewriteDecision(rewritten_cost < original_cost, original_cost, rewritten_cost)
+
+        return (rewritten_query if decision.use_rewrite else original_query), decision
+
+
+class PostgresCostModel(CostModel):
+    """
+    Uses the cost estimates of the PostgreSQL optimizer (EXPLAIN).
+    """
+
+    def __init__(self, postgres_interface: postgres.PostgresInterface):
+        self.postgres_interface = postgres_interface
+
+    def estimate_cost(self, query: qal.SqlQuery | str) -> float:
+        return self.postgres_interface.optimizer().cost_estimate(query)
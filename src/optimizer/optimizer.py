@@ -3,13 +3,12 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from collections import deque
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Hashable
 
 from postbound.qal import transform
 from postbound.qal.base import ColumnReference, TableReference
-from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression
-from postbound.qal.predicates import as_predicate, CompoundPredicate
+from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression, SubqueryExpression
+from postbound.qal.predicates import as_predicate, AbstractPredicate, BinaryPredicate, CompoundPredicate, InPredicate
 from postbound.qal.relalg import RelNode, SubqueryScan, Projection, ThetaJoin, Selection, GroupBy, CrossProduct, \
     Relation, Rename, SemiJoin, AntiJoin, Map
 from postbound.util.dicts import frozendict
@@ -22,32 +21,96 @@ class Optimizer:
     def __init__(self, utils: Utils):
         self.utils = utils
 
-    def optimize_unnesting(self, relalg: RelNode):
+    def optimize_unnesting(self, relalg: RelNode, *, bottom_up: bool = False):
         """
-        1. Prüfen, ob die Abfrage einen abhängigen Join hat
-        2. Outerquery (T1), Subquery (T2) berechnen
+        1. Prüfen, ob die Abfrage abhängige Joins hat
+        2. Für jede abhängige Subquery: Outerquery (T1), Subquery (T2) berechnen
         3. in die Form Dependent-join konvertieren
-        4. D berechnen
+        4. D berechnen (Subqueries mit derselben T1 teilen sich eine Domain)
         5. Push-dpwn
+
+        Subqueries aus EXISTS- und IN-Prädikaten (Semi-Join) sowie NOT EXISTS (Anti-Join) werden ebenfalls
+        entschachtelt, der Join mit T1 bleibt dabei ein Semi- bzw. Anti-Join. NOT IN wird wegen der abweichenden
+        Semantik für NULL-Werte nicht entschachtelt.
+
+        Im bottom-up Modus werden mehrstufig verschachtelte Subqueries von innen nach außen entschachtelt. Jede
+        Domain erhält eine eigene Tabelle (d, d2, ...), sodass die inneren Domains beim Entschachteln der äußeren
+        Ebenen erhalten bleiben.
         """
 
-        # 1. Prüfen, ob die Abfrage einen abhängigen Join hat
+        # 1. Prüfen, ob die Abfrage abhängige Joins hat
         local_rel_nodes = self._find_dependent_subquery_node(relalg)
         if len(local_rel_nodes) == 0:
             return relalg
 
-        # 2. Outerquery (T1), Subquery (T2) berechnen
-        t1, t2 = self._derive_outer_and_sub_query(local_rel_nodes[0])
-        all_dependent_columns = self.utils.find_all_dependent_columns(t1, t2)
-
-        # 3. in die Form Dependent-join konvertieren
-        dependent_join = self._convert_to_dependent_join(t1, t2)
-
-        # 4. D berechnen
-        d = self._derive_domain_node(dependent_join, all_dependent_columns)
-        result = self._update_root_node(d, relalg.root())
+        # Abhängige Spalten je T1 sammeln, damit alle Subqueries derselben T1 eine gemeinsame Domain nutzen. Die
+        # Zuordnung zu T1 wird einmalig über die Teilbäume verglichen und danach über die Identität der Subquery
+        # verfolgt, ob T1 seither umbenannt wurde, zeigt der (gecachte) Hashwert
+        outer_queries: List[RelNode] = []
+        outer_query_groups: Dict[int, int] = {}
+        domain_columns: Dict[Tuple[int, int], List[ColumnReference]] = {}
+        for subquery in local_rel_nodes:
+            t1, t2 = self._derive_outer_and_sub_query(subquery)
+            domain_key = self._domain_key(subquery, t1, outer_queries, outer_query_groups)
+            columns = domain_columns.setdefault(domain_key, [])
+            columns += [column for column in self.utils.find_all_dependent_columns(t1, t2) if column not in columns]
+
+        domains: Dict[Tuple[int, int], Projection] = {}
+        skipped_subqueries = set()
+        result = relalg.root()
+
+        while local_rel_nodes:
+            if bottom_up:
+                # Die am tiefsten verschachtelte Subquery zuerst entschachteln
+                subquery = max(local_rel_nodes, key=self._subquery_depth)
+            else:
+                subquery = local_rel_nodes[0]
+
+            if isinstance(subquery.parent_node, AntiJoin) and subquery.parent_node.predicate is not None:
+                skipped_subqueries.add(subquery.subquery)
+                local_rel_nodes = [node for node in local_rel_nodes if node.subquery not in skipped_subqueries]
+                continue
+
+            # 2. Outerquery (T1), Subquery (T2) berechnen
+            t1, t2 = self._derive_outer_and_sub_query(subquery)
+            domain_key = self._domain_key(subquery, t1, outer_queries, outer_query_groups)
+            all_dependent_columns = domain_columns.get(domain_key) or self.utils.find_all_dependent_columns(t1, t2)
+
+            # 3. in die Form Dependent-join konvertieren
+            dependent_join = self._convert_to_dependent_join(t1, t2, remove_all=bottom_up)
+
+            if dependent_join is None:
+                skipped_subqueries.add(subquery.subquery)
+            else:
+                # 4. D berechnen
+                outer_node = next(child for child in subquery.parent_node.children() if child is not subquery)
+                d = self._derive_domain_node(dependent_join, all_dependent_columns, outer_node=outer_node,
+                                             domains=domains, domain_key=domain_key, join_node=subquery.parent_node)
+                result = self._update_root_node(d, subquery)
+
+            # Die Baumstruktur wurde aktualisiert, daher die verbleibenden Subqueries neu suchen
+            local_rel_nodes = [node for node in self._find_dependent_subquery_node(result)
+                               if node.subquery not in skipped_subqueries]
+
+        return result
+
+    def _domain_key(self, subquery: SubqueryScan, t1: Optional[RelNode], outer_queries: List[RelNode],
+                    outer_query_groups: Dict[int, int]) -> Tuple[int, int]:
+        """
+        Returns the key of the domain shared by all subqueries with the same outer query (T1).
 
-        return result.root()
+        The outer query of a subquery is determined by comparing the subtrees only the first time the subquery is
+        seen, afterwards it is looked up by the identity of the subquery. The hash of T1 distinguishes an outer query
+        which has been changed by unnesting another subquery (e.g. by renamed columns).
+        """
+        group = outer_query_groups.get(id(subquery.subquery))
+        if group is None:
+            group = next((index for index, outer_query in enumerate(outer_queries)
+                          if self.utils.same_node(outer_query, t1)), len(outer_queries))
+            if group == len(outer_queries):
+                outer_queries.append(t1)
+            outer_query_groups[id(subquery.subquery)] = group
+        return group, hash(t1)
 
     @staticmethod
     def _find_dependent_subquery_node(relalg: RelNode) -> List[SubqueryScan]:
@@ -69,9 +132,25 @@ class Optimizer:
         find_dependent_subqueries(relalg)
         return subqueries
 
+    @staticmethod
+    def _subquery_depth(subquery: SubqueryScan) -> int:
+        """
+        Computes the nesting level of the given subquery scan, i.e. the number of subquery scans above it.
+        """
+        depth = 0
+        node = subquery.parent_node
+        while node is not None:
+            if isinstance(node, SubqueryScan):
+                depth += 1
+            node = node.parent_node
+        return depth
+
     def _derive_outer_and_sub_query(self, subquery: SubqueryScan) -> Tuple[Optional[RelNode], RelNode]:
         """
         Derives outer query (T1) and subquery (T2) from the given subquery node.
+
+        Sibling subqueries and subqueries that have already been unnested are removed from T1, so that all
+        subqueries of the same query block derive the same outer query.
         """
         t2 = subquery.input_node.mutate(as_root=True)
 
@@ -81,13 +160,39 @@ class Optimizer:
 
         if parent_node:
             for child in parent_node.children():
-                if child != t2:
-                    t1 = child.mutate(as_root=True)
+                if child is not subquery:
+                    t1 = self._strip_subquery_inputs(child).mutate(as_root=True)
                     break
 
         return t1, t2
 
-    def _convert_to_dependent_join(self, left_node: RelNode, right_node: RelNode) -> Optional[DependentJoin]:
+    def _strip_subquery_inputs(self, node: RelNode) -> RelNode:
+        """
+        Removes dependent subquery scans and already unnested subqueries (joins with a dependent join as right input)
+        from the given outer query.
+        """
+        if isinstance(node, CrossProduct):
+            for child, other_child in ((node.left_input, node.right_input), (node.right_input, node.left_input)):
+                if isinstance(child, SubqueryScan) and child.subquery.is_dependent():
+                    return self._strip_subquery_inputs(other_child)
+        elif isinstance(node, ThetaJoin) and isinstance(node.right_input, DependentJoin):
+            return self._strip_subquery_inputs(node.left_input)
+        elif isinstance(node, (SemiJoin, AntiJoin)):
+            subquery_node = node.subquery_node
+            if isinstance(subquery_node, DependentJoin) or (isinstance(subquery_node, SubqueryScan)
+                                                            and subquery_node.subquery.is_dependent()):
+                return self._strip_subquery_inputs(node.input_node)
+
+        return node
+
+    def _convert_to_dependent_join(self, left_node: RelNode, right_node: RelNode, *,
+                                   remove_all: bool = False) -> Optional[DependentJoin]:
+        """
+        Removes the outer query (T1) from the subquery (T2) and connects both via a dependent join.
+
+        With `remove_all`, every occurrence of T1 is removed from T2. This is necessary for subqueries containing
+        already unnested subqueries which still reference T1.
+        """
 
         updated_t2 = None
         tab = TableReference("DummyTable", "DummyTable")
@@ -102,15 +207,16 @@ class Optimizer:
             if len(t2.children()) == 0:
                 return False
 
-            if t1 in children and isinstance(t2, CrossProduct):
-                tail_node = t2.right_input if t2.left_input == t1 else t2.left_input
+            contains_t1 = any(self.utils.same_node(child, t1) for child in children)
+            if contains_t1 and isinstance(t2, CrossProduct):
+                tail_node = t2.right_input if self.utils.same_node(t2.left_input, t1) else t2.left_input
                 if isinstance(t2.parent_node, (ThetaJoin, CrossProduct, DependentJoin)):
-                    if t2.parent_node.left_input == t2:
+                    if self.utils.same_node(t2.parent_node.left_input, t2):
                         updated_t2 = t2.parent_node.mutate(left_input=tail_node)
                     else:
                         updated_t2 = t2.parent_node.mutate(right_input=tail_node)
                 elif isinstance(t2.parent_node, (SemiJoin, AntiJoin)):
-                    if t2.parent_node.input_node == t2:
+                    if self.utils.same_node(t2.parent_node.input_node, t2):
                         updated_t2 = t2.parent_node.mutate(input_node=tail_node)
                     else:
                         updated_t2 = t2.parent_node.mutate(subquery_node=tail_node)
@@ -118,8 +224,8 @@ class Optimizer:
                     updated_t2 = t2.parent_node.mutate(input_node=tail_node)
                 return True
 
-            elif t1 in children and isinstance(t2, ThetaJoin):
-                if t2.left_input == t1:
+            elif contains_t1 and isinstance(t2, ThetaJoin):
+                if self.utils.same_node(t2.left_input, t1):
                     updated_t2 = t2.mutate(left_input=dummy_rel)
                 else:
                     new_right_input = t2.left_input.mutate(as_root=True)
@@ -146,18 +252,45 @@ class Optimizer:
         if updated_t2 is None:
             return None
 
-        dependent_join = DependentJoin(left_node, updated_t2.root())
+        remaining_t2 = updated_t2.root()
+        while remove_all:
+            updated_t2 = None
+            if not recursive_find_and_remove(left_node, remaining_t2):
+                break
+            remaining_t2 = updated_t2.root()
+
+        dependent_join = DependentJoin(left_node, remaining_t2)
         return dependent_join
 
-    def _derive_domain_node(self, dependent_join: DependentJoin, all_dependent_columns: List[ColumnReference]) -> \
-            Optional[RelNode]:
+    def _derive_domain_node(self, dependent_join: DependentJoin, all_dependent_columns: List[ColumnReference], *,
+                            outer_node: Optional[RelNode] = None,
+                            domains: Optional[Dict[Hashable, Projection]] = None,
+                            domain_key: Optional[Hashable] = None,
+                            join_node: Optional[RelNode] = None) -> Optional[RelNode]:
+        """
+        Derives the domain D of the dependent join and joins the outer query with the dependent join over D.
+
+        If a domain for the same outer query (T1) has already been derived, it is reused instead of creating a new
+        one, so that all subqueries with the same T1 share one domain. The domains are looked up by `domain_key`,
+        which defaults to T1 itself.
+
+        If the subquery was connected to the outer query by a semi- or anti-join (EXISTS, NOT EXISTS, IN), the outer
+        query is joined with the dependent join by the same type of join. The predicate of an IN subquery is added to
+        the join predicate.
+        """
         t1 = dependent_join.left_input
         t2 = dependent_join.right_input
 
         join_predicates = []
         predicates_dict = {}
 
-        tab_d = TableReference("domain", "d")
+        if domain_key is None:
+            domain_key = t1
+        domain = domains.get(domain_key) if domains is not None else None
+        if domain is not None:
+            tab_d = self.utils.domain_table(domain)
+        else:
+            tab_d = self.utils.create_domain_table(len(domains) + 1 if domains is not None else 1)
 
         for column in all_dependent_columns:
             column_d = ColumnReference(column.name, tab_d)
@@ -167,21 +300,48 @@ class Optimizer:
             join_predicates.append(join_predicate)
 
         # Domain-node
-        t1_without_parent = t1.mutate(as_root=True)
-        rename = Rename(t1_without_parent, predicates_dict, parent_node=None)
-        transformed_values = list(map(lambda x: ColumnExpression(x), predicates_dict.values()))
-        domain = Projection(rename, transformed_values)
+        if domain is None:
+            t1_without_parent = t1.mutate(as_root=True)
+            rename = Rename(t1_without_parent, predicates_dict, parent_node=None)
+            transformed_values = list(map(lambda x: ColumnExpression(x), predicates_dict.values()))
+            domain = Projection(rename, transformed_values)
+            if domains is not None:
+                domains[domain_key] = domain
 
         # free variables of t2 (subquery) update to match the domain node
         updated_t2 = self._update_column_name(t2, predicates_dict)
 
         updated_dependent_join = dependent_join.mutate(left_input=domain, right_input=updated_t2)
+        if outer_node is None:
+            outer_node = updated_dependent_join.left_input.input_node.input_node
+        else:
+            outer_node = outer_node.mutate(as_root=True)
+
+        if isinstance(join_node, (SemiJoin, AntiJoin)):
+            if join_node.predicate is not None:
+                join_predicates.append(self._convert_in_predicate(join_node.predicate))
+            join_type = SemiJoin if isinstance(join_node, SemiJoin) else AntiJoin
+            return join_type(outer_node, updated_dependent_join, CompoundPredicate.create_and(join_predicates)).mutate()
+
         compound_join_predicates = CompoundPredicate.create_and(join_predicates)
-        return ThetaJoin(updated_dependent_join.left_input.input_node.input_node, updated_dependent_join,
-                         compound_join_predicates).mutate()
+        return ThetaJoin(outer_node, updated_dependent_join, compound_join_predicates).mutate()
+
+    @staticmethod
+    def _convert_in_predicate(predicate: AbstractPredicate) -> AbstractPredicate:
+        """
+        Converts an IN predicate over a subquery into an equality with the column selected by the subquery, since the
+        subquery is joined directly after the unnesting.
+        """
+        if not isinstance(predicate, InPredicate) or len(predicate.values) != 1 or \
+                not isinstance(predicate.values[0], SubqueryExpression):
+            return predicate
+
+        select_column = predicate.values[0].query.select_clause.targets[0].expression
+        return BinaryPredicate(LogicalSqlOperators.Equal, predicate.column, select_column)
 
     def _update_column_name(self, node: RelNode, column_mapping: Dict[ColumnReference, ColumnReference]) -> RelNode:
-        if isinstance(node, Relation):
+        # Teilbäume, die keine der umzubenennenden Spalten referenzieren, bleiben unverändert
+        if isinstance(node, Relation) or not self.utils.attribute_analysis.references_any(node, column_mapping.keys()):
             return node
         updated_node = node
 
@@ -235,15 +395,12 @@ class Optimizer:
             updated_child = self._update_column_name(updated_node.input_node, column_mapping)
             return updated_node.mutate(input_node=updated_child)
 
-    @staticmethod
-    def _update_root_node(node: RelNode, root_node: RelNode) -> RelNode:
-        queue = deque(root_node.children())
-
-        while queue:
-            current = queue.popleft()
-            if isinstance(current, SubqueryScan):
-                return current.parent_node.parent_node.mutate(input_node=node)
-
-            queue.extend(current.children())
+    def _update_root_node(self, node: RelNode, subquery: SubqueryScan) -> RelNode:
+        """
+        Replaces the cross product of the given subquery scan and its outer query with the given node.
+        """
+        cross_product = subquery.parent_node
+        if cross_product.parent_node is None:
+            return node
 
-        return node
+        return self.utils.replace_input_node(cross_product.parent_node, cross_product, node).root()
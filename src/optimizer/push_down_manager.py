@@ -3,205 +3,294 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from typing import Optional, List
+from typing import Optional, List, Tuple, Callable
 
 from postbound.qal import base
-from postbound.qal.relalg import RelNode, Projection, GroupBy, Selection, ThetaJoin, SemiJoin, AntiJoin, Map, Relation, \
-    CrossProduct
+from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression
+from postbound.qal.predicates import AbstractPredicate, BinaryPredicate, CompoundPredicate
+from postbound.qal.relalg import RelNode, Projection, GroupBy, Selection, ThetaJoin, Map, Relation, CrossProduct, \
+    Rename, SemiJoin, AntiJoin
 
 from src.optimizer.dependent_join import DependentJoin
+from src.optimizer.outer_join import LeftOuterJoin
 from src.utils.utils import Utils
 
+# Eine Push-down-Regel liefert den Knoten, unter den der dependent-join als nächstes geschoben wird, und eine Funktion,
+# die den aktuellen Knoten mit dem neuen Eingabeknoten wieder aufbaut.
+PushDownStep = Tuple[RelNode, Callable[[RelNode], RelNode]]
+
 
 class PushDownManager:
-    def __init__(self, utils: Utils):
+    def __init__(self, utils: Utils, *, domain_elimination: bool = True):
         self.utils = utils
+        self.domain_elimination = domain_elimination
 
-    def push_down(self, node: RelNode, subquery_root: RelNode = None):
-
-        # Navigieren zur Position des Knotens für den dependent-Join node
-        dependent_join = self._navigate_to_dependent_join(node)
+    def push_down(self, node: RelNode, *, bottom_up: bool = False) -> Tuple[RelNode, List[RelNode]]:
+        """
+        Pushes every dependent join of the given tree down until it can be replaced by a cross product with its domain.
 
-        if dependent_join is None:
-            return node.root(), subquery_root
+        Each dependent join is pushed down with a cursor, i.e. the rules are applied locally to the node below the
+        dependent join and the tree above the cursor is only rebuilt once the dependent join has been eliminated.
+        Together with the free variables being taken from the cached attribute analysis, this keeps the push-down
+        linear in the size of the tree.
 
-        # Prüfen, ob das rechte Kind des dependent-join Knotens freie Variablen in der Baumstruktur hat
-        dependent_node = dependent_join.right_input
+        :return: The root of the updated tree and the subquery root (the parent of the eliminated dependent join) for
+                 each dependent join. The subquery roots are registered in the rewrite context, since later push-downs
+                 replace them by new instances.
+        """
+        subquery_roots = []
+        root = node.root()
 
-        #  1) False
-        #    - Die letzte Regel der Push-Down-Regel wird angewendet, der dependent-join-Knoten wird beseitigt und die Schleife wird beendet
-        #  2) True
-        #   - Anwenden eine Push-down-Regel für diesen Typ. An diesem Punkt wird die gesamte Baumstruktur aktualisiert
-        #   - zurück zu Schritt 1 und wiederholen die Schleife
-        if self._check_free_variables_in_node(dependent_node):
-            updated_node = self._apply_push_down_rule(dependent_node)
+        # Navigieren zur Position des Knotens für den dependent-Join node
+        # (im bottom-up Modus zuerst zum innersten dependent-Join node)
+        dependent_join = self._find_next_dependent_join(root, bottom_up)
+
+        while dependent_join is not None:
+            subquery_root = self._push_down_dependent_join(dependent_join)
+            self.utils.rewrite_context.register(subquery_root)
+            subquery_roots.append(subquery_root)
+
+            root = subquery_root.root()
+            dependent_join = self._find_next_dependent_join(root, bottom_up)
+
+        return root, subquery_roots
+
+    def _find_next_dependent_join(self, node: RelNode, bottom_up: bool) -> Optional[DependentJoin]:
+        if bottom_up:
+            return self._navigate_to_innermost_dependent_join(node)
+        return self._navigate_to_dependent_join(node)
+
+    def _push_down_dependent_join(self, dependent_join: DependentJoin) -> RelNode:
+        """
+        Pushes the given dependent join down and returns the updated parent node of the dependent join.
+        """
+        domain = dependent_join.left_input
+        domain_table = self.utils.domain_table(domain)
+
+        #  Solange der Knoten unter dem dependent-join freie Variablen hat:
+        #   - Anwenden eine Push-down-Regel für diesen Typ, der Cursor wandert zum Eingabeknoten
+        #   - Gibt es für diesen Typ keine Push-down-Regel, bleibt der Cursor stehen
+        #  Danach wird die letzte Regel angewendet, der dependent-join-Knoten wird beseitigt und die Baumstruktur
+        #  oberhalb des Cursors einmalig wieder aufgebaut
+        #  Werden alle Domain-Spalten in einer Selektion mit Spalten der Subquery gleichgesetzt, wird die Domain dort
+        #  eliminiert und der dependent-join ebenfalls beseitigt
+        #  Liefert die Subquery ein skalares Aggregat (z.B. COUNT(*)), wird sie über einen Left-Outer-Join
+        #  angebunden, damit Werte der Domain ohne passende Tupel nicht verloren gehen
+        rebuild_steps = []
+        scalar_aggregate = False
+        only_projections_above = True
+        eliminated_node = None
+        cursor = dependent_join.right_input
+        while self._check_free_variables_in_node(cursor, domain_table):
+            if self.domain_elimination:
+                eliminated_node = self._eliminate_domain(cursor, domain, domain_table)
+                if eliminated_node is not None:
+                    break
+
+            push_down_step = self._apply_push_down_rule(cursor, domain, domain_table)
+            if push_down_step is None:
+                break
+
+            if isinstance(cursor, GroupBy) and not cursor.group_columns and only_projections_above:
+                scalar_aggregate = True
+            only_projections_above = only_projections_above and isinstance(cursor, (Projection, Map))
+
+            cursor, rebuild = push_down_step
+            rebuild_steps.append(rebuild)
+
+        # Die Attribute der neu aufgebauten Knoten werden aus den bereits bekannten Kindknoten aktualisiert,
+        # die Einträge des beseitigten dependent-join und seiner Vorgänger verworfen
+        attribute_analysis = self.utils.attribute_analysis
+        if eliminated_node is not None:
+            updated_node = eliminated_node
         else:
-            updated_node = self._apply_push_down_rule_final(dependent_node)
-
-        if subquery_root is None:
-            subquery_root = updated_node
-
-        return self.push_down(updated_node, subquery_root=subquery_root)
-
-    def _check_free_variables_in_node(self, node: RelNode) -> bool:
-        if isinstance(node, Relation):
-            return False
-
-        tab_d = base.TableReference("domain", "d")
-        tab_d_identifier = tab_d.identifier()
-
-        if isinstance(node, (Projection, GroupBy)):
-            node_columns = node.group_columns if isinstance(node, GroupBy) else node.columns
-            for sql_expr in node_columns:
-                for column in sql_expr.itercolumns():
-                    if column.table.identifier() is tab_d_identifier:
-                        return True
-        elif isinstance(node, (GroupBy, Map)):
-            disc = node.aggregates if isinstance(node, GroupBy) else node.mapping
-            for key_set, value_set in disc.items():
-                for key_expr in key_set:
-                    for key_column in key_expr.itercolumns():
-                        if key_column.table.identifier() is tab_d_identifier:
-                            return True
-
-                for value_expr in value_set:
-                    for value_column in value_expr.itercolumns():
-                        if value_column.table.identifier() is tab_d_identifier:
-                            return True
-
-        elif isinstance(node, (Selection, ThetaJoin, SemiJoin, AntiJoin)):
-            for column in node.predicate.itercolumns():
-                if column.table.identifier() is tab_d_identifier:
-                    return True
-
-        for child in node.children():
-            if self._check_free_variables_in_node(child):
-                return True
-
-        return False
-
-    def _apply_push_down_rule(self, node: RelNode) -> RelNode:
+            updated_node = self._apply_push_down_rule_final(cursor, domain)
+        attribute_analysis.update(updated_node)
+        for rebuild in reversed(rebuild_steps):
+            updated_node = rebuild(updated_node)
+            attribute_analysis.update(updated_node)
+
+        attribute_analysis.invalidate(dependent_join)
+        subquery_root = self.utils.replace_input_node(dependent_join.parent_node, dependent_join, updated_node)
+        if scalar_aggregate and isinstance(subquery_root, ThetaJoin):
+            subquery_root = self._convert_to_outer_join(subquery_root)
+        return subquery_root
+
+    def _convert_to_outer_join(self, subquery_root: ThetaJoin) -> RelNode:
+        """
+        Replaces the join of the outer query with the unnested scalar aggregate by a left outer join. Tuples of the
+        outer query without a group then receive NULL as aggregate value, which the query generator turns into the
+        result of the aggregate over an empty input (e.g. 0 for COUNT).
+        """
+        outer_join = LeftOuterJoin(subquery_root.left_input.mutate(as_root=True),
+                                   subquery_root.right_input.mutate(as_root=True),
+                                   predicate=subquery_root.predicate).mutate()
+        self.utils.attribute_analysis.invalidate(subquery_root)
+        if subquery_root.parent_node is None:
+            return outer_join
+
+        updated_parent = self.utils.replace_input_node(subquery_root.parent_node, subquery_root, outer_join)
+        return next(child for child in updated_parent.children() if isinstance(child, LeftOuterJoin)
+                    and child.predicate is outer_join.predicate)
+
+    def _check_free_variables_in_node(self, node: RelNode, domain_table: Optional[base.TableReference] = None) -> bool:
+        tab_d = domain_table if domain_table else base.TableReference("domain", "d")
+        return self.utils.attribute_analysis.has_free_columns_of(node, tab_d)
+
+    def _apply_push_down_rule(self, node: RelNode, domain: RelNode, domain_table: base.TableReference) -> \
+            Optional[PushDownStep]:
+        """
+        Applies the push-down rule for the type of the given node. Returns None if the dependent join cannot be pushed
+        further below the given node.
+        """
         if isinstance(node, Selection):
             return self._push_down_rule_selection(node)
         elif isinstance(node, Projection):
-            return self._push_down_rule_projection(node)
+            return self._push_down_rule_projection(node, domain)
         elif isinstance(node, GroupBy):
-            return self._push_down_rule_groupby(node)
+            return self._push_down_rule_groupby(node, domain)
         elif isinstance(node, Map):
             return self._push_down_rule_map(node)
-        elif isinstance(node, ThetaJoin):
-            return self._push_down_rule_join(node)
-
-        return node
-
-    def _push_down_rule_selection(self, node: Selection) -> RelNode:
-        new_input_node = node.input_node.mutate(as_root=True)
-        dependent_join = node.parent_node.mutate(as_root=True, right_input=new_input_node)
-        updated_node = node.mutate(as_root=True, input_node=dependent_join)
-
-        return self._push_down_dependent_join(node, updated_node)
-
-    def _push_down_rule_projection(self, node: Projection) -> RelNode:
-        additional_columns = node.parent_node.left_input.columns
-        updated_columns = tuple(node.columns + additional_columns)
-        new_input_node = node.input_node.mutate(as_root=True)
-        dependent_join = node.parent_node.mutate(as_root=True, right_input=new_input_node)
-        updated_node = node.mutate(input_node=dependent_join, targets=updated_columns, as_root=True)
+        elif isinstance(node, (ThetaJoin, CrossProduct, LeftOuterJoin)):
+            return self._push_down_rule_join(node, domain_table)
+        elif isinstance(node, (SemiJoin, AntiJoin)):
+            return self._push_down_rule_semi_join(node, domain_table)
 
-        return self._push_down_dependent_join(node, updated_node)
-
-    def _push_down_rule_map(self, node: Map) -> RelNode:
-        new_input_node = node.input_node.mutate(as_root=True)
-        dependent_join = node.parent_node.mutate(as_root=True, right_input=new_input_node)
-        updated_node = node.mutate(as_root=True, input_node=dependent_join)
-
-        return self._push_down_dependent_join(node, updated_node)
+        return None
 
-    def _push_down_rule_groupby(self, node: GroupBy) -> RelNode:
-        additional_columns = node.parent_node.left_input.columns
-        updated_columns = tuple(node.group_columns + additional_columns)
-        new_input_node = node.input_node.mutate(as_root=True)
+    @staticmethod
+    def _push_down_rule_selection(node: Selection) -> PushDownStep:
+        return node.input_node, lambda input_node: node.mutate(as_root=True, input_node=input_node)
 
-        dependent_join = node.parent_node.mutate(as_root=True, right_input=new_input_node)
-        updated_node = node.mutate(as_root=True, input_node=dependent_join,
-                                   group_columns=updated_columns)
+    @staticmethod
+    def _push_down_rule_projection(node: Projection, domain: RelNode) -> PushDownStep:
+        updated_columns = tuple(node.columns + domain.columns)
+        return node.input_node, lambda input_node: node.mutate(as_root=True, input_node=input_node,
+                                                               targets=updated_columns)
 
-        return self._push_down_dependent_join(node, updated_node)
+    @staticmethod
+    def _push_down_rule_map(node: Map) -> PushDownStep:
+        return node.input_node, lambda input_node: node.mutate(as_root=True, input_node=input_node)
 
-    def _push_down_rule_join(self, node: ThetaJoin) -> RelNode:
-        if self._check_free_variables_in_node(node.right_input):
-            dependent_join = node.parent_node.mutate(as_root=True, right_input=node.right_input)
-            updated_node = node.mutate(as_root=True, right_input=dependent_join)
-        else:
-            dependent_join = node.parent_node.mutate(as_root=True, right_input=node.left_input)
-            updated_node = node.mutate(as_root=True, left_input=dependent_join)
+    @staticmethod
+    def _push_down_rule_groupby(node: GroupBy, domain: RelNode) -> PushDownStep:
+        updated_columns = tuple(node.group_columns + domain.columns)
+        return node.input_node, lambda input_node: node.mutate(as_root=True, input_node=input_node,
+                                                               group_columns=updated_columns)
+
+    def _push_down_rule_join(self, node: ThetaJoin | CrossProduct | LeftOuterJoin,
+                             domain_table: base.TableReference) -> Optional[PushDownStep]:
+        left_has_free_variables = self._check_free_variables_in_node(node.left_input, domain_table)
+        right_has_free_variables = self._check_free_variables_in_node(node.right_input, domain_table)
+
+        # Hängen beide Seiten von der Domain ab (z.B. nach dem Entschachteln einer inneren Subquery),
+        # wird der dependent-join über dem Join beseitigt
+        if left_has_free_variables and right_has_free_variables:
+            return None
+
+        # Bei einem Left-Outer-Join darf der dependent-join nur auf die erhaltene (linke) Seite geschoben werden
+        if isinstance(node, LeftOuterJoin) and right_has_free_variables:
+            return None
+
+        if right_has_free_variables:
+            return node.right_input, lambda right_input: node.mutate(as_root=True, right_input=right_input)
+        return node.left_input, lambda left_input: node.mutate(as_root=True, left_input=left_input)
+
+    def _push_down_rule_semi_join(self, node: SemiJoin | AntiJoin, domain_table: base.TableReference) -> \
+            Optional[PushDownStep]:
+        # Semi- und Anti-Joins liefern nur die Spalten ihres Eingabeknotens: Der dependent-join kann nur in den
+        # Eingabeknoten geschoben werden, hängt die Subquery selbst von der Domain ab, wird er hier beseitigt
+        if self._check_free_variables_in_node(node.subquery_node, domain_table):
+            return None
+        return node.input_node, lambda input_node: node.mutate(as_root=True, input_node=input_node)
+
+    def _eliminate_domain(self, node: RelNode, domain: RelNode, domain_table: base.TableReference) -> \
+            Optional[RelNode]:
+        """
+        Eliminates the domain if the given selection equates every domain column with a column of its input (e.g.
+        d.id = e2.sid). The input column then stands in for the domain column: the equalities are removed and the input
+        columns are renamed to the domain columns, so that neither the domain nor the join with it is necessary.
+
+        Returns None if the domain cannot be eliminated at the given node.
+        """
+        if not isinstance(node, Selection):
+            return None
+
+        tab_d_identifier = domain_table.identifier()
+        domain_columns = {column for sql_expr in domain.columns for column in sql_expr.itercolumns()}
+        input_tables = {table.identifier() for table in self.utils.attribute_analysis.tables(node.input_node)}
+
+        substitutes = {}
+        remaining_predicates = []
+        for predicate in self.utils.split_conjunction(node.predicate):
+            equated_columns = self._extract_equated_columns(predicate)
+            if equated_columns:
+                first_column, second_column = equated_columns
+                domain_column, input_column = ((first_column, second_column)
+                                               if first_column.table.identifier() == tab_d_identifier
+                                               else (second_column, first_column))
+                if (domain_column in domain_columns and domain_column not in substitutes
+                        and input_column.table.identifier() in input_tables
+                        and input_column not in substitutes.values()):
+                    substitutes[domain_column] = input_column
+                    continue
+            remaining_predicates.append(predicate)
+
+        if set(substitutes.keys()) != domain_columns:
+            return None
+        if any(column.table.identifier() == tab_d_identifier
+               for predicate in remaining_predicates for column in predicate.itercolumns()):
+            return None
+        if self._check_free_variables_in_node(node.input_node, domain_table):
+            return None
+
+        input_node = node.input_node.mutate(as_root=True)
+        if remaining_predicates:
+            input_node = node.mutate(as_root=True, input_node=input_node,
+                                     predicate=CompoundPredicate.create_and(remaining_predicates))
+
+        return Rename(input_node, {input_column: domain_column for domain_column, input_column in substitutes.items()})
 
-        return self._push_down_dependent_join(node, updated_node)
+    @staticmethod
+    def _extract_equated_columns(predicate: AbstractPredicate) -> \
+            Optional[Tuple[base.ColumnReference, base.ColumnReference]]:
+        if not isinstance(predicate, BinaryPredicate) or predicate.operation != LogicalSqlOperators.Equal:
+            return None
+        if not isinstance(predicate.first_argument, ColumnExpression) or \
+                not isinstance(predicate.second_argument, ColumnExpression):
+            return None
+        return predicate.first_argument.column, predicate.second_argument.column
 
     @staticmethod
-    def _apply_push_down_rule_final(node: RelNode):
-        dependent_join = node.parent_node
-        dependent_join_parent_node = dependent_join.parent_node
-        left_child = dependent_join.left_input.mutate(as_root=True)
-        right_child = dependent_join.right_input.mutate(as_root=True)
+    def _apply_push_down_rule_final(node: RelNode, domain: RelNode) -> RelNode:
+        domain_node = domain.mutate(as_root=True)
 
         if isinstance(node, Relation) and node.table.full_name == "DummyTable":
-            updated_parent = dependent_join_parent_node.mutate(left_input=left_child)
-        else:
-            cross_product = CrossProduct(left_input=left_child, right_input=right_child)
-            if isinstance(dependent_join_parent_node, (ThetaJoin, CrossProduct, DependentJoin)):
-                if dependent_join_parent_node.left_input == dependent_join:
-                    updated_parent = dependent_join_parent_node.mutate(left_input=cross_product)
-                else:
-                    updated_parent = dependent_join_parent_node.mutate(right_input=cross_product)
-            elif isinstance(dependent_join_parent_node, (SemiJoin, AntiJoin)):
-                if dependent_join_parent_node.input_node == dependent_join:
-                    updated_parent = dependent_join_parent_node.mutate(input_node=cross_product)
-                else:
-                    updated_parent = dependent_join_parent_node.mutate(subquery_node=cross_product)
-            else:
-                updated_parent = dependent_join_parent_node.mutate(input_node=cross_product)
-
-        return updated_parent
+            return domain_node
+        return CrossProduct(left_input=domain_node, right_input=node.mutate(as_root=True))
 
     @staticmethod
-    def _push_down_dependent_join(node: RelNode, updated_node: RelNode) -> RelNode:
-        dependent_join_parent_node = node.parent_node.parent_node
+    def _navigate_to_dependent_join(node: RelNode) -> Optional[DependentJoin]:
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, DependentJoin):
+                return current
+            stack.extend(reversed(current.children()))
+        return None
 
-        if isinstance(dependent_join_parent_node, (ThetaJoin, CrossProduct, DependentJoin)):
-            if dependent_join_parent_node.left_input == node.parent_node:
-                updated_parent = dependent_join_parent_node.mutate(left_input=updated_node)
-            else:
-                updated_parent = dependent_join_parent_node.mutate(right_input=updated_node)
-        elif isinstance(dependent_join_parent_node, (SemiJoin, AntiJoin)):
-            if dependent_join_parent_node.input_node == node:
-                updated_parent = dependent_join_parent_node.mutate(input_node=updated_node)
+    @staticmethod
+    def _navigate_to_innermost_dependent_join(node: RelNode) -> Optional[DependentJoin]:
+        """
+        Finds the first dependent join which does not contain another dependent join in its subtree.
+        """
+        stack = [(node, False)]
+        while stack:
+            current, children_visited = stack.pop()
+            if children_visited:
+                if isinstance(current, DependentJoin):
+                    return current
             else:
-                updated_parent = dependent_join_parent_node.mutate(subquery_node=updated_node)
-        else:
-            updated_parent = dependent_join_parent_node.mutate(input_node=updated_node)
-
-        return updated_parent
-
-    def _navigate_to_dependent_join(self, node: RelNode) -> Optional[DependentJoin]:
-        if isinstance(node, DependentJoin):
-            return node
-
-        for child in node.children():
-            result = self._navigate_to_dependent_join(child)
-            if result is not None:
-                return result
+                stack.append((current, True))
+                stack.extend((child, False) for child in reversed(current.children()))
         return None
-
-    def _navigate_to_dependent_joins(self, node: RelNode) -> List[DependentJoin]:
-        dependent_joins = []
-
-        def find_dependent_joins(relalg: RelNode):
-            if isinstance(node, DependentJoin):
-                return dependent_joins.append(node)
-
-            for child in node.children() or []:
-                find_dependent_joins(child)
-
-        find_dependent_joins(node)
-        return dependent_joins
@@ -1,17 +1,34 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import Optional
+
 from postbound.qal import parser, relalg
 from postbound.qal.qal import SqlQuery
 from postbound.qal.relalg import RelNode
 
+from src.utils.disk_cache import DiskCache
+
 
 class Parser:
-    def __init__(self):
-        pass
+    def __init__(self, cache: Optional[DiskCache] = None):
+        """
+        :param cache: Stores the parsed queries and relational algebra trees across runs.
+        """
+        self.cache = cache
 
     def parse_relalg(self, sql_query: str) -> RelNode:
+        if self.cache is not None:
+            return self.cache.get_or_compute("relalg", sql_query,
+                                             lambda: relalg.parse_relalg(self.parser_query(sql_query)))
         parsed_query = parser.parse_query(sql_query)
         return relalg.parse_relalg(parsed_query)
 
     def parser_query(self, query: str) -> SqlQuery:
+        if self.cache is not None:
+            return self.cache.get_or_compute("sql_query", query, lambda: parser.parse_query(query))
         return parser.parse_query(query)
 
     def str_relalg(self, relalg: RelNode) -> str:
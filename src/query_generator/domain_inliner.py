@@ -0,0 +1,163 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import datetime
+import decimal
+import math
+import re
+import time
+from typing import Callable, NamedTuple, Optional
+
+from postbound.qal import clauses, qal
+
+DOMAIN_INLINING_FORMS = ("values", "array")
+
+
+class InliningDecision(NamedTuple):
+    domain: str
+    """Name of the dup_elim_outerquery CTE."""
+
+    rows: Optional[int]
+    """Number of rows of the domain, None if it exceeds the cutoff."""
+
+    form: Optional[str]
+    """Form of the inlined domain ("values" or "array"), None if the CTE is kept."""
+
+    evaluation_time: float
+    """Time in seconds spent evaluating the domain on the database."""
+
+
+class DomainInliner:
+    """
+    Evaluates the dup_elim_outerquery CTEs of a generated query and inlines domains with at most `cutoff` rows as
+    constants, so that PostgreSQL knows the exact domain and can use index scans on the subquery tables instead of
+    hashing the CTE:
+
+    - "values": dup_elim_outerquery AS d is replaced by (VALUES (1), (2), ...) AS d(id)
+    - "array": dup_elim_outerquery AS d is replaced by unnest(ARRAY[1, 2, ...]) AS d(id), only for single-column
+      domains
+
+    The decisions of the last query are kept in `decisions`. Evaluating the domains is part of the cost of the
+    rewritten query, its time is kept in the decisions and summed up by `evaluation_time`.
+    """
+
+    def __init__(self, domain_evaluator: Callable[[str], list[tuple]], *, cutoff: int = 500, form: str = "values"):
+        """
+        :param domain_evaluator: Executes a query and returns all result rows.
+        """
+        if form not in DOMAIN_INLINING_FORMS:
+            raise ValueError(f"Unknown domain inlining form: {form}")
+        self.domain_evaluator = domain_evaluator
+        self.cutoff = cutoff
+        self.form = form
+        self.decisions = []
+
+    def inline(self, query: qal.SqlQuery) -> qal.SqlQuery | str:
+        """
+        Returns the query with all small domains inlined, or the unchanged query if no domain has been inlined.
+        """
+        self.decisions = []
+        if query.cte_clause is None:
+            return query
+
+        cte_queries = list(query.cte_clause.queries)
+        inlined_sources = {}
+        for index, cte_query in enumerate(cte_queries):
+            if not cte_query.target_name.startswith("dup_elim_outerquery"):
+                continue
+
+            # Höchstens cutoff + 1 Zeilen lesen, das genügt für die Entscheidung
+            start_time = time.perf_counter()
+            rows = self._evaluate_domain(cte_query, cte_queries[:index])
+            evaluation_time = time.perf_counter() - start_time
+            if len(rows) > self.cutoff:
+                self.decisions.append(InliningDecision(cte_query.target_name, None, None, evaluation_time))
+                continue
+
+            column_names = [target.target_name or target.expression.column.name
+                            for target in cte_query.query.select_clause.targets]
+            source = self._render_domain(rows, column_names)
+            self.decisions.append(InliningDecision(cte_query.target_name, len(rows),
+                                                   self.form if source is not None else None, evaluation_time))
+            if source is not None:
+                inlined_sources[cte_query.target_name] = (source, column_names)
+
+        if not inlined_sources:
+            return query
+
+        remaining_cte_queries = [cte_query for cte_query in cte_queries
+                                 if cte_query.target_name not in inlined_sources]
+        cte_clause = clauses.CommonTableExpression(remaining_cte_queries) if remaining_cte_queries else None
+        query_text = str(qal.SqlQuery(cte_clause=cte_clause, select_clause=query.select_clause,
+                                      from_clause=query.from_clause, where_clause=query.where_clause,
+                                      groupby_clause=query.groupby_clause))
+
+        # Die Namen der CTEs sind eindeutig, jede Referenz "dup_elim_outerquery AS d" wird durch die Konstanten ersetzt
+        for name, (source, column_names) in inlined_sources.items():
+            query_text = re.sub(rf"\b{re.escape(name)}\b(?:\s+AS)?\s+(\w+)",
+                                lambda match: f"{source} AS {match.group(1)}({', '.join(column_names)})",
+                                query_text)
+        return query_text
+
+    def evaluation_time(self) -> Optional[float]:
+        """
+        Returns the total time spent evaluating the domains of the last query, None if no domain has been evaluated.
+        """
+        if not self.decisions:
+            return None
+        return sum(decision.evaluation_time for decision in self.decisions)
+
+    def _evaluate_domain(self, cte_query: clauses.WithQuery, previous_cte_queries: list[clauses.WithQuery]) -> \
+            list[tuple]:
+        domain_query = cte_query.query
+        if previous_cte_queries:
+            domain_query = qal.SqlQuery(cte_clause=clauses.CommonTableExpression(previous_cte_queries),
+                                        select_clause=domain_query.select_clause,
+                                        from_clause=domain_query.from_clause, where_clause=domain_query.where_clause)
+        return self.domain_evaluator(f"{str(domain_query).rstrip().rstrip(';')} LIMIT {self.cutoff + 1};")
+
+    def _render_domain(self, rows: list[tuple], column_names: list[str]) -> Optional[str]:
+        """
+        Renders the domain as VALUES list or array. Returns None if the domain cannot be inlined, i.e. it is empty (an
+        empty VALUES list is not valid), has a value without a literal, has a column without any non-NULL value (its
+        type cannot be inferred from NULL literals) or has multiple columns in the "array" form.
+        """
+        if not rows:
+            return None
+        if any(all(row[index] is None for row in rows) for index in range(len(column_names))):
+            return None
+
+        literals = []
+        for row in rows:
+            row_literals = [self._render_literal(value) for value in row]
+            if any(literal is None for literal in row_literals):
+                return None
+            literals.append(row_literals)
+
+        if self.form == "array":
+            if len(column_names) != 1:
+                return None
+            return f"unnest(ARRAY[{', '.join(row_literals[0] for row_literals in literals)}])"
+        rendered_rows = ", ".join(f"({', '.join(row_literals)})" for row_literals in literals)
+        return f"(VALUES {rendered_rows})"
+
+    @staticmethod
+    def _render_literal(value) -> Optional[str]:
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            return "TRUE" if value else "FALSE"
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        if isinstance(value, (int, float, decimal.Decimal)):
+            return str(value)
+        if isinstance(value, str):
+            return "'" + value.replace("'", "''") + "'"
+        if isinstance(value, datetime.datetime):
+            # Der Zeitzonenversatz bleibt nur mit timestamptz erhalten
+            return f"'{value.isoformat()}'::{'timestamp' if value.tzinfo is None else 'timestamptz'}"
+        if isinstance(value, datetime.date):
+            return f"'{value.isoformat()}'::date"
+        return None
@@ -0,0 +1,189 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import Optional
+
+from postbound.qal import clauses, qal
+from postbound.qal.base import ColumnReference, TableReference
+from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression, FunctionExpression, SubqueryExpression
+from postbound.qal.predicates import AbstractPredicate, BinaryPredicate, CompoundPredicate
+
+from src.utils.utils import Utils
+
+# Aggregate, die über einer leeren Gruppe NULL liefern. Für COUNT (0 über einer leeren Gruppe) würde der innere Join
+# Tupel der äußeren Abfrage ohne passende Gruppe verlieren.
+EAGER_AGGREGATES = {"min", "max", "sum", "avg"}
+
+# Vergleiche mit NULL sind unbekannt, das Tupel wird also sowohl vom Original als auch vom inneren Join verworfen
+COMPARISON_OPERATORS = {LogicalSqlOperators.Equal, LogicalSqlOperators.NotEqual, LogicalSqlOperators.Less,
+                        LogicalSqlOperators.LessEqual, LogicalSqlOperators.Greater, LogicalSqlOperators.GreaterEqual}
+
+
+class EagerAggregationGenerator:
+    """
+    Alternative output strategy for equality-correlated aggregate subqueries, e.g.
+
+        SELECT s.name, e.course FROM students s, exams e
+        WHERE s.id = e.sid AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid)
+
+    Instead of joining the subquery input with the domain of the outer query before grouping, the subquery input is
+    grouped by its correlated columns once and the (much smaller) aggregate is joined to the outer query, as in the
+    "Join-form ohne CTE" of query1:
+
+        SELECT s.name, e.course FROM students s, exams e,
+               (SELECT min(e2.grade) AS m, e2.sid AS e2_sid FROM exams e2 GROUP BY e2.sid) AS subquery
+        WHERE s.id = e.sid AND s.id = subquery.e2_sid AND e.grade = subquery.m
+
+    The rewrite is only applied if the aggregate per key can replace the subquery:
+
+    - the subquery has no grouping, a single aggregate MIN, MAX, SUM or AVG and only base tables
+    - all correlations are equalities between a column of the subquery and a column of the outer query, all remaining
+      predicates of the subquery only reference the subquery tables
+    - the subquery is compared in a conjunct of the WHERE clause, so that tuples without a group (aggregate NULL) are
+      discarded by the original query as well
+    """
+
+    def __init__(self, alias: str = "subquery"):
+        self.alias = alias
+
+    def generate(self, query: qal.SqlQuery) -> Optional[qal.SqlQuery]:
+        """
+        Rewrites the given query with pre-aggregated subqueries. Returns None if the query does not have the required
+        shape.
+        """
+        if not self._has_supported_outer_shape(query):
+            return None
+
+        conjuncts = Utils.split_conjunction(query.where_clause.predicate)
+        subquery_conjuncts = [conjunct for conjunct in conjuncts if self._contains_subquery(conjunct)]
+        outer_conjuncts = [conjunct for conjunct in conjuncts if not self._contains_subquery(conjunct)]
+        if not subquery_conjuncts:
+            return None
+
+        outer_tables = {item.table for item in query.from_clause.items}
+        from_items = list(query.from_clause.items)
+        where_predicates = list(outer_conjuncts)
+
+        # Jede Subquery durch das vorab gruppierte Aggregat ersetzen und über die Korrelationen anbinden
+        for index, conjunct in enumerate(subquery_conjuncts):
+            if not isinstance(conjunct, BinaryPredicate) or conjunct.operation not in COMPARISON_OPERATORS:
+                return None
+            if sum(isinstance(argument, SubqueryExpression)
+                   for argument in (conjunct.first_argument, conjunct.second_argument)) != 1:
+                return None
+
+            tab_aggregate = TableReference(self.alias if index == 0 else f"{self.alias}_{index + 1}")
+            arguments = []
+            for argument in (conjunct.first_argument, conjunct.second_argument):
+                if not isinstance(argument, SubqueryExpression):
+                    arguments.append(argument)
+                    continue
+
+                aggregation = self._aggregate_subquery(argument.query, outer_tables, tab_aggregate)
+                if aggregation is None:
+                    return None
+                aggregate_query, join_predicates, aggregate_column = aggregation
+                from_items.append(clauses.SubqueryTableSource(aggregate_query, tab_aggregate.identifier()))
+                where_predicates.extend(join_predicates)
+                arguments.append(aggregate_column)
+
+            where_predicates.append(BinaryPredicate(conjunct.operation, *arguments))
+
+        return qal.SqlQuery(select_clause=query.select_clause, from_clause=clauses.From(from_items),
+                            where_clause=clauses.Where(CompoundPredicate.create_and(where_predicates)),
+                            groupby_clause=query.groupby_clause, having_clause=query.having_clause,
+                            orderby_clause=query.orderby_clause, limit_clause=query.limit_clause)
+
+    @staticmethod
+    def _has_supported_outer_shape(query: qal.SqlQuery) -> bool:
+        if query.where_clause is None or query.from_clause is None:
+            return False
+        if query.cte_clause is not None or query.having_clause is not None:
+            return False
+        if not all(isinstance(item, clauses.DirectTableSource) for item in query.from_clause.items):
+            return False
+        return not any(isinstance(target.expression, SubqueryExpression) for target in query.select_clause.targets)
+
+    @staticmethod
+    def _contains_subquery(predicate: AbstractPredicate) -> bool:
+        return any(isinstance(expression, SubqueryExpression) for expression in predicate.iterexpressions())
+
+    def _aggregate_subquery(self, subquery: qal.SqlQuery, outer_tables: set[TableReference],
+                            tab_aggregate: TableReference) -> \
+            Optional[tuple[qal.SqlQuery, list[AbstractPredicate], ColumnExpression]]:
+        """
+        Builds the subquery grouped by its correlated columns, the join predicates with the outer query and the column
+        of the aggregate. Returns None if the subquery cannot be pre-aggregated.
+        """
+        if any(clause is not None for clause in (subquery.cte_clause, subquery.groupby_clause, subquery.having_clause,
+                                                 subquery.orderby_clause, subquery.limit_clause)):
+            return None
+        if subquery.where_clause is None or len(subquery.select_clause.targets) != 1:
+            return None
+        if not all(isinstance(item, clauses.DirectTableSource) for item in subquery.from_clause.items):
+            return None
+
+        inner_tables = {item.table for item in subquery.from_clause.items}
+        if inner_tables & outer_tables:
+            return None
+
+        aggregate = subquery.select_clause.targets[0].expression
+        if not isinstance(aggregate, FunctionExpression) or aggregate.function.lower() not in EAGER_AGGREGATES \
+                or any(column.table not in inner_tables for column in aggregate.itercolumns()):
+            return None
+
+        # 1) Prädikate der Subquery in Korrelationen und Filter der Subquery-Tabellen aufteilen
+        correlations = []
+        filters = []
+        for conjunct in Utils.split_conjunction(subquery.where_clause.predicate):
+            if self._contains_subquery(conjunct):
+                return None
+            if all(column.table in inner_tables for column in conjunct.itercolumns()):
+                filters.append(conjunct)
+                continue
+
+            correlation = self._extract_correlation(conjunct, inner_tables, outer_tables)
+            if correlation is None:
+                return None
+            correlations.append(correlation)
+
+        if not correlations:
+            return None
+
+        # 2) Aggregat je Wert der korrelierten Spalten, Join-Prädikate mit der äußeren Abfrage
+        key_columns = list(dict.fromkeys(inner_column for inner_column, _ in correlations))
+        key_aliases = {column: f"{column.table.identifier()}_{column.name}" for column in key_columns}
+        select_clause = clauses.Select([clauses.BaseProjection(aggregate, "m")] +
+                                       [clauses.BaseProjection(ColumnExpression(column), key_aliases[column])
+                                        for column in key_columns])
+        where_clause = clauses.Where(CompoundPredicate.create_and(filters)) if filters else None
+        aggregate_query = qal.SqlQuery(select_clause=select_clause, from_clause=subquery.from_clause,
+                                       where_clause=where_clause,
+                                       groupby_clause=clauses.GroupBy([ColumnExpression(column)
+                                                                       for column in key_columns]))
+
+        join_predicates = [BinaryPredicate(LogicalSqlOperators.Equal, ColumnExpression(outer_column),
+                                           ColumnExpression(ColumnReference(key_aliases[inner_column], tab_aggregate)))
+                           for inner_column, outer_column in correlations]
+        return aggregate_query, join_predicates, ColumnExpression(ColumnReference("m", tab_aggregate))
+
+    @staticmethod
+    def _extract_correlation(predicate: AbstractPredicate, inner_tables: set[TableReference],
+                             outer_tables: set[TableReference]) -> Optional[tuple[ColumnReference, ColumnReference]]:
+        """
+        Returns the column of the subquery and the outer column of an equality correlation.
+        """
+        if not isinstance(predicate, BinaryPredicate) or predicate.operation != LogicalSqlOperators.Equal:
+            return None
+        if not isinstance(predicate.first_argument, ColumnExpression) or \
+                not isinstance(predicate.second_argument, ColumnExpression):
+            return None
+
+        first_column, second_column = predicate.first_argument.column, predicate.second_argument.column
+        if first_column.table in inner_tables and second_column.table in outer_tables:
+            return first_column, second_column
+        if second_column.table in inner_tables and first_column.table in outer_tables:
+            return second_column, first_column
+        return None
@@ -5,104 +5,406 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import re
 from collections import deque
+from typing import Callable, Optional
 
 from postbound.qal import transform, clauses, predicates, qal
 from postbound.qal.base import TableReference, ColumnReference
-from postbound.qal.expressions import SubqueryExpression, MathematicalExpression, FunctionExpression, SqlExpression
+from postbound.qal.expressions import SubqueryExpression, MathematicalExpression, FunctionExpression, SqlExpression, \
+    ColumnExpression, StaticValueExpression
 from postbound.qal.predicates import AbstractPredicate
-from postbound.qal.relalg import RelNode, ThetaJoin, Relation, Projection, GroupBy, Selection
+from postbound.qal.relalg import RelNode, ThetaJoin, Relation, Projection, GroupBy, Selection, Rename, SemiJoin, \
+    AntiJoin
+from src.optimizer.outer_join import LeftOuterJoin
+from src.query_generator.domain_inliner import DomainInliner
+from src.utils.key_analysis import KeyAnalysis
 from src.utils.utils import Utils
 
 
+CTE_MATERIALIZATION_MODES = ("default", "materialized", "not_materialized", "auto")
+
+
 class QueryGenerator:
-    def __init__(self, utils: Utils):
+    def __init__(self, utils: Utils, *, cte_materialization: str = "default",
+                 cardinality_estimator: Optional[Callable[[qal.SqlQuery], float]] = None,
+                 materialization_threshold: float = 100_000, key_analysis: Optional[KeyAnalysis] = None,
+                 domain_inliner: Optional[DomainInliner] = None):
+        """
+        :param cte_materialization: Emits all CTEs as MATERIALIZED or NOT MATERIALIZED, leaves the decision to
+                                    PostgreSQL ("default") or decides per CTE ("auto"), see `_materialize_cte`.
+        :param cardinality_estimator: Estimates the number of rows of a query, used by the "auto" mode.
+        :param materialization_threshold: Maximum estimated number of rows of a CTE that is materialized in the "auto"
+                                          mode.
+        :param key_analysis: Decides whether the domain columns are unique in the outer query, in which case the
+                             domain is read from the outerquery CTE without a dup_elim_outerquery CTE.
+        :param domain_inliner: Inlines small dup_elim_outerquery CTEs as constants into the generated query.
+        """
+        if cte_materialization not in CTE_MATERIALIZATION_MODES:
+            raise ValueError(f"Unknown CTE materialization mode: {cte_materialization}")
         self.utils = utils
+        self.cte_materialization = cte_materialization
+        self.cardinality_estimator = cardinality_estimator
+        self.materialization_threshold = materialization_threshold
+        self.key_analysis = key_analysis
+        self.domain_inliner = domain_inliner
+        self._domain_aliases = {}
 
-    def generate_sql_from_relalg(self, node: RelNode, subquery_root_node: RelNode):
-        subquery_root = self._find_subquery_root_node(node.root(), subquery_root_node)
-        t1 = subquery_root.left_input
+    def generate_sql_from_relalg(self, node: RelNode, subquery_root_nodes: list[RelNode]) -> qal.SqlQuery | str:
+        subquery_roots = self._find_subquery_root_nodes(node.root(), subquery_root_nodes)
+        outer_subquery_roots = self._find_direct_subquery_roots(node.root(), subquery_roots)
 
         # 1) "with outerquery AS (),": In diese Klammern kommt die Abfrage für t1.
-        sql_outerquery, outerquery_relations = self._generate_outer_query(t1)
-
-        # sidepass von t1 lesen - Hier die Spaltennamen aus dem domain extrahieren.
-        domain_columns_name = [ColumnReference(col.name) for col in next(iter(t1.sideways_pass)).mapping.keys()]
-
         # 2) dup_elim_outerquery AS (SELECT DISTINCT Spaltennamen from outerquery)
-        sql_dup_elim = self._generate_dup_elim_outer_query(domain_columns_name)
-
-        cte_clause = clauses.CommonTableExpression([sql_outerquery, sql_dup_elim])
+        #    Subqueries mit derselben t1 teilen sich outerquery und dup_elim_outerquery.
+        #    Die CTEs werden beim Hinzufügen der Subqueries in 3) erzeugt.
+        outer_queries = {}
+        cte_queries = []
+        self._domain_aliases = {}
 
         # 3) SELECT oberste Projektion FROM outerquery oq JOIN( hier leer lassen ) AS subquery ON ( leer lassen )
         #    WHERE wenn selection unter der Projektion vorhanden ist, dann die Bedingung dort einfügen
-        sql_main_query, _ = self._generate_simple_select_query(node, stop_node=subquery_root,
-                                                               additional_relations=[
-                                                                   TableReference("outerquery", "oq")])
-
-        sql_main_query_renamed = self._rename_columns_in_main_query(sql_main_query, outerquery_relations)
-        # 3-1) den leeren Join in 3) mit dem rechten Kindknoten des ersten Joins füllen
-        sql_sub_query, agg_mapping = self._generate_sub_query(subquery_root.right_input,
-                                                              stop_node=next(iter(
-                                                                  subquery_root.left_input.sideways_pass)).parent_node)
-
-        # 3-2) Die ON-Bedingung nach dem Join in 3) sollte das Prädikat des ersten Joins sein.
-        #      Im Prädikat 'd' mit 'oq' ersetzen und den Rest mit 'subquery'.
-        sql_join_predicate = self._extract_join_predicate(subquery_root)
-        sql_main_query_with_join = self._add_join_to_query(sql_main_query_renamed, sql_sub_query, sql_join_predicate)
-        sql_main_query_renamed_subquery = self._rename_subquery(sql_main_query_with_join, agg_mapping)
+        sql_main_query, _ = self._generate_simple_select_query(node, stop_nodes=outer_subquery_roots)
+        sql_main_query = self._join_subqueries(sql_main_query, outer_subquery_roots, subquery_roots, outer_queries,
+                                               cte_queries)
+
+        if self.cte_materialization != "default":
+            cte_queries = self._apply_cte_materialization(cte_queries, sql_main_query)
+        cte_clause = clauses.CommonTableExpression(cte_queries)
 
         # 1, 2, 3 in einer Zeichenkette zusammenführen und zurückgeben
-        return qal.SqlQuery(cte_clause=cte_clause, select_clause=sql_main_query_renamed_subquery.select_clause,
-                            from_clause=sql_main_query_renamed_subquery.from_clause,
-                            where_clause=sql_main_query_renamed_subquery.where_clause,
-                            groupby_clause=sql_main_query_renamed_subquery.groupby_clause)
+        final_query = qal.SqlQuery(cte_clause=cte_clause, select_clause=sql_main_query.select_clause,
+                                   from_clause=sql_main_query.from_clause,
+                                   where_clause=sql_main_query.where_clause,
+                                   groupby_clause=sql_main_query.groupby_clause)
+
+        # Kleine Domains als Konstanten einsetzen
+        if self.domain_inliner is not None:
+            return self.domain_inliner.inline(final_query)
+        return final_query
+
+    def _apply_cte_materialization(self, cte_queries: list[clauses.WithQuery],
+                                   sql_main_query: qal.SqlQuery) -> list[clauses.WithQuery]:
+        reference_counts = self._count_cte_references(cte_queries, sql_main_query)
+
+        materialized_queries = []
+        for index, cte_query in enumerate(cte_queries):
+            materialized = self._materialize_cte(cte_query, reference_counts[cte_query.target_name],
+                                                 cte_queries[:index])
+            materialized_queries.append(clauses.WithQuery(cte_query.query, cte_query.target_name,
+                                                          materialized=materialized))
+        return materialized_queries
+
+    @staticmethod
+    def _count_cte_references(cte_queries: list[clauses.WithQuery], sql_main_query: qal.SqlQuery) -> dict[str, int]:
+        # Gezählt werden die Tabellenreferenzen auf die CTEs in der Hauptabfrage, den Abfragen der CTEs und deren
+        # Unteranfragen. Namen in Zeichenketten oder als Teil anderer Namen (outerquery in dup_elim_outerquery) zählen
+        # nicht
+        reference_counts = {cte_query.target_name: 0 for cte_query in cte_queries}
+        pending_queries = [sql_main_query] + [cte_query.query for cte_query in cte_queries]
+        while pending_queries:
+            query = pending_queries.pop()
+            sources = list(query.from_clause.items) if query.from_clause else []
+            expressions = [target.expression for target in query.select_clause.targets]
+            if query.where_clause:
+                expressions.extend(query.where_clause.predicate.iterexpressions())
+
+            while sources:
+                source = sources.pop()
+                if isinstance(source, clauses.DirectTableSource):
+                    if source.table.full_name in reference_counts:
+                        reference_counts[source.table.full_name] += 1
+                elif isinstance(source, clauses.SubqueryTableSource):
+                    pending_queries.append(source.query)
+                elif isinstance(source, clauses.JoinTableSource):
+                    sources.append(source.source)
+                    if source.join_condition is not None:
+                        expressions.extend(source.join_condition.iterexpressions())
+
+            # Unteranfragen in Prädikaten, z.B. EXISTS der Semi-Joins
+            while expressions:
+                expression = expressions.pop()
+                if isinstance(expression, SubqueryExpression):
+                    pending_queries.append(expression.query)
+                else:
+                    expressions.extend(expression.iterchildren())
+        return reference_counts
+
+    def _materialize_cte(self, cte_query: clauses.WithQuery, reference_count: int,
+                         previous_cte_queries: list[clauses.WithQuery]) -> Optional[bool]:
+        """
+        Decides whether the given CTE is emitted as MATERIALIZED (True), NOT MATERIALIZED (False) or without
+        specification (None).
+
+        In the "auto" mode, CTEs referenced only once are inlined, so that PostgreSQL can push predicates into them.
+        CTEs referenced multiple times (e.g. the outerquery by the main query and the dup_elim_outerquery) are
+        materialized if their estimated cardinality does not exceed the threshold, otherwise they are computed for
+        each reference instead of writing a huge intermediate result. Without a cardinality estimate, the decision is
+        left to PostgreSQL.
+        """
+        if self.cte_materialization == "materialized":
+            return True
+        elif self.cte_materialization == "not_materialized":
+            return False
+        elif self.cte_materialization == "default":
+            return None
+
+        if reference_count <= 1:
+            return False
+
+        estimated_rows = self._estimate_cte_cardinality(cte_query, previous_cte_queries)
+        if estimated_rows is None:
+            return None
+        return estimated_rows <= self.materialization_threshold
+
+    def _estimate_cte_cardinality(self, cte_query: clauses.WithQuery,
+                                  previous_cte_queries: list[clauses.WithQuery]) -> Optional[float]:
+        if self.cardinality_estimator is None:
+            return None
+
+        # CTEs, die auf vorherige CTEs zugreifen (z.B. dup_elim_outerquery), werden zusammen mit diesen geschätzt
+        query = cte_query.query
+        if previous_cte_queries:
+            query = qal.SqlQuery(cte_clause=clauses.CommonTableExpression(previous_cte_queries),
+                                 select_clause=query.select_clause, from_clause=query.from_clause,
+                                 where_clause=query.where_clause, groupby_clause=query.groupby_clause)
+        return self.cardinality_estimator(query)
+
+    def _join_subqueries(self, sql_query: qal.SqlQuery, subquery_roots: list[RelNode],
+                         all_subquery_roots: list[RelNode], outer_queries: dict, cte_queries: list,
+                         level: int = 1) -> qal.SqlQuery:
+        """
+        Replaces the outer query of the given subquery roots in the given query by its CTE and joins the unnested
+        subqueries. Subqueries nested within these subqueries are joined recursively into their parent subquery.
+        """
+        oq_table = TableReference("outerquery", "oq" if level == 1 else f"oq{level}")
+
+        for subquery_root in subquery_roots:
+            self._register_outer_query(subquery_root, outer_queries, cte_queries)
+
+        outerquery_name, _, outerquery_relations = outer_queries[self._find_outer_query(subquery_roots[0])]
+        sql_query = self._add_relation_to_query(sql_query, TableReference(outerquery_name, oq_table.identifier()))
+        sql_query = self._rename_columns_in_main_query(sql_query, outerquery_relations, oq_table)
+
+        for subquery_root in subquery_roots:
+            subquery_index = next(i for i, root in enumerate(all_subquery_roots) if root is subquery_root)
+            subquery_alias = f"subquery_{subquery_index + 1}" if subquery_index else "subquery"
+            domain_table = self._find_domain_table(subquery_root)
+            domain = self._find_domain_node(subquery_root)
+            _, dup_elim_name, _ = outer_queries[self._find_outer_query(subquery_root)]
+            nested_subquery_roots = self._find_direct_subquery_roots(self.utils.subquery_input(subquery_root),
+                                                                     all_subquery_roots)
+
+            # 3-1) den leeren Join in 3) mit dem rechten Kindknoten des Joins füllen
+            sql_sub_query, agg_mapping = self._generate_sub_query(self.utils.subquery_input(subquery_root),
+                                                                  stop_node=domain, dup_elim_name=dup_elim_name,
+                                                                  domain_alias=domain_table.identifier(),
+                                                                  stop_nodes=nested_subquery_roots,
+                                                                  domain_relations=self._domain_relations(
+                                                                      outer_queries))
+            if nested_subquery_roots:
+                sql_sub_query = self._join_subqueries(sql_sub_query, nested_subquery_roots, all_subquery_roots,
+                                                      outer_queries, cte_queries, level + 1)
+
+            # 3-2) Die ON-Bedingung nach dem Join in 3) sollte das Prädikat des Joins sein.
+            #      Im Prädikat 'd' mit 'oq' ersetzen und den Rest mit dem Alias der Subquery.
+            sql_join_predicate = self._extract_join_predicate(subquery_root, subquery_alias, oq_table=oq_table,
+                                                              domain_table=domain_table)
+            if isinstance(subquery_root, (SemiJoin, AntiJoin)):
+                # Semi- und Anti-Joins als (NOT) EXISTS über die entschachtelte Subquery
+                sql_query = self._add_semi_join_to_query(sql_query, sql_sub_query, sql_join_predicate, subquery_alias,
+                                                         negated=isinstance(subquery_root, AntiJoin))
+            elif isinstance(subquery_root, LeftOuterJoin):
+                # Skalare Aggregate per LEFT JOIN anbinden, fehlende COUNT-Werte werden zu 0
+                sql_query = self._add_outer_join_to_query(sql_query, sql_sub_query, sql_join_predicate,
+                                                          subquery_alias, oq_table=oq_table)
+                sql_query = self._rename_subquery(sql_query, agg_mapping, sql_sub_query, subquery_alias,
+                                                  outer_join=True)
+            else:
+                sql_query = self._add_join_to_query(sql_query, sql_sub_query, sql_join_predicate, subquery_alias)
+                sql_query = self._rename_subquery(sql_query, agg_mapping, sql_sub_query, subquery_alias)
+
+        return sql_query
+
+    def _register_outer_query(self, subquery_root: RelNode, outer_queries: dict, cte_queries: list) -> None:
+        """
+        Generates the outerquery and dup_elim_outerquery CTEs for the outer query (t1) of the given subquery root,
+        unless they have already been generated for another subquery with the same t1. If the domain of the subquery
+        has been eliminated, no dup_elim_outerquery CTE is necessary for it.
+        """
+        t1 = self._find_outer_query(subquery_root)
+        domain = self._find_domain_node(subquery_root)
+
+        if t1 not in outer_queries:
+            suffix = f"_{len(outer_queries) + 1}" if outer_queries else ""
+            outerquery_name = f"outerquery{suffix}"
+            sql_outerquery, outerquery_relations = self._generate_outer_query(
+                t1, outerquery_name, domain_relations=self._domain_relations(outer_queries),
+                required_columns=self._required_outer_query_columns(subquery_root))
+
+            cte_queries.append(sql_outerquery)
+            outer_queries[t1] = (outerquery_name, None, outerquery_relations)
+
+        outerquery_name, dup_elim_name, outerquery_relations = outer_queries[t1]
+        if domain is None or dup_elim_name is not None:
+            return
+
+        # Sind die Domain-Spalten in t1 eindeutig, wäre das DISTINCT wirkungslos: Die Domain wird dann direkt aus
+        # outerquery gelesen und keine dup_elim_outerquery erzeugt
+        if self.key_analysis is not None and self.key_analysis.is_unique(t1, domain.input_node.mapping.keys()):
+            outer_queries[t1] = (outerquery_name, outerquery_name, outerquery_relations)
+            self._domain_aliases[t1] = self.utils.domain_table(domain).identifier()
+            return
+
+        # Rename der Domain lesen - Hier die Spaltennamen aus dem domain extrahieren.
+        dup_elim_name = outerquery_name.replace("outerquery", "dup_elim_outerquery", 1)
+        domain_columns_name = [ColumnReference(col.name) for col in domain.input_node.mapping.keys()]
+        sql_dup_elim = self._generate_dup_elim_outer_query(domain_columns_name, outerquery_name, dup_elim_name)
+
+        cte_queries.append(sql_dup_elim)
+        outer_queries[t1] = (outerquery_name, dup_elim_name, outerquery_relations)
+        self._domain_aliases[t1] = self.utils.domain_table(domain).identifier()
+
+    def _required_outer_query_columns(self, subquery_root: RelNode) -> frozenset[ColumnReference]:
+        """
+        Determines the columns the outerquery CTE has to provide: all columns of t1 referenced above t1 in the rewritten
+        tree, including the join predicates of all subqueries sharing t1.
+        """
+        return self.utils.attribute_analysis.required_columns(self._find_outer_query_position(subquery_root))
+
+    def _domain_relations(self, outer_queries: dict) -> dict:
+        """
+        Maps the outer query (t1) of each generated domain to the dup_elim_outerquery CTE replacing the domain.
+        """
+        return {t1: TableReference(dup_elim_name, self._domain_aliases[t1])
+                for t1, (_, dup_elim_name, _) in outer_queries.items() if dup_elim_name is not None}
+
+    def _find_outer_query(self, subquery_root: RelNode) -> RelNode:
+        domain = self._find_domain_node(subquery_root)
+        if domain is not None:
+            return domain.input_node.input_node
+
+        # Die Domain wurde eliminiert: t1 ist der linke Eingabeknoten ohne die Joins vorheriger Subqueries
+        return self._find_outer_query_position(subquery_root)
+
+    def _find_outer_query_position(self, subquery_root: RelNode) -> RelNode:
+        """
+        Finds t1 at its position in the tree, i.e. below the joins of all subqueries sharing t1.
+        """
+        outer_query = self.utils.outer_input(subquery_root)
+        while isinstance(outer_query, (ThetaJoin, LeftOuterJoin, SemiJoin, AntiJoin)) and \
+                self._find_domain_table(outer_query) is not None:
+            outer_query = self.utils.outer_input(outer_query)
+        return outer_query
+
+    def _find_domain_table(self, subquery_root: RelNode) -> Optional[TableReference]:
+        """
+        Determines the domain table joined by the given subquery root from its join predicate.
+        """
+        for column in self.utils.attribute_analysis.attributes(subquery_root).columns:
+            if self.utils.is_domain_table(column.table):
+                return column.table
+        return None
 
     @staticmethod
-    def _find_subquery_root_node(node: RelNode, subquery_root_node: RelNode):
+    def _contains_node(node: RelNode, target: RelNode) -> bool:
         queue = deque([node])
         while queue:
             current = queue.popleft()
-            if str(current) == str(subquery_root_node):
+            if current is target:
+                return True
+            queue.extend(current.children())
+        return False
+
+    def _find_direct_subquery_roots(self, node: RelNode, subquery_roots: list[RelNode]) -> list[RelNode]:
+        """
+        Finds the subquery roots within the given node which are not nested in another subquery root below the node.
+        """
+        contained_roots = [root for root in subquery_roots if root is not node and self._contains_node(node, root)]
+        return [root for root in contained_roots
+                if not any(other is not root and self._contains_node(self.utils.subquery_input(other), root)
+                           for other in contained_roots)]
+
+    def _find_subquery_root_nodes(self, node: RelNode, subquery_root_nodes: list[RelNode]) -> list[RelNode]:
+        """
+        Finds the current instances of the given subquery roots in the tree via their provenance in the rewrite context.
+        """
+        rewrite_context = self.utils.rewrite_context
+        provenance_ids = [rewrite_context.register(subquery_root_node) for subquery_root_node in subquery_root_nodes]
+        resolved_nodes = rewrite_context.resolve(node)
+
+        found_nodes = []
+        for provenance_id in provenance_ids:
+            if provenance_id in resolved_nodes:
+                found_nodes.append(resolved_nodes[provenance_id])
+        return found_nodes
+
+    def _find_domain_node(self, subquery_root: RelNode) -> Optional[Projection]:
+        """
+        Finds the domain node (projection over the renamed outer query) of the given subquery root. Returns None if the
+        domain has been eliminated during the push-down.
+        """
+        domain_table = self._find_domain_table(subquery_root)
+        queue = deque([self.utils.subquery_input(subquery_root)])
+        while queue:
+            current = queue.popleft()
+            if self.utils.is_domain_node(current) and self.utils.domain_table(current) == domain_table:
                 return current
             queue.extend(current.children())
-
-    def _generate_outer_query(self, node: RelNode) -> (clauses.WithQuery, list[clauses.DirectTableSource]):
-        inner_query, relations = self._generate_simple_select_query(node,
-                                                                    column_generator=self.utils.find_all_dependent_columns)
-        outer_query = clauses.WithQuery(inner_query, "outerquery")
+        return None
+
+    def _generate_outer_query(self, node: RelNode, name: str = "outerquery", *, domain_relations: dict = None,
+                              required_columns: frozenset[ColumnReference] = None) -> (
+            clauses.WithQuery, list[clauses.DirectTableSource]):
+        if required_columns:
+            inner_query, relations = self._generate_simple_select_query(node, required_columns=required_columns,
+                                                                        domain_relations=domain_relations)
+        else:
+            inner_query, relations = self._generate_simple_select_query(
+                node, column_generator=self.utils.find_all_dependent_columns, domain_relations=domain_relations)
+        outer_query = clauses.WithQuery(inner_query, name)
         return outer_query, relations
 
     @staticmethod
-    def _generate_dup_elim_outer_query(distinct_columns: [ColumnReference]) -> clauses.WithQuery:
-        outerquery = TableReference("outerquery")
+    def _generate_dup_elim_outer_query(distinct_columns: [ColumnReference], outerquery_name: str = "outerquery",
+                                       name: str = "dup_elim_outerquery") -> clauses.WithQuery:
+        outerquery = TableReference(outerquery_name)
         select_clause = clauses.Select([clauses.BaseProjection(col) for col in distinct_columns],
                                        clauses.SelectType.SelectDistinct)
         from_clause = clauses.From([clauses.DirectTableSource(outerquery)])
 
         sql_dup_elim = qal.SqlQuery(select_clause=select_clause, from_clause=from_clause)
 
-        outer_query = clauses.WithQuery(sql_dup_elim, "dup_elim_outerquery")
+        outer_query = clauses.WithQuery(sql_dup_elim, name)
         return outer_query
 
-    def _extract_join_predicate(self, join_node: ThetaJoin):
-        tab_d = TableReference("domain", "d")
-        tab_oq = TableReference("outerquery", "oq")
-        tab_subquery = TableReference("subquery", "subquery")
-
-        column_mapping = {}
-
-        for column in join_node.predicate.itercolumns():
-            if column.table.identifier() == tab_d.identifier():
-                column_oq = ColumnReference(column.name, tab_oq)
-                column_mapping[column] = column_oq
-            else:
-                column_sub = ColumnReference(column.name, tab_subquery)
-                column_mapping[column] = column_sub
-
-        return transform.rename_columns_in_predicate(join_node.predicate, column_mapping)
-
-    def _generate_sub_query(self, node: RelNode, *, stop_node: RelNode = None) -> (
-            qal.SqlQuery, list):
+    def _extract_join_predicate(self, join_node: RelNode, subquery_alias: str = "subquery", *,
+                                oq_table: TableReference = None, domain_table: TableReference = None):
+        tab_d = domain_table if domain_table else TableReference("domain", "d")
+        tab_oq = oq_table if oq_table else TableReference("outerquery", "oq")
+        tab_subquery = TableReference(subquery_alias, subquery_alias)
+        outer_tables = {table.identifier()
+                        for table in self.utils.attribute_analysis.tables(self.utils.outer_input(join_node))}
+
+        join_predicates = []
+        for predicate in self.utils.split_conjunction(join_node.predicate):
+            columns = set(predicate.itercolumns())
+            is_domain_predicate = any(column.table.identifier() == tab_d.identifier() for column in columns)
+
+            # Domain-Prädikate: 'd' mit 'oq' ersetzen und den Rest mit dem Alias der Subquery.
+            # Weitere Prädikate (z.B. aus IN): Spalten von t1 mit 'oq' ersetzen und den Rest mit dem Alias der Subquery.
+            column_mapping = {}
+            for column in columns:
+                if column.table.identifier() == tab_d.identifier() or (
+                        not is_domain_predicate and column.table.identifier() in outer_tables):
+                    column_mapping[column] = ColumnReference(column.name, tab_oq)
+                else:
+                    column_mapping[column] = ColumnReference(column.name, tab_subquery)
+            join_predicates.append(transform.rename_columns_in_predicate(predicate, column_mapping))
+
+        return predicates.CompoundPredicate.create_and(join_predicates)
+
+    def _generate_sub_query(self, node: RelNode, *, stop_node: RelNode = None,
+                            dup_elim_name: str = "dup_elim_outerquery", domain_alias: str = "d",
+                            stop_nodes: list[RelNode] = None, domain_relations: dict = None) -> (qal.SqlQuery, list):
         select_projections = []
         where_conditions = []
         groupby_columns = []
@@ -112,25 +414,52 @@ class QueryGenerator:
         agg_mapping = {}
         agg_count = 1
 
-        dup_elim_outerquery = TableReference("dup_elim_outerquery", "d")
-        relations.append(clauses.DirectTableSource(dup_elim_outerquery))
+        # Spalten, die anstelle der eliminierten Domain-Spalten verwendet werden
+        domain_substitutes = {}
+
+        # Die oberste Projektion liefert das Ergebnis der Subquery, aus weiteren Projektionen werden nur die
+        # außerhalb der Subquery benötigten Spalten übernommen
+        required_columns = self.utils.attribute_analysis.required_columns(node)
+        projected_expressions = set()
+        top_projection_found = False
+
+        if stop_node is not None:
+            dup_elim_outerquery = TableReference(dup_elim_name, domain_alias)
+            relations.append(clauses.DirectTableSource(dup_elim_outerquery))
 
         while queue:
             current = queue.popleft()
 
+            # Verschachtelte Subqueries werden separat erzeugt und anschließend hinzugefügt
+            if stop_nodes and any(current is nested_node for nested_node in stop_nodes):
+                continue
+
+            # Domains anderer Subqueries durch die zugehörige dup_elim_outerquery ersetzen
+            if current is not stop_node and self.utils.is_domain_node(current) and domain_relations:
+                domain_relation = domain_relations.get(current.input_node.input_node)
+                if domain_relation is not None:
+                    relations.append(clauses.DirectTableSource(domain_relation))
+                    continue
+
             if isinstance(current, Relation):
                 relations.append(clauses.DirectTableSource(current.table))
             elif isinstance(current, Projection):
                 columns = []
                 for col in current.columns:
+                    if col in projected_expressions:
+                        continue
                     if re.search(r'\b(AVG|SUM|COUNT|MIN|MAX)\b', str(col), re.IGNORECASE):
                         alias = f"m{agg_count}"
                         columns.append(clauses.BaseProjection(col, alias))
                         agg_mapping[col] = alias
                         agg_count += 1
-                    else:
+                    elif not top_projection_found or set(col.itercolumns()) <= required_columns:
                         columns.append(clauses.BaseProjection(col))
+                    else:
+                        continue
+                    projected_expressions.add(col)
 
+                top_projection_found = True
                 select_projections += columns
             elif isinstance(current, GroupBy):
                 groupby_columns.append(current.group_columns)
@@ -138,18 +467,24 @@ class QueryGenerator:
             elif isinstance(current, (ThetaJoin, Selection)):
                 where_conditions.append(current.predicate)
 
-            if not stop_node or stop_node not in current.children():
-                queue.extend(current.children())
-            else:
-                children_without_stop_node = [child for child in current.children() if child != stop_node]
-                queue.extend(children_without_stop_node)
+            elif isinstance(current, Rename):
+                domain_substitutes.update({domain_column: input_column
+                                           for input_column, domain_column in current.mapping.items()})
+
+            # Die Domain wird über die Identität erkannt, eine gleiche Kopie an anderer Stelle bleibt erhalten
+            queue.extend(child for child in current.children() if stop_node is None or child is not stop_node)
+
+        flat_groupby_columns = [col for sublist in groupby_columns for col in sublist] if groupby_columns else []
+
+        if domain_substitutes:
+            select_projections, where_conditions, flat_groupby_columns = self._substitute_domain_columns(
+                domain_substitutes, select_projections, where_conditions, flat_groupby_columns)
 
         select_clause = clauses.Select(select_projections)
         from_clause = clauses.From(relations)
         where_clause = clauses.Where(
             predicates.CompoundPredicate.create_and(where_conditions)) if where_conditions else None
 
-        flat_groupby_columns = [col for sublist in groupby_columns for col in sublist] if groupby_columns else []
         groupby_clause = clauses.GroupBy(flat_groupby_columns) if flat_groupby_columns else None
 
         sql_query = qal.SqlQuery(select_clause=select_clause, from_clause=from_clause, where_clause=where_clause,
@@ -158,8 +493,36 @@ class QueryGenerator:
         return sql_query, agg_mapping
 
     @staticmethod
-    def _generate_simple_select_query(node: RelNode, *, column_generator=None, stop_node=None,
-                                      additional_relations: [TableReference] = None) -> (
+    def _substitute_domain_columns(domain_substitutes: dict, select_projections: list, where_conditions: list,
+                                   groupby_columns: list) -> (list, list, list):
+        """
+        Replaces the columns of an eliminated domain by the subquery columns standing in for them. Projected domain
+        columns keep their name as alias, so that the join predicate of the main query remains valid.
+        """
+        substituted_projections = []
+        for projection in select_projections:
+            expression = projection.expression
+            if isinstance(expression, ColumnExpression) and expression.column in domain_substitutes:
+                substituted_projections.append(
+                    clauses.BaseProjection(ColumnExpression(domain_substitutes[expression.column]),
+                                           expression.column.name))
+            else:
+                substituted_projections.append(
+                    clauses.BaseProjection(transform.rename_columns_in_expression(expression, domain_substitutes),
+                                           projection.target_name))
+
+        substituted_conditions = [transform.rename_columns_in_predicate(condition, domain_substitutes)
+                                  for condition in where_conditions]
+        substituted_groupby_columns = [transform.rename_columns_in_expression(column, domain_substitutes)
+                                       for column in groupby_columns]
+
+        return substituted_projections, substituted_conditions, substituted_groupby_columns
+
+    def _generate_simple_select_query(self, node: RelNode, *, column_generator=None,
+                                      required_columns: frozenset[ColumnReference] = None,
+                                      stop_nodes: list[RelNode] = None,
+                                      additional_relations: [TableReference] = None,
+                                      domain_relations: dict = None) -> (
             qal.SqlQuery, list[clauses.DirectTableSource]):
         select_projections = []
         where_conditions = []
@@ -174,13 +537,22 @@ class QueryGenerator:
         while queue:
             current = queue.popleft()
 
-            if current == stop_node:
+            if stop_nodes and any(current is stop_node for stop_node in stop_nodes):
                 continue
 
+            # Domains bereits erzeugter Subqueries durch die zugehörige dup_elim_outerquery ersetzen
+            if domain_relations and self.utils.is_domain_node(current):
+                domain_relation = domain_relations.get(current.input_node.input_node)
+                if domain_relation is not None:
+                    relations.append(clauses.DirectTableSource(domain_relation))
+                    continue
+
             if isinstance(current, Relation):
                 relations.append(clauses.DirectTableSource(current.table))
             elif isinstance(current, Projection):
-                columns = [clauses.BaseProjection(col) for col in current.columns]
+                # Nur Spalten übernehmen, die außerhalb des Knotens benötigt werden
+                columns = [clauses.BaseProjection(col) for col in current.columns
+                           if required_columns is None or set(col.itercolumns()) <= required_columns]
                 select_projections += columns
             elif isinstance(current, GroupBy):
                 groupby_columns.append(current.group_columns)
@@ -193,6 +565,12 @@ class QueryGenerator:
             additional_columns = column_generator(node, node.root())
             select_projections += [clauses.BaseProjection(col) for col in additional_columns]
 
+        if required_columns:
+            projected_columns = {projection.expression for projection in select_projections}
+            select_projections += [clauses.BaseProjection(ColumnExpression(col))
+                                   for col in sorted(required_columns, key=str)
+                                   if ColumnExpression(col) not in projected_columns]
+
         select_clause = clauses.Select(select_projections)
         from_clause = clauses.From(relations)
         where_clause = clauses.Where(
@@ -209,8 +587,8 @@ class QueryGenerator:
 
     @staticmethod
     def _add_join_to_query(base_query: qal.SqlQuery, sub_query: qal.SqlQuery,
-                           on_condition: AbstractPredicate) -> qal.SqlQuery:
-        subquery_source = clauses.SubqueryTableSource(sub_query, "subquery")
+                           on_condition: AbstractPredicate, subquery_alias: str = "subquery") -> qal.SqlQuery:
+        subquery_source = clauses.SubqueryTableSource(sub_query, subquery_alias)
 
         if base_query.from_clause:
             new_from_items = list(base_query.from_clause.items) + [subquery_source]
@@ -230,35 +608,89 @@ class QueryGenerator:
         return new_query
 
     @staticmethod
-    def _rename_subquery(main_query: qal.SqlQuery, agg_mapping: dict) -> qal.SqlQuery:
+    def _add_outer_join_to_query(base_query: qal.SqlQuery, sub_query: qal.SqlQuery, on_condition: AbstractPredicate,
+                                 subquery_alias: str = "subquery", *, oq_table: TableReference = None) -> qal.SqlQuery:
+        """
+        Left-joins the given subquery to the outerquery CTE. The join is placed directly after the outerquery CTE (and
+        previous outer joins), since the ON condition may only reference tables of its own join tree.
+        """
+        tab_oq = oq_table if oq_table else TableReference("outerquery", "oq")
+        join_source = clauses.JoinTableSource(clauses.SubqueryTableSource(sub_query, subquery_alias), on_condition,
+                                              join_type=clauses.JoinType.LeftJoin)
+
+        from_items = list(base_query.from_clause.items)
+        position = next(i for i, item in enumerate(from_items)
+                        if isinstance(item, clauses.DirectTableSource)
+                        and item.table.identifier() == tab_oq.identifier()) + 1
+        while position < len(from_items) and isinstance(from_items[position], clauses.JoinTableSource):
+            position += 1
+        from_items.insert(position, join_source)
+
+        return qal.SqlQuery(select_clause=base_query.select_clause, from_clause=clauses.From(from_items),
+                            where_clause=base_query.where_clause, groupby_clause=base_query.groupby_clause)
+
+    @staticmethod
+    def _add_semi_join_to_query(base_query: qal.SqlQuery, sub_query: qal.SqlQuery, on_condition: AbstractPredicate,
+                                subquery_alias: str = "subquery", *, negated: bool = False) -> qal.SqlQuery:
+        exists_query = qal.SqlQuery(select_clause=clauses.Select([clauses.BaseProjection(StaticValueExpression(1))]),
+                                    from_clause=clauses.From([clauses.SubqueryTableSource(sub_query, subquery_alias)]),
+                                    where_clause=clauses.Where(on_condition))
+        exists_predicate = predicates.UnaryPredicate.exists(exists_query)
+        if negated:
+            exists_predicate = predicates.CompoundPredicate.create_not(exists_predicate)
+
+        if base_query.where_clause:
+            new_where_condition = predicates.CompoundPredicate.create_and(
+                [base_query.where_clause.predicate, exists_predicate])
+        else:
+            new_where_condition = exists_predicate
+
+        return qal.SqlQuery(select_clause=base_query.select_clause, from_clause=base_query.from_clause,
+                            where_clause=clauses.Where(new_where_condition), groupby_clause=base_query.groupby_clause)
+
+    @staticmethod
+    def _rename_subquery(main_query: qal.SqlQuery, agg_mapping: dict, sub_query: qal.SqlQuery = None,
+                         subquery_alias: str = "subquery", *, outer_join: bool = False) -> qal.SqlQuery:
 
         where_clause = main_query.where_clause
         select_clause = main_query.select_clause
         rename_mapping = {}
-        subquery_table = TableReference("subquery")
+        subquery_table = TableReference(subquery_alias)
+        sub_query_columns = ([target.expression for target in sub_query.select_clause.targets]
+                             if sub_query else None)
+
+        def derive_new_column(expression: SubqueryExpression):
+            # Nur Subquery-Ausdrücke umbenennen, deren Spalte von dieser Subquery geliefert wird
+            select_column = expression.query.select_clause.targets[0].expression
+            if isinstance(select_column, (MathematicalExpression, FunctionExpression)):
+                if select_column not in agg_mapping:
+                    return None
+                aggregate_column = ColumnReference(agg_mapping[select_column], subquery_table)
+
+                # Beim Outer-Join fehlt die Gruppe für leere Eingaben: COUNT muss dann 0 statt NULL liefern
+                if outer_join and isinstance(select_column, FunctionExpression) and \
+                        select_column.function.lower() == "count":
+                    return FunctionExpression("coalesce", [ColumnExpression(aggregate_column),
+                                                           StaticValueExpression(0)])
+                return aggregate_column
+            if sub_query_columns is not None and select_column not in sub_query_columns:
+                return None
+            return ColumnReference(select_column.column.name, subquery_table)
 
         if where_clause:
             for predicate in where_clause.predicate.iterexpressions():
                 if isinstance(predicate, SubqueryExpression):
-                    select_column = predicate.query.select_clause.targets[0].expression
-                    if isinstance(select_column, (MathematicalExpression, FunctionExpression)):
-                        new_column = ColumnReference(agg_mapping[select_column], subquery_table)
-                    else:
-                        new_column = ColumnReference(select_column.column.name, subquery_table)
-
-                    rename_mapping[predicate] = new_column
+                    new_column = derive_new_column(predicate)
+                    if new_column is not None:
+                        rename_mapping[predicate] = new_column
 
         if select_clause:
             for target in select_clause.targets:
                 expr = target.expression
                 if isinstance(expr, SubqueryExpression):
-                    select_column = expr.query.select_clause.targets[0].expression
-                    if isinstance(select_column, (MathematicalExpression, FunctionExpression)):
-                        new_column = ColumnReference(agg_mapping[select_column], subquery_table)
-                    else:
-                        new_column = ColumnReference(select_column.column.name, subquery_table)
-
-                    rename_mapping[expr] = new_column
+                    new_column = derive_new_column(expr)
+                    if new_column is not None:
+                        rename_mapping[expr] = new_column
 
         def rename_expression(expression: SqlExpression) -> SqlExpression:
             if isinstance(expression, SubqueryExpression) and expression in rename_mapping.keys():
@@ -270,10 +702,18 @@ class QueryGenerator:
 
         return main_query
 
+    @staticmethod
+    def _add_relation_to_query(sql_query: qal.SqlQuery, table: TableReference) -> qal.SqlQuery:
+        from_items = list(sql_query.from_clause.items) if sql_query.from_clause else []
+        from_clause = clauses.From([clauses.DirectTableSource(table)] + from_items)
+        return qal.SqlQuery(select_clause=sql_query.select_clause, from_clause=from_clause,
+                            where_clause=sql_query.where_clause, groupby_clause=sql_query.groupby_clause)
+
     @staticmethod
     def _rename_columns_in_main_query(sql_query: qal.SqlQuery,
-                                      relations: list[clauses.DirectTableSource]) -> qal.SqlQuery:
-        tab_oq = TableReference("outerquery", "oq")
+                                      relations: list[clauses.DirectTableSource],
+                                      oq_table: TableReference = None) -> qal.SqlQuery:
+        tab_oq = oq_table if oq_table else TableReference("outerquery", "oq")
 
         for relation in relations:
             sql_query = transform.rename_table(sql_query, relation.table, tab_oq)
@@ -0,0 +1,233 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import Optional
+
+from postbound.qal import clauses, qal, transform
+from postbound.qal.base import ColumnReference, TableReference
+from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression, FunctionExpression, SubqueryExpression
+from postbound.qal.predicates import AbstractPredicate, BinaryPredicate, CompoundPredicate
+
+from src.utils.utils import Utils
+
+RUNNING_AGGREGATES = {"min", "max", "sum", "avg"}
+
+COMPARISON_OPERATORS = {LogicalSqlOperators.Equal, LogicalSqlOperators.NotEqual, LogicalSqlOperators.Less,
+                        LogicalSqlOperators.LessEqual, LogicalSqlOperators.Greater, LogicalSqlOperators.GreaterEqual}
+
+# Vertauschte Operanden: v < c entspricht c > v
+FLIPPED_OPERATORS = {LogicalSqlOperators.Less: LogicalSqlOperators.Greater,
+                     LogicalSqlOperators.LessEqual: LogicalSqlOperators.GreaterEqual,
+                     LogicalSqlOperators.Greater: LogicalSqlOperators.Less,
+                     LogicalSqlOperators.GreaterEqual: LogicalSqlOperators.LessEqual}
+
+# Sortierung der Schlüssel und Reihenfolge von Domain- (1) und Datenzeilen (0) mit gleichem Schlüssel je Operator der
+# Korrelation c <op> v: Bei strikten Vergleichen steht die Domain-Zeile vor den Datenzeilen mit gleichem Schlüssel,
+# sodass diese nicht in ihr Aggregat eingehen
+WINDOW_ORDERINGS = {LogicalSqlOperators.Greater: ("DESC", "DESC"),
+                    LogicalSqlOperators.GreaterEqual: ("DESC", "ASC"),
+                    LogicalSqlOperators.Less: ("ASC", "DESC"),
+                    LogicalSqlOperators.LessEqual: ("ASC", "ASC")}
+
+
+class RunningAggregateGenerator:
+    """
+    Alternative output strategy for aggregate subqueries correlated by a range predicate, e.g.
+
+        t.production_year < (SELECT MAX(at_sub.production_year) FROM aka_title AS at_sub
+                             WHERE at_sub.production_year > t.production_year AND at_sub.kind_id < 4)
+
+    Unnesting such a subquery joins the domain with the subquery table by the range predicate, i.e. a band join with
+    O(n*m) result tuples. Instead, the subquery table is pre-aggregated per distinct value of the correlated column and
+    merged with the distinct domain values into a single sorted relation. A running aggregate (window function ordered
+    by the correlated column) then computes the aggregate for every domain value in O((n+m) log(n+m)):
+
+        running_aggregate AS (
+            SELECT key, is_domain, MAX(m) OVER (ORDER BY key DESC, is_domain DESC) AS m1
+            FROM (SELECT at_sub.production_year AS key, MAX(at_sub.production_year) AS m, 0 AS is_domain
+                  FROM aka_title AS at_sub WHERE ... GROUP BY at_sub.production_year
+                  UNION ALL
+                  SELECT d.t_production_year AS key, NULL AS m, 1 AS is_domain
+                  FROM dup_elim_outerquery AS d) AS combined)
+
+    The outer query is joined with the domain rows of the running aggregate by equality. Further equality correlations
+    partition the running aggregate. Supported are a single range correlation, any number of equality correlations
+    and the aggregates MIN, MAX, SUM and AVG, where the subquery is compared in a conjunct of the WHERE clause.
+    """
+
+    def generate(self, query: qal.SqlQuery) -> Optional[str]:
+        """
+        Returns the rewritten query or None if the query does not have the required shape.
+        """
+        if query.where_clause is None or query.from_clause is None:
+            return None
+        if any(clause is not None for clause in (query.cte_clause, query.groupby_clause, query.having_clause,
+                                                 query.orderby_clause, query.limit_clause)):
+            return None
+        if not all(isinstance(item, clauses.DirectTableSource) for item in query.from_clause.items):
+            return None
+
+        conjuncts = Utils.split_conjunction(query.where_clause.predicate)
+        subquery_conjuncts = [conjunct for conjunct in conjuncts if self._contains_subquery(conjunct)]
+        outer_conjuncts = [conjunct for conjunct in conjuncts if not self._contains_subquery(conjunct)]
+        if len(subquery_conjuncts) != 1 or not isinstance(subquery_conjuncts[0], BinaryPredicate) or \
+                subquery_conjuncts[0].operation not in COMPARISON_OPERATORS:
+            return None
+
+        comparison = subquery_conjuncts[0]
+        subquery_expression = next((argument for argument in (comparison.first_argument, comparison.second_argument)
+                                    if isinstance(argument, SubqueryExpression)), None)
+        if subquery_expression is None:
+            return None
+
+        outer_tables = {item.table for item in query.from_clause.items}
+        correlation = self._analyze_subquery(subquery_expression.query, outer_tables)
+        if correlation is None:
+            return None
+        tab_inner, aggregate, range_correlation, equality_correlations, filters = correlation
+
+        # 1) outerquery: benötigte Spalten der äußeren Abfrage unter eindeutigen Namen
+        tab_oq = TableReference("outerquery", "oq")
+        correlated_columns = [outer_column for _, outer_column in equality_correlations] + [range_correlation[2]]
+        required_columns = {column for target in query.select_clause.targets
+                            for column in target.expression.itercolumns()}
+        required_columns |= {column for argument in (comparison.first_argument, comparison.second_argument)
+                             if argument is not subquery_expression for column in argument.itercolumns()}
+        required_columns |= set(correlated_columns)
+
+        column_aliases = {column: f"{column.table.identifier()}_{column.name}"
+                          for column in sorted(required_columns, key=str)}
+        column_mapping = {column: ColumnReference(alias, tab_oq) for column, alias in column_aliases.items()}
+        outerquery_select = ", ".join(f"{column} AS {alias}" for column, alias in column_aliases.items())
+        outerquery_where = f" WHERE {CompoundPredicate.create_and(outer_conjuncts)}" if outer_conjuncts else ""
+        outerquery = f"outerquery AS (SELECT {outerquery_select} {query.from_clause}{outerquery_where})"
+
+        # 2) dup_elim_outerquery: die unterschiedlichen Werte der korrelierten Spalten
+        domain_aliases = [column_aliases[column] for column in correlated_columns]
+        domain_not_null = " AND ".join(f"{alias} IS NOT NULL" for alias in domain_aliases)
+        dup_elim = (f"dup_elim_outerquery AS (SELECT DISTINCT {', '.join(domain_aliases)} FROM outerquery "
+                    f"WHERE {domain_not_null})")
+
+        # 3) running_aggregate: vorab aggregierte Subquery-Tabelle und Domain sortiert zusammenführen
+        inner_range_column, operator, _ = range_correlation
+        partition_columns = [f"p{index + 1}" for index in range(len(equality_correlations))]
+        inner_keys = [str(inner_column) for inner_column, _ in equality_correlations] + [str(inner_range_column)]
+        key_columns = partition_columns + ["key"]
+
+        function = aggregate.function.lower()
+        argument = ", ".join(str(arg) for arg in aggregate.arguments)
+        if function == "avg":
+            data_aggregates = [f"SUM({argument}) AS s", f"COUNT({argument}) AS n"]
+            domain_aggregates = ["NULL AS s", "NULL AS n"]
+        else:
+            data_aggregates = [f"{function.upper()}({argument}) AS m"]
+            domain_aggregates = ["NULL AS m"]
+
+        data_keys = ", ".join(f"{inner_key} AS {key}" for inner_key, key in zip(inner_keys, key_columns))
+        data_filters = list(map(str, filters)) + [f"{inner_key} IS NOT NULL" for inner_key in inner_keys]
+        data_branch = (f"SELECT {data_keys}, {', '.join(data_aggregates)}, 0 AS is_domain "
+                       f"FROM {tab_inner.full_name} AS {tab_inner.identifier()} WHERE {' AND '.join(data_filters)} "
+                       f"GROUP BY {', '.join(inner_keys)}")
+        domain_keys = ", ".join(f"d.{alias} AS {key}" for alias, key in zip(domain_aliases, key_columns))
+        domain_branch = (f"SELECT {domain_keys}, {', '.join(domain_aggregates)}, 1 AS is_domain "
+                         f"FROM dup_elim_outerquery AS d")
+
+        key_order, domain_order = WINDOW_ORDERINGS[operator]
+        partitioning = f"PARTITION BY {', '.join(partition_columns)} " if partition_columns else ""
+        window = f"({partitioning}ORDER BY key {key_order}, is_domain {domain_order})"
+        if function == "avg":
+            running_aggregate = f"CAST(SUM(s) OVER {window} AS numeric) / NULLIF(SUM(n) OVER {window}, 0)"
+        else:
+            running_aggregate = f"{function.upper()}(m) OVER {window}"
+        running_aggregate_cte = (f"running_aggregate AS (SELECT {', '.join(key_columns)}, is_domain, "
+                                 f"{running_aggregate} AS m1 "
+                                 f"FROM ({data_branch} UNION ALL {domain_branch}) AS combined)")
+
+        # 4) Hauptabfrage: outerquery mit den Domain-Zeilen des laufenden Aggregats per Gleichheit verbinden
+        tab_ra = TableReference("running_aggregate", "ra")
+        select_targets = ", ".join(
+            str(transform.rename_columns_in_expression(target.expression, column_mapping))
+            + (f" AS {target.target_name}" if target.target_name else "")
+            for target in query.select_clause.targets)
+        join_predicates = ["ra.is_domain = 1"] + [f"oq.{alias} = ra.{key}"
+                                                   for alias, key in zip(domain_aliases, key_columns)]
+        aggregate_column = ColumnExpression(ColumnReference("m1", tab_ra))
+        arguments = [aggregate_column if argument is subquery_expression
+                     else transform.rename_columns_in_expression(argument, column_mapping)
+                     for argument in (comparison.first_argument, comparison.second_argument)]
+        join_predicates.append(str(BinaryPredicate(comparison.operation, *arguments)))
+
+        distinct = "DISTINCT " if query.select_clause.projection_type == clauses.SelectType.SelectDistinct else ""
+        return (f"WITH {outerquery}, {dup_elim}, {running_aggregate_cte} "
+                f"SELECT {distinct}{select_targets} FROM outerquery AS oq, running_aggregate AS ra "
+                f"WHERE {' AND '.join(join_predicates)};")
+
+    @staticmethod
+    def _contains_subquery(predicate: AbstractPredicate) -> bool:
+        return any(isinstance(expression, SubqueryExpression) for expression in predicate.iterexpressions())
+
+    def _analyze_subquery(self, subquery: qal.SqlQuery, outer_tables: set[TableReference]) -> Optional[tuple]:
+        """
+        Splits the predicates of the given subquery into the range correlation (inner column, operator relative to
+        the inner column, outer column), the equality correlations and the filters of the subquery table. Returns
+        None if the subquery does not have the required shape.
+        """
+        if subquery.groupby_clause is not None or subquery.having_clause is not None or \
+                subquery.where_clause is None or len(subquery.select_clause.targets) != 1:
+            return None
+        if len(subquery.from_clause.items) != 1 or not isinstance(subquery.from_clause.items[0],
+                                                                  clauses.DirectTableSource):
+            return None
+
+        tab_inner = subquery.from_clause.items[0].table
+        aggregate = subquery.select_clause.targets[0].expression
+        if not isinstance(aggregate, FunctionExpression) or aggregate.function.lower() not in RUNNING_AGGREGATES \
+                or aggregate.distinct or any(column.table != tab_inner for column in aggregate.itercolumns()):
+            return None
+
+        range_correlation = None
+        equality_correlations = []
+        filters = []
+        for conjunct in Utils.split_conjunction(subquery.where_clause.predicate):
+            if self._contains_subquery(conjunct):
+                return None
+            tables = {column.table for column in conjunct.itercolumns()}
+            if tables == {tab_inner}:
+                filters.append(conjunct)
+                continue
+
+            correlation = self._extract_correlation(conjunct, tab_inner, outer_tables)
+            if correlation is None:
+                return None
+            inner_column, operator, outer_column = correlation
+            if operator == LogicalSqlOperators.Equal:
+                equality_correlations.append((inner_column, outer_column))
+            elif range_correlation is None:
+                range_correlation = correlation
+            else:
+                return None
+
+        if range_correlation is None:
+            return None
+        return tab_inner, aggregate, range_correlation, equality_correlations, filters
+
+    @staticmethod
+    def _extract_correlation(predicate: AbstractPredicate, tab_inner: TableReference,
+                             outer_tables: set[TableReference]) -> \
+            Optional[tuple[ColumnReference, LogicalSqlOperators, ColumnReference]]:
+        if not isinstance(predicate, BinaryPredicate) or \
+                predicate.operation not in FLIPPED_OPERATORS and predicate.operation != LogicalSqlOperators.Equal:
+            return None
+        if not isinstance(predicate.first_argument, ColumnExpression) or \
+                not isinstance(predicate.second_argument, ColumnExpression):
+            return None
+
+        first_column, second_column = predicate.first_argument.column, predicate.second_argument.column
+        if first_column.table == tab_inner and second_column.table in outer_tables:
+            return first_column, predicate.operation, second_column
+        if second_column.table == tab_inner and first_column.table in outer_tables:
+            operator = FLIPPED_OPERATORS.get(predicate.operation, predicate.operation)
+            return second_column, operator, first_column
+        return None
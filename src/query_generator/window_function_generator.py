@@ -0,0 +1,256 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import Optional
+
+from postbound.qal import clauses, qal, transform
+from postbound.qal.base import ColumnReference, TableReference
+from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression, FunctionExpression, SubqueryExpression, \
+    WindowExpression
+from postbound.qal.predicates import AbstractPredicate, BinaryPredicate, CompoundPredicate
+
+from src.utils.utils import Utils
+
+# Aggregate, deren Ergebnis nicht davon abhängt, wie oft jedes Tupel einer Partition durch die Joins der äußeren
+# Abfrage vervielfacht wird
+WINDOW_AGGREGATES = {"min", "max", "avg"}
+
+
+class WindowFunctionGenerator:
+    """
+    Alternative output strategy for equality-correlated aggregate subqueries over a table of the outer query, e.g.
+
+        SELECT s.name, e.course FROM students s, exams e
+        WHERE s.id = e.sid AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid)
+
+    Instead of joining the unnested subquery, the aggregate is computed by a window function over the outer query,
+    partitioned by the correlation columns. This requires a single scan of the table without any CTE or self-join:
+
+        SELECT windowed.s_name, windowed.e_course
+        FROM (SELECT s.name AS s_name, e.course AS e_course, e.grade AS e_grade,
+                     min(e.grade) OVER (PARTITION BY e.sid) AS m1
+              FROM students s, exams e WHERE s.id = e.sid) AS windowed
+        WHERE windowed.e_grade = windowed.m1
+
+    The rewrite is only applied if each partition of the outer query contains exactly the tuples the subquery
+    aggregates over (possibly multiplied uniformly by the other joins):
+
+    - the subquery scans a single table which also occurs in the outer query and has no grouping
+    - all correlations are equalities between a column of the subquery table and a column of the outer query which is
+      equal to the same column of the outer occurrence of the table
+    - the outer query rejects NULL in each partition column by an equality, since the window function aggregates over
+      the NULL partition while the subquery yields NULL
+    - the remaining predicates of the subquery are exactly the filters of the outer occurrence of the table
+    - all other predicates of the outer query referencing the table only use the correlation columns
+    - the aggregate is MIN, MAX or AVG
+    """
+
+    def __init__(self, alias: str = "windowed"):
+        self.alias = alias
+
+    def generate(self, query: qal.SqlQuery) -> Optional[qal.SqlQuery]:
+        """
+        Rewrites the given query with window functions. Returns None if the query does not have the required shape.
+        """
+        if not self._has_supported_outer_shape(query):
+            return None
+
+        conjuncts = Utils.split_conjunction(query.where_clause.predicate)
+        subquery_conjuncts = [conjunct for conjunct in conjuncts if self._contains_subquery(conjunct)]
+        outer_conjuncts = [conjunct for conjunct in conjuncts if not self._contains_subquery(conjunct)]
+        if not subquery_conjuncts:
+            return None
+
+        # 1) Für jede Subquery die Fensterfunktion über die äußere Abfrage ableiten
+        window_expressions = {}
+        for conjunct in subquery_conjuncts:
+            if not isinstance(conjunct, BinaryPredicate):
+                return None
+            for argument in (conjunct.first_argument, conjunct.second_argument):
+                if isinstance(argument, SubqueryExpression):
+                    window_expression = self._derive_window_expression(argument.query, query, outer_conjuncts)
+                    if window_expression is None:
+                        return None
+                    window_expressions[argument] = window_expression
+
+        # 2) Innere Abfrage: benötigte Spalten und die Fensterfunktionen über die äußere Abfrage ohne Subqueries
+        tab_windowed = TableReference(self.alias)
+        required_columns = {column for target in query.select_clause.targets
+                            for column in target.expression.itercolumns()}
+        required_columns |= {column for conjunct in subquery_conjuncts for argument in
+                             (conjunct.first_argument, conjunct.second_argument)
+                             if not isinstance(argument, SubqueryExpression) for column in argument.itercolumns()}
+
+        column_mapping = {}
+        inner_projections = []
+        for column in sorted(required_columns, key=str):
+            column_alias = f"{column.table.identifier()}_{column.name}"
+            column_mapping[column] = ColumnReference(column_alias, tab_windowed)
+            inner_projections.append(clauses.BaseProjection(ColumnExpression(column), column_alias))
+
+        subquery_mapping = {}
+        for index, (subquery, window_expression) in enumerate(window_expressions.items()):
+            aggregate_alias = f"m{index + 1}"
+            subquery_mapping[subquery] = ColumnExpression(ColumnReference(aggregate_alias, tab_windowed))
+            inner_projections.append(clauses.BaseProjection(window_expression, aggregate_alias))
+
+        inner_where_clause = (clauses.Where(CompoundPredicate.create_and(outer_conjuncts))
+                              if outer_conjuncts else None)
+        inner_query = qal.ImplicitSqlQuery(select_clause=clauses.Select(inner_projections),
+                                           from_clause=query.from_clause, where_clause=inner_where_clause)
+
+        # 3) Äußere Abfrage: Spalten und Subqueries durch die Spalten der inneren Abfrage ersetzen
+        select_clause = clauses.Select([clauses.BaseProjection(
+            transform.rename_columns_in_expression(target.expression, column_mapping), target.target_name)
+            for target in query.select_clause.targets], query.select_clause.projection_type)
+
+        def rename_argument(argument):
+            if isinstance(argument, SubqueryExpression):
+                return subquery_mapping[argument]
+            return transform.rename_columns_in_expression(argument, column_mapping)
+
+        where_predicates = [BinaryPredicate(conjunct.operation, rename_argument(conjunct.first_argument),
+                                            rename_argument(conjunct.second_argument))
+                            for conjunct in subquery_conjuncts]
+        where_clause = clauses.Where(CompoundPredicate.create_and(where_predicates))
+
+        return qal.SqlQuery(select_clause=select_clause,
+                            from_clause=clauses.From([clauses.SubqueryTableSource(inner_query, self.alias)]),
+                            where_clause=where_clause)
+
+    @staticmethod
+    def _has_supported_outer_shape(query: qal.SqlQuery) -> bool:
+        if query.where_clause is None or query.from_clause is None:
+            return False
+        if any(clause is not None for clause in (query.cte_clause, query.groupby_clause, query.having_clause,
+                                                 query.orderby_clause, query.limit_clause)):
+            return False
+        if not all(isinstance(item, clauses.DirectTableSource) for item in query.from_clause.items):
+            return False
+        return not any(isinstance(target.expression, SubqueryExpression) for target in query.select_clause.targets)
+
+    @staticmethod
+    def _contains_subquery(predicate: AbstractPredicate) -> bool:
+        return any(isinstance(expression, SubqueryExpression) for expression in predicate.iterexpressions())
+
+    def _derive_window_expression(self, subquery: qal.SqlQuery, query: qal.SqlQuery,
+                                  outer_conjuncts: list[AbstractPredicate]) -> Optional[WindowExpression]:
+        """
+        Derives the window function replacing the given subquery, or None if the subquery cannot be replaced.
+        """
+        if subquery.groupby_clause is not None or subquery.having_clause is not None or \
+                subquery.where_clause is None or len(subquery.select_clause.targets) != 1:
+            return None
+        if len(subquery.from_clause.items) != 1 or not isinstance(subquery.from_clause.items[0],
+                                                                  clauses.DirectTableSource):
+            return None
+
+        aggregate = subquery.select_clause.targets[0].expression
+        if not isinstance(aggregate, FunctionExpression) or aggregate.function.lower() not in WINDOW_AGGREGATES \
+                or aggregate.distinct:
+            return None
+
+        # Das Vorkommen der Tabelle der Subquery in der äußeren Abfrage suchen
+        tab_inner = subquery.from_clause.items[0].table
+        outer_tables = [item.table for item in query.from_clause.items if item.table.full_name == tab_inner.full_name]
+        if len(outer_tables) != 1:
+            return None
+        tab_outer = outer_tables[0]
+        inner_to_outer = {column: ColumnReference(column.name, tab_outer)
+                          for column in subquery.where_clause.predicate.itercolumns() if column.table == tab_inner}
+        inner_to_outer |= {column: ColumnReference(column.name, tab_outer)
+                           for column in aggregate.itercolumns() if column.table == tab_inner}
+
+        # 1) Prädikate der Subquery in Korrelationen und Filter der Tabelle aufteilen
+        partition_columns = []
+        inner_filters = []
+        for conjunct in Utils.split_conjunction(subquery.where_clause.predicate):
+            tables = {column.table for column in conjunct.itercolumns()}
+            if self._contains_subquery(conjunct):
+                return None
+            if tables == {tab_inner}:
+                inner_filters.append(transform.rename_columns_in_predicate(conjunct, inner_to_outer))
+                continue
+
+            correlation = self._extract_correlation(conjunct, tab_inner)
+            if correlation is None:
+                return None
+            inner_column, outer_column = correlation
+            partition_column = inner_to_outer[inner_column]
+            if outer_column != partition_column and not self._is_equated(outer_column, partition_column,
+                                                                        outer_conjuncts):
+                return None
+            # Für NULL in der Korrelationsspalte liefert die Subquery NULL, die Fensterfunktion aggregiert dagegen über
+            # die NULL-Partition. Solche Tupel muss die äußere Abfrage bereits durch eine Gleichheit ausschließen
+            if not self._is_null_rejected(partition_column, outer_conjuncts):
+                return None
+            partition_columns.append(partition_column)
+
+        if not partition_columns:
+            return None
+
+        # 2) Die Filter der Tabelle in der äußeren Abfrage müssen mit denen der Subquery übereinstimmen, alle weiteren
+        #    Prädikate mit der Tabelle dürfen nur die Partitionsspalten verwenden
+        outer_filters = []
+        for conjunct in outer_conjuncts:
+            columns = set(conjunct.itercolumns())
+            tables = {column.table for column in columns}
+            if tab_outer not in tables:
+                continue
+            if tables == {tab_outer}:
+                outer_filters.append(conjunct)
+            elif any(column.table == tab_outer and column not in partition_columns for column in columns):
+                return None
+        if set(outer_filters) != set(inner_filters):
+            return None
+
+        window_function = transform.rename_columns_in_expression(aggregate, inner_to_outer)
+        return WindowExpression(window_function,
+                                partitioning=[ColumnExpression(column) for column in partition_columns])
+
+    @staticmethod
+    def _extract_correlation(predicate: AbstractPredicate, tab_inner: TableReference) -> \
+            Optional[tuple[ColumnReference, ColumnReference]]:
+        """
+        Returns the column of the subquery table and the outer column of an equality correlation.
+        """
+        if not isinstance(predicate, BinaryPredicate) or predicate.operation != LogicalSqlOperators.Equal:
+            return None
+        if not isinstance(predicate.first_argument, ColumnExpression) or \
+                not isinstance(predicate.second_argument, ColumnExpression):
+            return None
+
+        first_column, second_column = predicate.first_argument.column, predicate.second_argument.column
+        if first_column.table == tab_inner and second_column.table != tab_inner:
+            return first_column, second_column
+        if second_column.table == tab_inner and first_column.table != tab_inner:
+            return second_column, first_column
+        return None
+
+    @staticmethod
+    def _is_equated(first_column: ColumnReference, second_column: ColumnReference,
+                    conjuncts: list[AbstractPredicate]) -> bool:
+        for conjunct in conjuncts:
+            if not isinstance(conjunct, BinaryPredicate) or conjunct.operation != LogicalSqlOperators.Equal:
+                continue
+            if not isinstance(conjunct.first_argument, ColumnExpression) or \
+                    not isinstance(conjunct.second_argument, ColumnExpression):
+                continue
+            if {conjunct.first_argument.column, conjunct.second_argument.column} == {first_column, second_column}:
+                return True
+        return False
+
+    @staticmethod
+    def _is_null_rejected(column: ColumnReference, conjuncts: list[AbstractPredicate]) -> bool:
+        """
+        Checks whether one of the conjuncts is an equality on the given column, which excludes NULL values.
+        """
+        for conjunct in conjuncts:
+            if not isinstance(conjunct, BinaryPredicate) or conjunct.operation != LogicalSqlOperators.Equal:
+                continue
+            if any(isinstance(argument, ColumnExpression) and argument.column == column
+                   for argument in (conjunct.first_argument, conjunct.second_argument)):
+                return True
+        return False
@@ -0,0 +1,162 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import NamedTuple, Iterable, Dict, Tuple
+
+from postbound.qal.base import ColumnReference, TableReference
+from postbound.qal.relalg import RelNode, ThetaJoin, AntiJoin, SemiJoin, Map, Projection, GroupBy, Selection, Rename, \
+    Relation
+
+from src.optimizer.dependent_join import DependentJoin
+from src.optimizer.outer_join import LeftOuterJoin
+
+
+class NodeAttributes(NamedTuple):
+    columns: frozenset[ColumnReference]
+    """Columns referenced by the expressions of the node itself."""
+
+    subtree_columns: frozenset[ColumnReference]
+    """Columns referenced by the node or any node below it."""
+
+    tables: frozenset[TableReference]
+    """Tables produced by the subtree, i.e. scanned relations and the targets of renames (e.g. the domain)."""
+
+    free_columns: frozenset[ColumnReference]
+    """Columns referenced in the subtree whose tables are not produced by the subtree."""
+
+
+class AttributeAnalysis:
+    """
+    Bottom-up annotation of relalg nodes with the columns they reference and the tables they produce.
+
+    The attributes of each node are computed once and cached by node identity. Nodes created by mutating the tree
+    (e.g. by the push-down rules) are annotated lazily when they are first accessed, reusing the cached attributes of
+    all unchanged subtrees.
+    """
+
+    def __init__(self):
+        self._cache: Dict[int, Tuple[RelNode, NodeAttributes]] = {}
+
+    def attributes(self, node: RelNode) -> NodeAttributes:
+        cached = self._cache.get(id(node))
+        if cached is None or cached[0] is not node:
+            self.annotate(node)
+            cached = self._cache[id(node)]
+        return cached[1]
+
+    def annotate(self, node: RelNode) -> None:
+        """
+        Annotates all nodes of the given subtree that are not cached yet. The subtree is traversed without recursion
+        and subtrees which are already cached are not visited.
+        """
+        stack = [(node, False)]
+        while stack:
+            current, children_visited = stack.pop()
+            if self._is_cached(current):
+                continue
+
+            if children_visited:
+                self.update(current)
+            else:
+                stack.append((current, True))
+                stack.extend((child, False) for child in current.children() if not self._is_cached(child))
+
+    def update(self, node: RelNode) -> NodeAttributes:
+        """
+        (Re-)computes the attributes of the given node from the attributes of its children.
+        """
+        children_attributes = [self.attributes(child) for child in node.children()]
+        columns = frozenset(self._extract_columns(node))
+
+        subtree_columns = columns.union(*(attributes.subtree_columns for attributes in children_attributes))
+        tables = frozenset(self._extract_tables(node)).union(*(attributes.tables for attributes in children_attributes))
+        table_identifiers = {table.identifier() for table in tables}
+        free_columns = frozenset(column for column in subtree_columns
+                                 if column.table is not None and column.table.identifier() not in table_identifiers)
+
+        attributes = NodeAttributes(columns, subtree_columns, tables, free_columns)
+        self._cache[id(node)] = (node, attributes)
+        return attributes
+
+    def invalidate(self, node: RelNode) -> None:
+        """
+        Removes the given node and all of its ancestors from the cache.
+        """
+        while node is not None:
+            self._cache.pop(id(node), None)
+            node = node.parent_node
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def tables(self, node: RelNode) -> frozenset[TableReference]:
+        return self.attributes(node).tables
+
+    def free_columns(self, node: RelNode) -> frozenset[ColumnReference]:
+        return self.attributes(node).free_columns
+
+    def has_free_columns_of(self, node: RelNode, table: TableReference) -> bool:
+        table_identifier = table.identifier()
+        return any(column.table.identifier() == table_identifier for column in self.free_columns(node))
+
+    def references_any(self, node: RelNode, columns: Iterable[ColumnReference]) -> bool:
+        return not self.attributes(node).subtree_columns.isdisjoint(columns)
+
+    def required_columns(self, node: RelNode) -> frozenset[ColumnReference]:
+        """
+        Determines the columns of the given node which are referenced outside of its subtree, i.e. by its ancestors or
+        by correlated siblings. The required columns are propagated top-down along the path from the root of the tree
+        to the node and restricted to the tables produced by each node on the path.
+        """
+        path = []
+        current = node
+        while current.parent_node is not None:
+            path.append(current)
+            current = current.parent_node
+
+        required = frozenset()
+        for child in reversed(path):
+            parent = child.parent_node
+            referenced = required | self.attributes(parent).columns
+            for sibling in parent.children():
+                if sibling is not child:
+                    referenced |= self.free_columns(sibling)
+
+            table_identifiers = {table.identifier() for table in self.tables(child)}
+            required = frozenset(column for column in referenced
+                                 if column.table is not None and column.table.identifier() in table_identifiers)
+
+        return required
+
+    def _is_cached(self, node: RelNode) -> bool:
+        cached = self._cache.get(id(node))
+        return cached is not None and cached[0] is node
+
+    @staticmethod
+    def _extract_columns(node: RelNode) -> Iterable[ColumnReference]:
+        if isinstance(node, (Projection, GroupBy)):
+            node_columns = node.group_columns if isinstance(node, GroupBy) else node.columns
+            for sql_expr in node_columns:
+                yield from sql_expr.itercolumns()
+
+        if isinstance(node, (GroupBy, Map)):
+            disc = node.aggregates if isinstance(node, GroupBy) else node.mapping
+            for key_set, value_set in disc.items():
+                for expr in key_set | value_set:
+                    yield from expr.itercolumns()
+        elif isinstance(node, Rename):
+            yield from node.mapping.keys()
+        elif isinstance(node, (Selection, ThetaJoin, DependentJoin, LeftOuterJoin, SemiJoin, AntiJoin)):
+            if node.predicate:
+                yield from node.predicate.itercolumns()
+
+    @staticmethod
+    def _extract_tables(node: RelNode) -> Iterable[TableReference]:
+        if isinstance(node, Relation):
+            yield node.table
+        elif isinstance(node, Rename):
+            for column in node.mapping.values():
+                if column.table is not None:
+                    yield column.table
@@ -0,0 +1,175 @@
+import contextlib
+import hashlib
+import os
+import pickle
+import shutil
+from typing import Callable, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+SOURCE_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def code_version(source_directory: str = SOURCE_DIRECTORY) -> str:
+    """
+    Hashes all Python sources of the rewriter (and the installed postbound version), so that any change of the code
+    invalidates the cached results.
+    """
+    digest = hashlib.sha256()
+    for directory, subdirectories, files in os.walk(source_directory):
+        subdirectories[:] = sorted(subdirectory for subdirectory in subdirectories
+                                   if not subdirectory.startswith(("__", ".")))
+        for file_name in sorted(files):
+            if not file_name.endswith(".py"):
+                continue
+            path = os.path.join(directory, file_name)
+            digest.update(os.path.relpath(path, source_directory).encode())
+            with open(path, "rb") as file:
+                digest.update(file.read())
+
+    try:
+        from importlib.metadata import version
+        digest.update(version("postbound").encode())
+    except Exception:
+        # postbound ist nicht als Paket installiert (z.B. als Quellverzeichnis im Pfad)
+        pass
+    return digest.hexdigest()[:16]
+
+
+class DiskCache:
+    """
+    Content-addressed on-disk cache for parsed queries, relational algebra trees and rewritten queries. The key of an
+    entry is the hash of its kind, the SQL text and further options, the entries of each code version are stored in a
+    separate directory. Entries of other code versions are removed when the cache is opened, the least recently used
+    entries are removed once the cache exceeds its size limit.
+
+    The size of the cache is only determined from the directory when an entry is stored for the first time, afterwards
+    the sizes of the stored entries are added. The directory is scanned again once this running total exceeds the
+    size limit, entries written by parallel runs are therefore only noticed by then.
+    """
+
+    def __init__(self, directory: str = ".rewrite_cache", *, max_size: int = 256 * 1024 * 1024,
+                 version: Optional[str] = None, enabled: bool = True):
+        """
+        :param max_size: Maximum size of all entries in bytes.
+        :param version: Version of the code, by default the hash of the sources.
+        :param enabled: A disabled cache computes every value (bypass).
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.version = version if version is not None else code_version()
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._stored_size = None
+
+        if self.enabled:
+            os.makedirs(self._version_directory(), exist_ok=True)
+            self._remove_other_versions()
+
+    def get_or_compute(self, kind: str, sql: str, compute: Callable[[], T], options: Hashable = ()) -> T:
+        """
+        Returns the cached value for the given SQL text or computes and stores it.
+        """
+        if not self.enabled:
+            return compute()
+
+        path = self._entry_path(kind, sql, options)
+        value = self._load(path)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute()
+        self._store(path, value)
+        return value
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._stored_size = None
+        if self.enabled:
+            os.makedirs(self._version_directory(), exist_ok=True)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entry_stats())
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries()), "size": self.size()}
+
+    def _version_directory(self) -> str:
+        return os.path.join(self.directory, self.version)
+
+    def _entry_path(self, kind: str, sql: str, options: Hashable) -> str:
+        key = hashlib.sha256(repr((kind, sql, options)).encode()).hexdigest()
+        return os.path.join(self._version_directory(), f"{kind}_{key}.pickle")
+
+    def _entries(self) -> list[os.DirEntry]:
+        if not os.path.isdir(self._version_directory()):
+            return []
+        return [entry for entry in os.scandir(self._version_directory()) if entry.name.endswith(".pickle")]
+
+    def _entry_stats(self) -> list[tuple[os.DirEntry, int, float]]:
+        # Ein paralleler Lauf kann Einträge zwischen dem Auflisten und stat() entfernen, diese werden übersprungen
+        entry_stats = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entry_stats.append((entry, stat.st_size, stat.st_mtime))
+        return entry_stats
+
+    def _remove_other_versions(self) -> None:
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name != self.version:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    @staticmethod
+    def _load(path: str):
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Beschädigte oder nicht mehr ladbare Einträge werden verworfen
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            return None
+
+        # Zeitpunkt der letzten Verwendung für die Verdrängung aktualisieren
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return value
+
+    def _store(self, path: str, value) -> None:
+        try:
+            data = pickle.dumps(value)
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError):
+            return
+
+        # Erst vollständig schreiben, dann umbenennen, damit parallele Läufe keine halben Einträge lesen
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+        # Ein überschriebener Eintrag wird doppelt gezählt, die Summe ist also höchstens zu groß
+        if self._stored_size is None:
+            self._stored_size = self.size()
+        else:
+            self._stored_size += len(data)
+        if self._stored_size > self.max_size:
+            self._enforce_size_limit()
+
+    def _enforce_size_limit(self) -> None:
+        entry_stats = sorted(self._entry_stats(), key=lambda entry_stat: entry_stat[2])
+        total_size = sum(size for _, size, _ in entry_stats)
+        for entry, size, _ in entry_stats:
+            if total_size <= self.max_size:
+                break
+            total_size -= size
+            with contextlib.suppress(OSError):
+                os.remove(entry.path)
+        self._stored_size = total_size
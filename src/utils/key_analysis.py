@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import abc
+import json
+from typing import Iterable, Optional, TYPE_CHECKING
+
+from postbound.qal.base import ColumnReference, TableReference
+from postbound.qal.expressions import LogicalSqlOperators, ColumnExpression, StaticValueExpression
+from postbound.qal.predicates import AbstractPredicate, BinaryPredicate
+from postbound.qal.relalg import RelNode, Relation, Selection, ThetaJoin, CrossProduct, Projection, Map, SemiJoin, \
+    AntiJoin
+
+from src.utils.utils import Utils
+
+if TYPE_CHECKING:
+    from postbound.db import postgres
+
+# Eindeutige Indizes ohne Ausdrücke und Bedingung, deren Spalten nicht NULL sein können. NULL-Werte wären für DISTINCT
+# gleich, für einen UNIQUE-Index aber verschieden.
+UNIQUE_KEYS_QUERY = """
+SELECT c.relname, string_agg(a.attname, ',' ORDER BY a.attnum)
+FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+WHERE i.indisunique AND i.indpred IS NULL AND i.indexprs IS NULL
+    AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+GROUP BY i.indexrelid, c.relname, i.indisprimary
+HAVING i.indisprimary OR bool_and(a.attnotnull)
+"""
+
+
+class KeyCatalog(abc.ABC):
+    """
+    Provides the unique keys (primary keys and unique constraints over non-null columns) of the base tables.
+    """
+
+    @abc.abstractmethod
+    def unique_keys(self, table_name: str) -> list[frozenset[str]]:
+        raise NotImplementedError
+
+
+class StaticKeyCatalog(KeyCatalog):
+    """
+    Reads the unique keys from a static schema, e.g. a JSON file of the form {"students": [["id"]], ...}. Serves as a
+    local stand-in for the database catalog.
+    """
+
+    def __init__(self, keys: dict[str, list[list[str]]]):
+        self.keys = {table_name.lower(): [frozenset(column.lower() for column in key) for key in table_keys]
+                     for table_name, table_keys in keys.items()}
+
+    @staticmethod
+    def from_file(path: str) -> StaticKeyCatalog:
+        with open(path, 'r') as file:
+            return StaticKeyCatalog(json.load(file))
+
+    def unique_keys(self, table_name: str) -> list[frozenset[str]]:
+        return self.keys.get(table_name.lower(), [])
+
+
+class PostgresKeyCatalog(KeyCatalog):
+    """
+    Reads the unique keys from the catalog of the PostgreSQL database. The catalog is queried once.
+    """
+
+    def __init__(self, postgres_interface: postgres.PostgresInterface):
+        self.postgres_interface = postgres_interface
+        self._keys = None
+
+    def unique_keys(self, table_name: str) -> list[frozenset[str]]:
+        if self._keys is None:
+            self._keys = self._load_keys()
+        return self._keys.get(table_name.lower(), [])
+
+    def _load_keys(self) -> dict[str, list[frozenset[str]]]:
+        result = self.postgres_interface.execute_query(UNIQUE_KEYS_QUERY)
+        if not result:
+            return {}
+
+        # Eine einzelne Ergebniszeile wird nicht als Liste geliefert
+        rows = [result] if isinstance(result, tuple) else result
+        keys = {}
+        for table_name, key_columns in rows:
+            keys.setdefault(table_name.lower(), []).append(frozenset(key_columns.split(",")))
+        return keys
+
+
+class KeyAnalysis:
+    """
+    Decides by functional dependencies whether a set of columns is unique in the result of a relational algebra tree.
+
+    Each key of a base table determines all columns of the table, an equality of two columns determines each column by
+    the other one and an equality with a constant determines the column. The columns are unique in the result if they
+    determine a key of every base table, since the result of selections and inner joins is a subset of the cross
+    product of the base tables. Trees with other operators (e.g. grouping, outer joins, renaming) are not analyzed.
+    """
+
+    def __init__(self, key_catalog: KeyCatalog):
+        self.key_catalog = key_catalog
+
+    def is_unique(self, node: RelNode, columns: Iterable[ColumnReference]) -> bool:
+        collected = self._collect_relations_and_predicates(node)
+        if collected is None:
+            return False
+        tables, predicates = collected
+
+        determined_columns = set(columns)
+        determined_tables = set()
+        equalities = []
+        for predicate in predicates:
+            equality = self._extract_equality(predicate)
+            if equality is None:
+                continue
+            first_column, second_column = equality
+            if second_column is None:
+                determined_columns.add(first_column)
+            else:
+                equalities.append(equality)
+
+        def is_determined(column: ColumnReference) -> bool:
+            return column in determined_columns or column.table in determined_tables
+
+        # Hülle der bestimmten Spalten und Tabellen berechnen
+        changed = True
+        while changed:
+            changed = False
+            for first_column, second_column in equalities:
+                if is_determined(first_column) and not is_determined(second_column):
+                    determined_columns.add(second_column)
+                    changed = True
+                elif is_determined(second_column) and not is_determined(first_column):
+                    determined_columns.add(first_column)
+                    changed = True
+
+            for table in tables:
+                if table in determined_tables:
+                    continue
+                column_names = {column.name.lower() for column in determined_columns if column.table == table}
+                if any(key and key <= column_names for key in self.key_catalog.unique_keys(table.full_name)):
+                    determined_tables.add(table)
+                    changed = True
+
+        return all(table in determined_tables for table in tables)
+
+    @staticmethod
+    def _collect_relations_and_predicates(node: RelNode) -> Optional[tuple[list[TableReference],
+                                                                             list[AbstractPredicate]]]:
+        tables = []
+        predicates = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, Relation):
+                tables.append(current.table)
+            elif isinstance(current, Selection):
+                predicates.extend(Utils.split_conjunction(current.predicate))
+                stack.append(current.input_node)
+            elif isinstance(current, ThetaJoin):
+                predicates.extend(Utils.split_conjunction(current.predicate))
+                stack.extend([current.left_input, current.right_input])
+            elif isinstance(current, CrossProduct):
+                stack.extend([current.left_input, current.right_input])
+            elif isinstance(current, (SemiJoin, AntiJoin)):
+                # Das Ergebnis ist eine Teilmenge der Eingabe
+                stack.append(current.input_node)
+            elif isinstance(current, (Projection, Map)):
+                stack.append(current.input_node)
+            else:
+                return None
+
+        if len(set(tables)) != len(tables):
+            return None
+        return tables, predicates
+
+    @staticmethod
+    def _extract_equality(predicate: AbstractPredicate) -> Optional[tuple[ColumnReference, Optional[ColumnReference]]]:
+        """
+        Returns both columns of an equality of two columns, or the column and None for an equality with a constant.
+        """
+        if not isinstance(predicate, BinaryPredicate) or predicate.operation != LogicalSqlOperators.Equal:
+            return None
+
+        first_argument, second_argument = predicate.first_argument, predicate.second_argument
+        if isinstance(first_argument, ColumnExpression) and isinstance(second_argument, ColumnExpression):
+            return first_argument.column, second_argument.column
+        if isinstance(first_argument, ColumnExpression) and isinstance(second_argument, StaticValueExpression):
+            return first_argument.column, None
+        if isinstance(second_argument, ColumnExpression) and isinstance(first_argument, StaticValueExpression):
+            return second_argument.column, None
+        return None
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Callable, Hashable, NamedTuple, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from postbound.qal import qal
+
+# Reihenfolge der Alternativen: Kommentare und Bezeichner in Anführungszeichen werden übersprungen, bevor Zahlen
+# gesucht werden, Zahlen in Bezeichnern (z.B. t1, 15a) sind keine Literale
+TOKEN_PATTERN = re.compile(r"(?P<comment>--[^\n]*)|(?P<identifier>\"(?:[^\"]|\"\")*\")|(?P<string>'(?:[^']|'')*')"
+                           r"|(?P<number>(?<![\w.])\d+(?:\.\d+)?(?![\w.]))|(?P<whitespace>\s+)")
+
+# Nur Literale in Prädikaten werden zu Parametern von Prepared Statements, deren Typ PostgreSQL aus dem Vergleich
+# ableitet. Ordinalzahlen in ORDER BY/GROUP BY, LIMIT und Konstanten der SELECT-Liste bleiben Literale
+PARAMETER_MARKER = "\x00"
+PREDICATE_PREFIX = re.compile(r"(?:[=<>]|\b(?:i?like|between)|\bbetween\s+\x00\s+and|\bin\s*\((?:\s*\x00\s*,)*)"
+                              r"\s*[-+]?\s*$", re.IGNORECASE)
+PREDICATE_SUFFIX = re.compile(r"^\s*(?:[=<>!]|(?:not\s+)?(?:i?like|between|in)\b)", re.IGNORECASE)
+
+# Platzhalter, die beim Umschreiben anstelle der Literale eingesetzt und im Ergebnis wiedergefunden werden
+STRING_SENTINEL = "'__param_{index}__'"
+NUMBER_SENTINEL_BASE = 987_650_000
+
+
+class QueryFingerprint(NamedTuple):
+    fingerprint: str
+    """Normalized query text without comments and with all literals replaced by "?"."""
+
+    literals: list[str]
+    """Literals of the query in their order of occurrence, as written in the query."""
+
+
+class RewriteTemplate(NamedTuple):
+    segments: list[str | int]
+    """Text of the rewritten query, literals are represented by the index of their parameter."""
+
+    def bind(self, literals: list[str]) -> str:
+        return "".join(literals[segment] if isinstance(segment, int) else segment for segment in self.segments)
+
+    def parameterize(self, literals: list[str]) -> tuple[str, list[int]]:
+        """
+        Returns the text of the prepared statement and the indices of the literals bound to its parameters. Literals
+        outside of predicates are inlined into the text.
+        """
+        marked_query = "".join(PARAMETER_MARKER if isinstance(segment, int) else segment for segment in self.segments)
+        parts = []
+        parameters = []
+        position = 0
+        for segment in self.segments:
+            if not isinstance(segment, int):
+                parts.append(segment)
+                position += len(segment)
+                continue
+            if (PREDICATE_PREFIX.search(marked_query, 0, position)
+                    or PREDICATE_SUFFIX.match(marked_query[position + 1:])):
+                if segment not in parameters:
+                    parameters.append(segment)
+                parts.append(f"${parameters.index(segment) + 1}")
+            else:
+                parts.append(literals[segment])
+            position += 1
+        return "".join(parts), parameters
+
+
+class PreparedStatement(NamedTuple):
+    setup: list[str]
+    """Statements to run before the execution, i.e. DEALLOCATE of evicted and PREPARE of new statements."""
+
+    execute: str
+    query: str
+    """The rewritten query with bound literals, i.e. the query the EXECUTE statement is equivalent to."""
+
+
+def fingerprint_query(query: str) -> QueryFingerprint:
+    """
+    Normalizes the given query: comments are removed, whitespace is collapsed, keywords and identifiers are lowercased
+    and string and numeric literals are replaced by "?". Queries differing only in their literals therefore share a
+    fingerprint.
+    """
+    parts = []
+    literals = []
+    position = 0
+    for match in TOKEN_PATTERN.finditer(query):
+        parts.append(query[position:match.start()].lower())
+        position = match.end()
+        if match.lastgroup == "identifier":
+            parts.append(match.group())
+        elif match.lastgroup in ("string", "number"):
+            literals.append(match.group())
+            parts.append("?")
+        elif match.lastgroup == "whitespace":
+            parts.append(" ")
+    parts.append(query[position:].lower())
+    return QueryFingerprint("".join(parts).strip().rstrip(";").strip(), literals)
+
+
+def replace_literals(query: str, replacement: Callable[[int, str], str]) -> str:
+    """
+    Replaces each literal of the given query by the replacement for its index and kind ("string" or "number").
+    """
+    index = -1
+
+    def replace(match: re.Match) -> str:
+        nonlocal index
+        if match.lastgroup not in ("string", "number"):
+            return match.group()
+        index += 1
+        return replacement(index, match.lastgroup)
+
+    return TOKEN_PATTERN.sub(replace, query)
+
+
+class RewriteCache:
+    """
+    Caches rewritten queries by the fingerprint of the original query, so that queries differing only in their
+    literals (e.g. the JOB variants 15a-15d or a parameterized workload) are parsed, unnested and generated only once.
+
+    On a miss, the query is rewritten with a unique placeholder instead of each literal, the placeholders are then
+    located in the rewritten query and stored as parameter slots. On a hit, the literals of the query are bound into
+    these slots. The rewrite must therefore not depend on the literal values (e.g. no cardinality estimates or inlined
+    domains). The least recently used entry is evicted once the capacity is exceeded.
+    """
+
+    def __init__(self, capacity: int = 128):
+        if capacity < 1:
+            raise ValueError("The capacity of the rewrite cache must be positive")
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._templates: OrderedDict[tuple, RewriteTemplate] = OrderedDict()
+        self._prepared_statements = {}
+        self._evicted_statements = []
+
+    def rewrite(self, query: str, rewrite: Callable[[str], qal.SqlQuery | str],
+                options: Hashable = ()) -> qal.SqlQuery | str:
+        """
+        Returns the rewritten query from the cache or rewrites it with the given function.
+
+        :param options: Options of the rewrite that change the rewritten query (e.g. the CTE materialization), part of
+                        the cache key.
+        """
+        fingerprint, literals = fingerprint_query(query)
+        key = (fingerprint, options)
+
+        template = self._templates.get(key)
+        if template is not None:
+            self.hits += 1
+            self._templates.move_to_end(key)
+            return template.bind(literals)
+
+        self.misses += 1
+        template = self._create_template(query, rewrite)
+        if template is None:
+            # Die Anfrage lässt sich nicht mit Platzhaltern umschreiben und wird nicht zwischengespeichert
+            return rewrite(query)
+
+        self._templates[key] = template
+        if len(self._templates) > self.capacity:
+            evicted_key, _ = self._templates.popitem(last=False)
+            self.evictions += 1
+            if evicted_key in self._prepared_statements:
+                self._evicted_statements.extend(self._prepared_statements.pop(evicted_key).values())
+        return template.bind(literals)
+
+    def prepared_statement(self, query: str, options: Hashable = ()) -> Optional[PreparedStatement]:
+        """
+        Returns the statements to execute the cached rewrite of the given query as server-side prepared statement, or
+        None if the query is not cached. Only literals in predicates become parameters, all other literals (e.g.
+        ORDER BY ordinals or LIMIT) are part of the prepared statement. The PREPARE statement is only part of the setup
+        the first time.
+        """
+        fingerprint, literals = fingerprint_query(query)
+        key = (fingerprint, options)
+        template = self._templates.get(key)
+        if template is None:
+            return None
+
+        setup = [f"DEALLOCATE {name};" for name in self._evicted_statements]
+        self._evicted_statements = []
+        statement, parameters = template.parameterize(literals)
+        # Eingesetzte Literale außerhalb von Prädikaten unterscheiden die Prepared Statements einer Vorlage
+        statements = self._prepared_statements.setdefault(key, {})
+        if statement not in statements:
+            name = "rewrite_" + hashlib.sha1(repr((key, statement)).encode()).hexdigest()[:16]
+            statements[statement] = name
+            setup.append(f"PREPARE {name} AS {statement.rstrip().rstrip(';')};")
+
+        name = statements[statement]
+        arguments = [literals[index] for index in parameters]
+        execute = f"EXECUTE {name}({', '.join(arguments)});" if arguments else f"EXECUTE {name};"
+        return PreparedStatement(setup, execute, template.bind(literals))
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._templates)}
+
+    @staticmethod
+    def _create_template(query: str, rewrite: Callable[[str], qal.SqlQuery | str]) -> Optional[RewriteTemplate]:
+        sentinels = []
+
+        def sentinel(index: int, kind: str) -> str:
+            sentinels.append(STRING_SENTINEL.format(index=index) if kind == "string"
+                             else str(NUMBER_SENTINEL_BASE + index))
+            return sentinels[-1]
+
+        sentinel_query = replace_literals(query, sentinel)
+        if any(sentinel_value in query for sentinel_value in sentinels):
+            return None
+        rewritten_query = str(rewrite(sentinel_query))
+
+        # Platzhalter im umgeschriebenen Text durch die Indizes der Parameter ersetzen
+        sentinel_indices = {sentinel_value: index for index, sentinel_value in enumerate(sentinels)}
+        pattern = re.compile("|".join(re.escape(value) if value.startswith("'") else rf"(?<![\w.]){value}(?![\w.])"
+                                      for value in sentinels)) if sentinels else None
+        segments = []
+        position = 0
+        if pattern is not None:
+            for match in pattern.finditer(rewritten_query):
+                segments.append(rewritten_query[position:match.start()])
+                segments.append(sentinel_indices[match.group()])
+                position = match.end()
+        segments.append(rewritten_query[position:])
+        return RewriteTemplate(segments)
@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from collections import deque
+from typing import Dict, List, Optional
+
+from postbound.qal.predicates import AbstractPredicate
+from postbound.qal.relalg import RelNode
+
+
+class RewriteContext:
+    """
+    Assigns provenance IDs to nodes of a relalg tree which survive rewrites of the tree.
+
+    Nodes cannot be tracked by identity, since mutate() creates new instances of the mutated node and all of its
+    ancestors. The predicate of a join is passed on unchanged to all copies of the join though, so that joins (e.g.
+    the subquery roots created by the unnesting) are identified by the identity of their predicate. Resolving the
+    current nodes of all tracked joins requires a single pass over the tree.
+    """
+
+    def __init__(self):
+        self._provenance: Dict[int, int] = {}
+        # Referenzen auf die Prädikate halten, damit deren id() nicht wiederverwendet wird
+        self._predicates: List[AbstractPredicate] = []
+
+    def register(self, node: RelNode) -> int:
+        """
+        Returns the provenance ID of the given join, assigning a new ID if the join is not tracked yet.
+        """
+        predicate = getattr(node, "predicate", None)
+        if predicate is None:
+            raise ValueError(f"Only nodes with a predicate can be tracked, got {type(node).__name__}")
+
+        provenance_id = self._provenance.get(id(predicate))
+        if provenance_id is None:
+            provenance_id = len(self._predicates)
+            self._provenance[id(predicate)] = provenance_id
+            self._predicates.append(predicate)
+        return provenance_id
+
+    def provenance(self, node: RelNode) -> Optional[int]:
+        predicate = getattr(node, "predicate", None)
+        return self._provenance.get(id(predicate)) if predicate is not None else None
+
+    def resolve(self, root: RelNode) -> Dict[int, RelNode]:
+        """
+        Maps the provenance ID of each tracked node to its current instance in the given tree. If a node occurs
+        multiple times (e.g. within a domain), the instance closest to the root is used.
+        """
+        resolved = {}
+        queue = deque([root])
+        while queue:
+            current = queue.popleft()
+            provenance_id = self.provenance(current)
+            if provenance_id is not None and provenance_id not in resolved:
+                resolved[provenance_id] = current
+            queue.extend(current.children())
+        return resolved
+
+    def clear(self) -> None:
+        self._provenance.clear()
+        self._predicates.clear()
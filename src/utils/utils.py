@@ -3,16 +3,24 @@ import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from typing import List
+from typing import List, Optional
 
 from postbound.qal.base import ColumnReference, TableReference
-from postbound.qal.relalg import RelNode, ThetaJoin, AntiJoin, SemiJoin, Map, Projection, GroupBy, \
-    Selection, Rename
+from postbound.qal.expressions import LogicalSqlCompoundOperators
+from postbound.qal.predicates import AbstractPredicate, CompoundPredicate
+from postbound.qal.relalg import RelNode, ThetaJoin, AntiJoin, SemiJoin, Projection, Rename, CrossProduct
 
 from src.optimizer.dependent_join import DependentJoin
+from src.optimizer.outer_join import LeftOuterJoin
+from src.utils.attribute_analysis import AttributeAnalysis
+from src.utils.rewrite_context import RewriteContext
 
 
 class Utils:
+    def __init__(self):
+        self.attribute_analysis = AttributeAnalysis()
+        self.rewrite_context = RewriteContext()
+
     @staticmethod
     def detailed_structure_visualization(node, _indentation=0) -> str:
         padding = " " * _indentation
@@ -30,64 +38,115 @@ class Utils:
             inspections.append(Utils.detailed_structure_visualization(child, _indentation=_indentation + 2))
         return "\n".join(filter(None, inspections))
 
-    def find_all_dependent_columns(self, base_node: RelNode, dependent_node: RelNode) -> List[ColumnReference]:
+    @staticmethod
+    def create_domain_table(index: int = 1) -> TableReference:
         """
-        Finds all columns that are dependent between the given base node and dependent node.
+        Creates the table reference of the index-th domain. The first domain is referenced by 'd', all further
+        domains (e.g. of nested subqueries) by 'd2', 'd3', ...
+        """
+        if index == 1:
+            return TableReference("domain", "d")
+        return TableReference(f"domain_{index}", f"d{index}")
+
+    @staticmethod
+    def domain_table(domain: Projection) -> TableReference:
         """
+        Returns the table reference of the columns provided by the given domain node.
+        """
+        return next(iter(domain.columns[0].itercolumns())).table
 
-        if dependent_node == base_node:
-            return []
+    @staticmethod
+    def is_domain_table(table: TableReference) -> bool:
+        return table is not None and (table.full_name == "domain" or table.full_name.startswith("domain_"))
 
-        tables = base_node.tables()
-        dependent_columns = []
+    @staticmethod
+    def is_domain_node(node: RelNode) -> bool:
+        """
+        Checks whether the given node is a domain node, i.e. a projection over the renamed outer query which provides
+        exactly the renamed columns.
+        """
+        if not isinstance(node, Projection) or not isinstance(node.input_node, Rename):
+            return False
+        projected_columns = {column for sql_expr in node.columns for column in sql_expr.itercolumns()}
+        return projected_columns == set(node.input_node.mapping.values())
 
-        if isinstance(dependent_node, (Map, Projection, GroupBy)):
-            dependent_columns += self._extract_columns_from_simple_conditions(dependent_node, tables)
-        elif isinstance(dependent_node, (Selection, ThetaJoin, DependentJoin, SemiJoin, AntiJoin)):
-            dependent_columns += self._extract_columns_from_composite_conditions(dependent_node, tables)
+    @staticmethod
+    def split_conjunction(predicate: AbstractPredicate) -> List[AbstractPredicate]:
+        if isinstance(predicate, CompoundPredicate) and predicate.operation == LogicalSqlCompoundOperators.And:
+            return [conjunct for child in predicate.children for conjunct in Utils.split_conjunction(child)]
+        return [predicate]
 
-        for child_node in dependent_node.children():
-            dependent_columns += self.find_all_dependent_columns(base_node, child_node)
+    @staticmethod
+    def outer_input(subquery_root: RelNode) -> RelNode:
+        """
+        Returns the input of the given subquery root which provides the outer query, i.e. the left input of a join or
+        the input node of a semi- or anti-join.
+        """
+        if isinstance(subquery_root, (SemiJoin, AntiJoin)):
+            return subquery_root.input_node
+        return subquery_root.left_input
 
-        dependent_columns = list(set(dependent_columns))
-        return dependent_columns
+    @staticmethod
+    def subquery_input(subquery_root: RelNode) -> RelNode:
+        """
+        Returns the input of the given subquery root which provides the unnested subquery.
+        """
+        if isinstance(subquery_root, (SemiJoin, AntiJoin)):
+            return subquery_root.subquery_node
+        return subquery_root.right_input
 
     @staticmethod
-    def _extract_columns_from_composite_conditions(node: Selection | ThetaJoin | DependentJoin | SemiJoin | AntiJoin,
-                                                   tables: frozenset[TableReference]) -> List[ColumnReference]:
-        columns = []
-        tables_identifier = [table.identifier() for table in tables]
-        if node.predicate:
-            for column in node.predicate.itercolumns():
-                if column.table.identifier() in tables_identifier:
-                    columns.append(column)
-        return columns
+    def same_node(first: Optional[RelNode], second: Optional[RelNode]) -> bool:
+        """
+        Checks whether both nodes are the same node or equal subtrees. Different subtrees are told apart by their
+        hash values, so that the recursive comparison is only done for equal subtrees.
+        """
+        if first is second:
+            return True
+        if first is None or second is None:
+            return False
+        return hash(first) == hash(second) and first == second
 
     @staticmethod
-    def _extract_columns_from_simple_conditions(node: Rename | Map | GroupBy | Projection,
-                                                tables: frozenset[TableReference]) -> List[ColumnReference]:
-        columns = []
-        tables_identifier = [table.identifier() for table in tables]
-
-        if isinstance(node, (GroupBy, Projection)):
-            node_columns = node.group_columns if isinstance(node, GroupBy) else node.columns
-
-            for sql_expr in node_columns:
-                for column in sql_expr.itercolumns():
-                    if column.table.identifier() in tables_identifier:
-                        columns.append(column)
-
-        if isinstance(node, (GroupBy, Map, Rename)):
-            disc = node.aggregates if isinstance(node, GroupBy) else node.mapping
-            for key_set, value_set in disc.items():
-                for key_expr in key_set:
-                    for key_column in key_expr.itercolumns():
-                        if key_column.table.identifier() in tables_identifier:
-                            columns.append(key_column)
-
-                for value_expr in value_set:
-                    for value_column in value_expr.itercolumns():
-                        if value_column.table.identifier() in tables_identifier:
-                            columns.append(value_column)
-
-        return columns
+    def replace_input_node(parent_node: RelNode, input_node: RelNode, new_input_node: RelNode) -> RelNode:
+        """
+        Replaces the given input node of the parent node and returns the updated parent node.
+        """
+        # Zuerst über die Identität vergleichen, der (rekursive) Vergleich der Teilbäume ist nur für Kopien nötig
+        if isinstance(parent_node, (ThetaJoin, CrossProduct, DependentJoin, LeftOuterJoin)):
+            if parent_node.left_input is input_node or (parent_node.right_input is not input_node
+                                                        and Utils.same_node(parent_node.left_input, input_node)):
+                return parent_node.mutate(left_input=new_input_node)
+            return parent_node.mutate(right_input=new_input_node)
+        elif isinstance(parent_node, (SemiJoin, AntiJoin)):
+            if parent_node.input_node is input_node or (parent_node.subquery_node is not input_node
+                                                        and Utils.same_node(parent_node.input_node, input_node)):
+                return parent_node.mutate(input_node=new_input_node)
+            return parent_node.mutate(subquery_node=new_input_node)
+
+        return parent_node.mutate(input_node=new_input_node)
+
+    def find_all_dependent_columns(self, base_node: RelNode, dependent_node: RelNode) -> List[ColumnReference]:
+        """
+        Finds all columns that are dependent between the given base node and dependent node.
+        """
+        tables_identifier = {table.identifier() for table in self.attribute_analysis.tables(base_node)}
+        dependent_columns = set()
+
+        stack = [dependent_node]
+        while stack:
+            current = stack.pop()
+            if hash(current) == hash(base_node) and current == base_node:
+                continue
+
+            # Teilbäume ohne Spalten der Basistabellen überspringen
+            attributes = self.attribute_analysis.attributes(current)
+            if not any(column.table is not None and column.table.identifier() in tables_identifier
+                       for column in attributes.subtree_columns):
+                continue
+
+            dependent_columns.update(column for column in attributes.columns
+                                     if column.table is not None and column.table.identifier() in tables_identifier)
+            stack.extend(current.children())
+
+        return list(dependent_columns)
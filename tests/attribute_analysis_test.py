@@ -0,0 +1,55 @@
+import unittest
+
+from postbound.qal import base, expressions, predicates, relalg
+
+from src.utils.attribute_analysis import AttributeAnalysis
+
+
+class AttributeAnalysisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tab_s = base.TableReference("S")
+        self.col_s_a = base.ColumnReference("a", self.tab_s)
+        self.tab_d = base.TableReference("domain", "d")
+        self.col_d_a = base.ColumnReference("a", self.tab_d)
+
+        self.scan_s = relalg.Relation(self.tab_s, [self.col_s_a])
+        self.select_s = relalg.Selection(self.scan_s,
+                                         predicates.as_predicate(self.col_s_a, expressions.LogicalSqlOperators.Equal,
+                                                                 self.col_d_a))
+
+    def test_free_columns(self):
+        analysis = AttributeAnalysis()
+
+        self.assertEqual(analysis.free_columns(self.select_s), frozenset([self.col_d_a]))
+        self.assertEqual(analysis.free_columns(self.scan_s), frozenset())
+        self.assertTrue(analysis.has_free_columns_of(self.select_s, self.tab_d))
+        self.assertFalse(analysis.has_free_columns_of(self.select_s, self.tab_s))
+
+    def test_update_after_mutation(self):
+        analysis = AttributeAnalysis()
+        analysis.annotate(self.select_s)
+
+        updated_selection = self.select_s.mutate(
+            predicate=predicates.as_predicate(self.col_s_a, expressions.LogicalSqlOperators.Equal, 42))
+        analysis.update(updated_selection)
+
+        self.assertEqual(analysis.free_columns(updated_selection), frozenset())
+        self.assertEqual(analysis.tables(updated_selection), frozenset([self.tab_s]))
+
+    def test_required_columns(self):
+        analysis = AttributeAnalysis()
+        col_s_b = base.ColumnReference("b", self.tab_s)
+        col_s_c = base.ColumnReference("c", self.tab_s)
+        scan_s = relalg.Relation(self.tab_s, [self.col_s_a, col_s_b, col_s_c])
+        selection = relalg.Selection(scan_s, predicates.as_predicate(self.col_s_a, expressions.LogicalSqlOperators.Equal,
+                                                                     42))
+        projection = relalg.Projection(selection, [expressions.ColumnExpression(col_s_b)])
+        scan_s = projection.input_node.input_node
+
+        self.assertEqual(analysis.required_columns(scan_s), frozenset([self.col_s_a, col_s_b]))
+        self.assertEqual(analysis.required_columns(projection), frozenset())
+
+
+if __name__ == '__main__':
+    unittest.main()
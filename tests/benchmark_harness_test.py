@@ -0,0 +1,21 @@
+import unittest
+
+from src.execution.benchmark_harness import BenchmarkHarness
+
+
+class BenchmarkHarnessTest(unittest.TestCase):
+
+    def test_warmup_runs_are_not_measured(self):
+        executions = []
+        harness = BenchmarkHarness(warmup=2, repetitions=3, server_timing=lambda query: 0.5)
+
+        measurement = harness.measure(lambda: executions.append(1) or len(executions), "SELECT 1")
+
+        self.assertEqual(len(executions), 5)
+        self.assertEqual(len(measurement.times), 3)
+        self.assertEqual(measurement.result, 5)
+        self.assertEqual(measurement.server_times, [0.5, 0.5, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from src.optimizer.cost_model import CostModel
+
+
+class StubCostModel(CostModel):
+    def __init__(self, costs: dict):
+        self.costs = costs
+
+    def estimate_cost(self, query) -> float:
+        return self.costs[query]
+
+
+class CostModelTest(unittest.TestCase):
+
+    def test_choose_rewrite_if_cheaper(self):
+        cost_model = StubCostModel({"original": 100.0, "rewritten": 10.0})
+
+        query, decision = cost_model.choose_query("original", "rewritten")
+
+        self.assertEqual(query, "rewritten")
+        self.assertTrue(decision.use_rewrite)
+        self.assertEqual(decision.original_cost, 100.0)
+        self.assertEqual(decision.rewritten_cost, 10.0)
+
+    def test_keep_original_if_rewrite_is_not_cheaper(self):
+        cost_model = StubCostModel({"original": 10.0, "rewritten": 10.0})
+
+        query, decision = cost_model.choose_query("original", "rewritten")
+
+        self.assertEqual(query, "original")
+        self.assertFalse(decision.use_rewrite)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from src.utils.disk_cache import DiskCache
+
+
+class DiskCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_persists_across_instances(self):
+        DiskCache(self.directory.name, version="v1").get_or_compute("rewrite", "SELECT 1", lambda: ["rewritten"])
+
+        cache = DiskCache(self.directory.name, version="v1")
+        value = cache.get_or_compute("rewrite", "SELECT 1", lambda: self.fail("value should be cached"))
+
+        self.assertEqual(value, ["rewritten"])
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_new_version_invalidates_entries(self):
+        DiskCache(self.directory.name, version="v1").get_or_compute("rewrite", "SELECT 1", lambda: "old")
+
+        cache = DiskCache(self.directory.name, version="v2")
+
+        self.assertEqual(cache.get_or_compute("rewrite", "SELECT 1", lambda: "new"), "new")
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, "v1")))
+
+    def test_size_limit(self):
+        cache = DiskCache(self.directory.name, version="v1", max_size=1500)
+        for index in range(5):
+            cache.get_or_compute("rewrite", f"SELECT {index}", lambda: "x" * 500)
+
+        self.assertLessEqual(cache.size(), 1500)
+        self.assertGreater(cache.stats()["entries"], 0)
+
+    def test_directory_scanned_only_over_the_limit(self):
+        cache = DiskCache(self.directory.name, version="v1", max_size=1500)
+        scans = []
+        entry_stats = cache._entry_stats
+        cache._entry_stats = lambda: scans.append(1) or entry_stats()
+
+        for index in range(2):
+            cache.get_or_compute("rewrite", f"SELECT {index}", lambda: "x" * 500)
+        self.assertEqual(len(scans), 1)
+
+        for index in range(2, 5):
+            cache.get_or_compute("rewrite", f"SELECT {index}", lambda: "x" * 500)
+        self.assertLessEqual(cache.size(), 1500)
+        self.assertLess(len(scans), 6)
+
+    def test_entries_removed_by_another_process(self):
+        cache = DiskCache(self.directory.name, version="v1", max_size=1500)
+        for index in range(2):
+            cache.get_or_compute("rewrite", f"SELECT {index}", lambda: "x" * 500)
+
+        # Ein paralleler Lauf entfernt einen Eintrag zwischen dem Auflisten und stat()
+        entries = cache._entries()
+        os.remove(entries[0].path)
+        cache._entries = lambda: entries
+
+        self.assertEqual(cache.size(), os.path.getsize(entries[1].path))
+        cache.max_size = 0
+        cache._enforce_size_limit()
+        self.assertFalse(os.path.exists(entries[1].path))
+
+    def test_bypass(self):
+        cache = DiskCache(self.directory.name, version="v1", enabled=False)
+        cache.get_or_compute("rewrite", "SELECT 1", lambda: "value")
+
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import datetime
+import unittest
+
+from postbound.qal import parser
+
+from src.query_generator.domain_inliner import DomainInliner
+
+
+class DomainInlinerTest(unittest.TestCase):
+
+    def test_render_values(self):
+        inliner = DomainInliner(lambda query: [], form="values")
+
+        self.assertEqual(inliner._render_domain([(1, "CS"), (2, "O'Neil")], ["id", "major"]),
+                         "(VALUES (1, 'CS'), (2, 'O''Neil'))")
+        self.assertEqual(inliner._render_domain([(datetime.date(2019, 1, 1),)], ["date"]),
+                         "(VALUES ('2019-01-01'::date))")
+        self.assertIsNone(inliner._render_domain([], ["id"]))
+
+    def test_null_columns_keep_the_cte(self):
+        inliner = DomainInliner(lambda query: [], form="values")
+
+        self.assertIsNone(inliner._render_domain([(None,), (None,)], ["id"]))
+        self.assertIsNone(inliner._render_domain([(1, None), (2, None)], ["id", "major"]))
+        self.assertEqual(inliner._render_domain([(1, None), (2, "CS")], ["id", "major"]),
+                         "(VALUES (1, NULL), (2, 'CS'))")
+
+    def test_render_timestamps(self):
+        inliner = DomainInliner(lambda query: [], form="values")
+        offset = datetime.timezone(datetime.timedelta(hours=2))
+
+        self.assertEqual(inliner._render_domain([(datetime.datetime(2019, 1, 1, 12, 30),)], ["date"]),
+                         "(VALUES ('2019-01-01T12:30:00'::timestamp))")
+        self.assertEqual(inliner._render_domain([(datetime.datetime(2019, 1, 1, 12, 30, tzinfo=offset),)], ["date"]),
+                         "(VALUES ('2019-01-01T12:30:00+02:00'::timestamptz))")
+
+    def test_render_array(self):
+        inliner = DomainInliner(lambda query: [], form="array")
+
+        self.assertEqual(inliner._render_domain([(1,), (2,)], ["id"]), "unnest(ARRAY[1, 2])")
+        self.assertIsNone(inliner._render_domain([(1, 2)], ["id", "year"]))
+
+    def test_evaluation_time_is_recorded(self):
+        query = parser.parse_query("""
+            WITH dup_elim_outerquery AS (SELECT DISTINCT s.id FROM students s)
+            SELECT d.id FROM dup_elim_outerquery AS d""")
+        inliner = DomainInliner(lambda domain_query: [(1,), (2,)], form="values")
+
+        self.assertIsNone(inliner.evaluation_time())
+        inliner.inline(query)
+
+        self.assertEqual(len(inliner.decisions), 1)
+        self.assertEqual(inliner.decisions[0].rows, 2)
+        self.assertGreaterEqual(inliner.decisions[0].evaluation_time, 0)
+        self.assertEqual(inliner.evaluation_time(), inliner.decisions[0].evaluation_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from postbound.qal import parser
+
+from src.execution.domain_staging import DomainStaging
+
+
+class CursorStandIn:
+    """
+    Records the statements of the staging and fails on the first statement starting with `fail_on`.
+    """
+
+    def __init__(self, statements, fail_on=None):
+        self.statements = statements
+        self.fail_on = fail_on
+
+    def execute(self, statement):
+        if self.fail_on is not None and statement.startswith(self.fail_on):
+            raise RuntimeError(f"failed: {statement}")
+        self.statements.append(statement)
+
+
+class PostgresInterfaceStandIn:
+
+    def __init__(self, fail_on=None):
+        self.statements = []
+        self.fail_on = fail_on
+
+    def cursor(self):
+        return CursorStandIn(self.statements, self.fail_on)
+
+
+QUERY = """
+    WITH outerquery AS (SELECT s.id AS s_id, s.name AS s_name FROM students AS s),
+         dup_elim_outerquery AS (SELECT DISTINCT s_id FROM outerquery)
+    SELECT oq.s_name FROM outerquery AS oq, dup_elim_outerquery AS d WHERE oq.s_id = d.s_id"""
+
+
+class DomainStagingTest(unittest.TestCase):
+
+    def test_domain_is_staged_and_dropped(self):
+        postgres_interface = PostgresInterfaceStandIn()
+        executed = []
+        staging = DomainStaging(postgres_interface)
+
+        staged = staging.execute(parser.parse_query(QUERY), lambda query: executed.append(query) or "result")
+
+        self.assertEqual(staged.result, "result")
+        self.assertGreaterEqual(staged.staging_time, 0)
+        self.assertGreaterEqual(staged.query_time, 0)
+        self.assertTrue(any(statement.startswith("CREATE TEMPORARY TABLE dup_elim_outerquery AS")
+                            for statement in postgres_interface.statements))
+        self.assertIn("CREATE INDEX ON dup_elim_outerquery (s_id);", postgres_interface.statements)
+        self.assertIn("ANALYZE dup_elim_outerquery;", postgres_interface.statements)
+        self.assertEqual(postgres_interface.statements[-1], "DROP TABLE IF EXISTS dup_elim_outerquery;")
+        # Die bereitgestellte CTE ist nicht mehr Teil der Anfrage, outerquery bleibt erhalten
+        self.assertEqual(len(executed), 1)
+        self.assertNotIn("dup_elim_outerquery AS (", executed[0])
+        self.assertIn("outerquery AS (", executed[0])
+        self.assertEqual(staging.staged_tables, [])
+
+    def test_cleanup_after_failed_staging(self):
+        postgres_interface = PostgresInterfaceStandIn(fail_on="CREATE INDEX")
+        executed = []
+        staging = DomainStaging(postgres_interface)
+
+        with self.assertRaises(RuntimeError):
+            staging.execute(parser.parse_query(QUERY), executed.append)
+
+        self.assertEqual(executed, [])
+        self.assertEqual(postgres_interface.statements[-1], "DROP TABLE IF EXISTS dup_elim_outerquery;")
+        self.assertEqual(staging.staged_tables, [])
+
+    def test_queries_without_domain_are_unchanged(self):
+        postgres_interface = PostgresInterfaceStandIn()
+        executed = []
+        staging = DomainStaging(postgres_interface)
+
+        staging.execute("SELECT s.name FROM students s;", executed.append)
+        staging.execute(parser.parse_query("SELECT s.name FROM students AS s"), executed.append)
+
+        self.assertEqual(executed[0], "SELECT s.name FROM students s;")
+        self.assertEqual(postgres_interface.statements, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
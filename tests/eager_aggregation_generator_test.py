@@ -0,0 +1,66 @@
+import unittest
+
+from postbound.qal import clauses, parser
+
+from src.query_generator.eager_aggregation_generator import EagerAggregationGenerator
+
+
+class EagerAggregationGeneratorTest(unittest.TestCase):
+
+    def test_query1(self):
+        query = parser.parse_query("""
+            SELECT s.name, e.course FROM students s, exams e
+            WHERE s.id = e.sid AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid)""")
+
+        result = EagerAggregationGenerator().generate(query)
+
+        self.assertIsNotNone(result)
+        aggregate_source = result.from_clause.items[-1]
+        self.assertIsInstance(aggregate_source, clauses.SubqueryTableSource)
+        self.assertEqual(aggregate_source.target_name, "subquery")
+        self.assertIn("GROUP BY e2.sid", str(aggregate_source.query))
+        self.assertIn("e2.sid AS e2_sid", str(aggregate_source.query))
+        self.assertIn("s.id = subquery.e2_sid", str(result.where_clause))
+        self.assertIn("e.grade = subquery.m", str(result.where_clause))
+
+    def test_multiple_correlations_and_subqueries(self):
+        query = parser.parse_query("""
+            SELECT s.name FROM students s, exams e
+            WHERE s.id = e.sid
+                AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE e2.sid = s.id AND e2.course = e.course)
+                AND s.year < (SELECT max(e3.grade) FROM exams e3 WHERE e3.sid = s.id)""")
+
+        result = EagerAggregationGenerator().generate(query)
+
+        self.assertIsNotNone(result)
+        self.assertEqual([item.target_name for item in result.from_clause.items[2:]], ["subquery", "subquery_2"])
+        where_clause = str(result.where_clause)
+        self.assertIn("s.id = subquery.e2_sid", where_clause)
+        self.assertIn("e.course = subquery.e2_course", where_clause)
+        self.assertIn("s.id = subquery_2.e3_sid", where_clause)
+        self.assertIn("s.year < subquery_2.m", where_clause)
+
+    def test_count_is_not_rewritten(self):
+        query = parser.parse_query("""
+            SELECT s.name FROM students s
+            WHERE s.year = (SELECT count(e2.grade) FROM exams e2 WHERE s.id = e2.sid)""")
+
+        self.assertIsNone(EagerAggregationGenerator().generate(query))
+
+    def test_shared_table_is_not_rewritten(self):
+        query = parser.parse_query("""
+            SELECT s.name, e.course FROM students s, exams e
+            WHERE s.id = e.sid AND e.grade = (SELECT min(e.grade) FROM exams e WHERE s.id = e.sid)""")
+
+        self.assertIsNone(EagerAggregationGenerator().generate(query))
+
+    def test_range_correlation_is_not_rewritten(self):
+        query = parser.parse_query("""
+            SELECT s.name FROM students s
+            WHERE s.year < (SELECT max(e2.grade) FROM exams e2 WHERE e2.sid > s.id)""")
+
+        self.assertIsNone(EagerAggregationGenerator().generate(query))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from postbound.qal import base, expressions, predicates, relalg
+
+from src.utils.key_analysis import KeyAnalysis, StaticKeyCatalog
+
+
+class KeyAnalysisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tab_s = base.TableReference("students", "s")
+        self.col_s_id = base.ColumnReference("id", self.tab_s)
+        self.col_s_major = base.ColumnReference("major", self.tab_s)
+        self.tab_e = base.TableReference("exams", "e")
+        self.col_e_id = base.ColumnReference("id", self.tab_e)
+        self.col_e_sid = base.ColumnReference("sid", self.tab_e)
+
+        self.scan_s = relalg.Relation(self.tab_s, [self.col_s_id, self.col_s_major])
+        self.scan_e = relalg.Relation(self.tab_e, [self.col_e_id, self.col_e_sid])
+        self.key_analysis = KeyAnalysis(StaticKeyCatalog({"students": [["id"]], "exams": [["id"]]}))
+
+    def test_key_of_single_table(self):
+        self.assertTrue(self.key_analysis.is_unique(self.scan_s, [self.col_s_id]))
+        self.assertFalse(self.key_analysis.is_unique(self.scan_s, [self.col_s_major]))
+
+    def test_key_through_join(self):
+        join = relalg.ThetaJoin(self.scan_s, self.scan_e,
+                                predicates.as_predicate(self.col_s_id, expressions.LogicalSqlOperators.Equal,
+                                                        self.col_e_sid))
+
+        # Ein Student kann mehrere Prüfungen haben, jede Prüfung gehört aber zu genau einem Studenten
+        self.assertFalse(self.key_analysis.is_unique(join, [self.col_s_id]))
+        self.assertTrue(self.key_analysis.is_unique(join, [self.col_e_id]))
+
+    def test_key_by_constant(self):
+        cross_product = relalg.CrossProduct(self.scan_s, self.scan_e)
+        selection = relalg.Selection(cross_product,
+                                     predicates.as_predicate(self.col_s_id, expressions.LogicalSqlOperators.Equal, 1))
+
+        self.assertTrue(self.key_analysis.is_unique(selection, [self.col_e_id]))
+        self.assertFalse(self.key_analysis.is_unique(cross_product, [self.col_e_id]))
+
+
+if __name__ == '__main__':
+    unittest.main()
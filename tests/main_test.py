@@ -0,0 +1,168 @@
+import argparse
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from src.execution.benchmark_harness import BenchmarkHarness
+from src.execution.result_digest import ResultDigest
+from src.main import RESULT_COLUMNS, execute_and_compare, rewrite_directory, run_normal
+from src.utils.disk_cache import DiskCache
+
+
+class PostgresInterfaceStandIn:
+
+    def prewarm_tables(self, tables):
+        pass
+
+
+class VerifierStandIn:
+    """
+    Returns the same result for every query, so that the original and the rewritten queries always match.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query):
+        self.queries.append(query)
+        return ResultDigest(1, "digest")
+
+
+class ContextStandIn:
+    """
+    Provides the parts of the BenchmarkContext used by the "normal" mode without a database connection.
+    """
+
+    def __init__(self, directory: str, use_pipeline: bool):
+        self.args = argparse.Namespace(strategy="unnest", bottom_up=False, cte_materialization="default",
+                                       key_source=None, cache_dir=os.path.join(directory, "cache"), cache_size_mb=1,
+                                       bypass_cache=True, workers=1, pipeline_depth=2, prepare=False, timeout=None)
+        self.use_pipeline = use_pipeline
+        self.postgres_interface = PostgresInterfaceStandIn()
+        self.harness = BenchmarkHarness()
+        self.verifier = VerifierStandIn()
+        self.disk_cache = DiskCache(self.args.cache_dir, enabled=False)
+        self.cost_model = None
+        self.domain_inliner = None
+        self.domain_staging = None
+        self.rewrite_cache = None
+
+    def complete_digest(self, result, compute_digest):
+        return result
+
+
+QUERIES = [("1a.sql", "SELECT s.name FROM students s WHERE s.id = 1"),
+           ("1b.sql", "SELEC s.name FROM students s"),
+           ("1c.sql", "SELECT s.name FROM students s WHERE s.id = 2")]
+
+
+class RunNormalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.working_directory = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        os.makedirs("output")
+
+    def tearDown(self):
+        os.chdir(self.working_directory)
+        self.directory.cleanup()
+
+    def read_results(self):
+        with open(os.path.join("output", "query_execution_times.csv")) as file:
+            return list(csv.DictReader(file))
+
+    def test_failing_task_in_pipeline(self):
+        run_normal(ContextStandIn(self.directory.name, use_pipeline=True), QUERIES)
+
+        rows = self.read_results()
+        self.assertEqual([row["Query Name"] for row in rows], ["1a.sql", "1b.sql", "1c.sql"])
+        self.assertTrue(rows[1]["Error"].startswith("Parsing failed"))
+        self.assertEqual(rows[1]["Original Execution Time"], "")
+        # Die übrigen Anfragen werden trotz des Fehlers gemessen
+        self.assertNotEqual(rows[0]["Original Execution Time"], "")
+        self.assertNotEqual(rows[2]["Original Execution Time"], "")
+
+    def test_failing_task_in_sequential_driver(self):
+        run_normal(ContextStandIn(self.directory.name, use_pipeline=False), QUERIES)
+
+        rows = self.read_results()
+        self.assertEqual([row["Query Name"] for row in rows], ["1a.sql", "1b.sql", "1c.sql"])
+        self.assertTrue(rows[1]["Error"].startswith("Parsing failed"))
+        self.assertNotEqual(rows[2]["Original Execution Time"], "")
+
+    def test_failing_rewrite_keeps_original_measurement(self):
+        context = ContextStandIn(self.directory.name, use_pipeline=False)
+
+        def failing_rewrite():
+            raise ValueError("unsupported subquery")
+
+        row = dict(zip(RESULT_COLUMNS, execute_and_compare(context, "1a.sql", QUERIES[0][1], [], failing_rewrite)))
+
+        self.assertEqual(row["Error"], "Rewrite failed: unsupported subquery")
+        self.assertIsNotNone(row["Original Execution Time"])
+        self.assertEqual(row["Original Rows"], 1)
+        self.assertIsNone(row["Optimized Execution Time"])
+        self.assertEqual(context.verifier.queries, [QUERIES[0][1]])
+
+
+NESTED_QUERY = """SELECT s.name, e.course FROM students s, exams e
+    WHERE s.id = e.sid AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid);"""
+
+
+class RewriteDirectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sql_directory = os.path.join(self.directory.name, "queries")
+        os.makedirs(self.sql_directory)
+        for file_name, query in (("2b.sql", NESTED_QUERY), ("1a.sql", NESTED_QUERY.replace("min", "max")),
+                                 ("10a.sql", "SELEC s.name FROM students s;"), ("notes.txt", "no query")):
+            with open(os.path.join(self.sql_directory, file_name), "w") as file:
+                file.write(query)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_rewrite_directory(self):
+        output_directory = os.path.join(self.directory.name, "rewritten")
+
+        manifest = rewrite_directory(self.sql_directory, output_directory, workers=2)
+
+        self.assertEqual([entry["query"] for entry in manifest["queries"]], ["10a.sql", "1a.sql", "2b.sql"])
+        self.assertEqual((manifest["rewritten"], manifest["failed"]), (2, 1))
+        self.assertEqual(sorted(os.listdir(output_directory)), ["1a.sql", "2b.sql", "manifest.json"])
+        with open(os.path.join(output_directory, "manifest.json")) as file:
+            self.assertEqual(json.load(file)["queries"], manifest["queries"])
+
+        failed = manifest["queries"][0]
+        self.assertEqual(failed["status"], "error")
+        self.assertIsNone(failed["output"])
+        self.assertTrue(failed["error"])
+
+        for entry, aggregate in zip(manifest["queries"][1:], ("max", "min")):
+            self.assertEqual(entry["status"], "ok")
+            self.assertIsNone(entry["error"])
+            self.assertEqual(entry["output"], os.path.join(output_directory, entry["query"]))
+            with open(entry["output"]) as file:
+                self.assertIn(f"{aggregate}(", file.read().lower())
+
+    def test_output_is_deterministic(self):
+        outputs = []
+        for run, workers in enumerate((1, 3)):
+            output_directory = os.path.join(self.directory.name, f"rewritten_{run}")
+            manifest = rewrite_directory(self.sql_directory, output_directory, workers=workers)
+            rewritten_queries = {}
+            for entry in manifest["queries"]:
+                if entry["output"] is not None:
+                    with open(entry["output"]) as file:
+                        rewritten_queries[entry["query"]] = file.read()
+            outputs.append(([(entry["query"], entry["status"]) for entry in manifest["queries"]], rewritten_queries))
+
+        self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,34 @@ import unittest
 
 from postbound.qal import base, expressions, predicates, relalg
 
+from src.optimizer.dependent_join import DependentJoin
 from src.optimizer.optimizer import Optimizer
+from src.optimizer.push_down_manager import PushDownManager
+from src.parser.parser import Parser
+from src.utils.utils import Utils
+
+
+def find_nodes(node: relalg.RelNode, node_type: type) -> list:
+    stack = [node]
+    found_nodes = []
+    while stack:
+        current = stack.pop()
+        if isinstance(current, node_type):
+            found_nodes.append(current)
+        stack.extend(current.children())
+    return found_nodes
+
+
+def domain_names(node: relalg.RelNode) -> set:
+    return {Utils.domain_table(dependent_join.left_input).identifier()
+            for dependent_join in find_nodes(node, DependentJoin)}
+
+
+# Die innere Subquery hängt von e ab, ihre T1 ist der Block der mittleren Subquery
+TWO_LEVEL_QUERY = """SELECT s.name FROM students s
+    WHERE s.year > (SELECT avg(e.grade) FROM exams e
+                    WHERE e.sid = s.id
+                        AND e.grade > (SELECT min(e2.grade) FROM exams e2 WHERE e2.course = e.course))"""
 
 
 class OptimizerTest(unittest.TestCase):
@@ -38,6 +65,110 @@ class OptimizerTest(unittest.TestCase):
         updated_additional_selection = optimizer._update_relalg_structure(additional_selection, input_node=join_node)
         self.assertTrue(self.verify_parent_child_consistency(updated_additional_selection))
 
+    def test_shared_domain_for_same_outer_query(self):
+        query = """SELECT s.name FROM students s
+            WHERE s.year > (SELECT avg(e.grade) FROM exams e WHERE e.sid = s.id)
+                AND s.major = (SELECT min(e2.curriculum) FROM exams e2 WHERE e2.sid = s.id)"""
+
+        result = Optimizer(Utils()).optimize_unnesting(Parser().parse_relalg(query))
+
+        dependent_joins = find_nodes(result, DependentJoin)
+        self.assertEqual(len(dependent_joins), 2)
+        self.assertEqual(domain_names(result), {"d"})
+        self.assertTrue(Utils.same_node(dependent_joins[0].left_input, dependent_joins[1].left_input))
+
+    def test_separate_domain_for_different_outer_query(self):
+        result = Optimizer(Utils()).optimize_unnesting(Parser().parse_relalg(TWO_LEVEL_QUERY))
+
+        self.assertEqual(len(find_nodes(result, DependentJoin)), 2)
+        self.assertEqual(domain_names(result), {"d", "d2"})
+
+    def test_bottom_up_unnests_inner_subquery_first(self):
+        utils = Utils()
+        result = Optimizer(utils).optimize_unnesting(Parser().parse_relalg(TWO_LEVEL_QUERY), bottom_up=True)
+
+        # Die zuerst entschachtelte Subquery erhält die erste Domain d und liegt im dependent-join der äußeren
+        dependent_joins = find_nodes(result, DependentJoin)
+        self.assertEqual(len(dependent_joins), 2)
+        inner_join = next(dependent_join for dependent_join in dependent_joins
+                          if len(find_nodes(dependent_join, DependentJoin)) == 1)
+        outer_join = next(dependent_join for dependent_join in dependent_joins if dependent_join is not inner_join)
+        self.assertEqual(Utils.domain_table(inner_join.left_input).identifier(), "d")
+        self.assertEqual(Utils.domain_table(outer_join.left_input).identifier(), "d2")
+        self.assertIn(inner_join, find_nodes(outer_join.right_input, DependentJoin))
+        self.assertIn("e2", {relation.table.identifier() for relation in find_nodes(inner_join.right_input,
+                                                                                    relalg.Relation)})
+
+        push_down, subquery_roots = PushDownManager(utils).push_down(result, bottom_up=True)
+        self.assertEqual(find_nodes(push_down, DependentJoin), [])
+        self.assertEqual(len(subquery_roots), 2)
+        self.assertFalse(any(scan.subquery.is_dependent() for scan in find_nodes(push_down, relalg.SubqueryScan)))
+
+
+# Die Korrelation über s.year ist eine Bereichsbedingung, die Domain bleibt daher erhalten
+EXISTS_QUERY = """SELECT s.name FROM students s
+    WHERE {operator} (SELECT e.course FROM exams e WHERE e.sid = s.id AND e.grade < s.year)"""
+IN_QUERY = """SELECT s.name FROM students s WHERE s.id {operator} (SELECT e.sid FROM exams e WHERE e.grade < s.year)"""
+
+
+class SemiJoinUnnestingTest(unittest.TestCase):
+
+    def unnest(self, query):
+        return Optimizer(Utils()).optimize_unnesting(Parser().parse_relalg(query))
+
+    def assert_unnested(self, result, join_type):
+        joins = find_nodes(result, join_type)
+        self.assertEqual(len(joins), 1)
+        self.assertIsInstance(joins[0].subquery_node, DependentJoin)
+        self.assertIn("d", {column.table.identifier() for column in joins[0].predicate.itercolumns()})
+        return joins[0]
+
+    def test_exists(self):
+        result = self.unnest(EXISTS_QUERY.format(operator="EXISTS"))
+
+        self.assert_unnested(result, relalg.SemiJoin)
+        self.assertEqual(find_nodes(result, relalg.AntiJoin), [])
+
+    def test_not_exists(self):
+        result = self.unnest(EXISTS_QUERY.format(operator="NOT EXISTS"))
+
+        self.assert_unnested(result, relalg.AntiJoin)
+        self.assertEqual(find_nodes(result, relalg.SemiJoin), [])
+
+    def test_in(self):
+        result = self.unnest(IN_QUERY.format(operator="IN"))
+
+        semi_join = self.assert_unnested(result, relalg.SemiJoin)
+        conjuncts = Utils.split_conjunction(semi_join.predicate)
+        self.assertFalse(any(isinstance(conjunct, predicates.InPredicate) for conjunct in conjuncts))
+        self.assertTrue(any(isinstance(conjunct, predicates.BinaryPredicate)
+                            and {column.name for column in conjunct.itercolumns()} == {"id", "sid"}
+                            for conjunct in conjuncts))
+
+    def test_convert_in_predicate(self):
+        in_predicate = find_nodes(Parser().parse_relalg(IN_QUERY.format(operator="IN")), relalg.SemiJoin)[0].predicate
+        self.assertIsInstance(in_predicate, predicates.InPredicate)
+
+        converted = Optimizer._convert_in_predicate(in_predicate)
+        self.assertIsInstance(converted, predicates.BinaryPredicate)
+        self.assertEqual(converted.operation, expressions.LogicalSqlOperators.Equal)
+        self.assertEqual({str(column) for column in converted.itercolumns()}, {"s.id", "e.sid"})
+
+        other_predicate = predicates.as_predicate(base.ColumnReference("a", base.TableReference("R")),
+                                                  expressions.LogicalSqlOperators.Equal, 1)
+        self.assertIs(Optimizer._convert_in_predicate(other_predicate), other_predicate)
+
+    def test_not_in_is_skipped(self):
+        # NOT IN liefert keine Zeile, sobald die Subquery NULL enthält, NOT EXISTS dagegen schon: Die Subquery
+        # bleibt daher verschachtelt
+        result = self.unnest(IN_QUERY.format(operator="NOT IN"))
+
+        self.assertEqual(find_nodes(result, DependentJoin), [])
+        anti_joins = find_nodes(result, relalg.AntiJoin)
+        self.assertEqual(len(anti_joins), 1)
+        self.assertIsNotNone(anti_joins[0].predicate)
+        self.assertTrue(any(scan.subquery.is_dependent() for scan in find_nodes(result, relalg.SubqueryScan)))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from src.execution.pipeline import pipelined
+
+
+def square(value: int) -> int:
+    return value * value
+
+
+def fail_on_three(value: int) -> int:
+    if value == 3:
+        raise ValueError("cannot rewrite 3")
+    return value
+
+
+class PipelineTest(unittest.TestCase):
+
+    def test_results_in_task_order(self):
+        items = list(pipelined(range(10), square, workers=3, depth=2))
+
+        self.assertEqual([item.task for item in items], list(range(10)))
+        self.assertEqual([item.result for item in items], [value * value for value in range(10)])
+        self.assertTrue(all(item.wait_time >= 0 for item in items))
+
+    def test_error_raised_at_its_task(self):
+        consumed = []
+        with self.assertRaises(ValueError):
+            for item in pipelined(range(6), fail_on_three, workers=2, depth=2):
+                consumed.append(item.result)
+
+        self.assertEqual(consumed, [0, 1, 2])
+
+    def test_depth_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            list(pipelined(range(3), square, depth=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+import unittest
+
+from postbound.qal import base, expressions, predicates, relalg
+
+from src.optimizer.dependent_join import DependentJoin
+from src.optimizer.outer_join import LeftOuterJoin
+from src.optimizer.push_down_manager import PushDownManager
+from src.utils.utils import Utils
+
+
+TAB_T1 = base.TableReference("outer_table", "t1")
+COL_T1_ID = base.ColumnReference("id", TAB_T1)
+TAB_D = Utils.create_domain_table()
+COL_D_ID = base.ColumnReference("id", TAB_D)
+TAB_BASE = base.TableReference("table_0", "r0")
+COL_BASE_ID = base.ColumnReference("id", TAB_BASE)
+
+
+def equal(first_column, second_column):
+    return predicates.as_predicate(first_column, expressions.LogicalSqlOperators.Equal, second_column)
+
+
+def relation(index):
+    table = base.TableReference(f"table_{index}", f"r{index}")
+    column = base.ColumnReference("id", table)
+    return relalg.Relation(table, [column]), column
+
+
+def domain_node():
+    outer_relation = relalg.Relation(TAB_T1, [COL_T1_ID])
+    return relalg.Projection(relalg.Rename(outer_relation, {COL_T1_ID: COL_D_ID}),
+                             [expressions.ColumnExpression(COL_D_ID)])
+
+
+def dependent_node(operators):
+    """
+    Builds the dependent side of a dependent join: the free variable sits in the selection at the bottom, every
+    operator is stacked on top of it.
+    """
+    node = relalg.Selection(relalg.Relation(TAB_BASE, [COL_BASE_ID]), equal(COL_D_ID, COL_BASE_ID))
+    for index, operator in enumerate(operators, start=1):
+        other_relation, other_column = relation(index)
+        if operator == "selection":
+            node = relalg.Selection(node, predicates.as_predicate(COL_BASE_ID, expressions.LogicalSqlOperators.Greater,
+                                                                  index))
+        elif operator == "join":
+            node = relalg.ThetaJoin(node, other_relation, equal(COL_BASE_ID, other_column))
+        elif operator == "right_join":
+            node = relalg.ThetaJoin(other_relation, node, equal(other_column, COL_BASE_ID))
+        elif operator == "semi_join":
+            node = relalg.SemiJoin(node, other_relation, equal(COL_BASE_ID, other_column))
+        elif operator == "outer_join":
+            node = LeftOuterJoin(node, other_relation, predicate=equal(COL_BASE_ID, other_column))
+        else:
+            node = LeftOuterJoin(other_relation, node, predicate=equal(other_column, COL_BASE_ID))
+    return node
+
+
+def dependent_tree(node):
+    outer_relation = relalg.Relation(TAB_T1, [COL_T1_ID])
+    join = relalg.ThetaJoin(outer_relation, DependentJoin(domain_node(), node), equal(COL_D_ID, COL_T1_ID))
+    return relalg.Projection(join, [expressions.ColumnExpression(COL_T1_ID)])
+
+
+def references_domain(node):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        predicate = getattr(current, "predicate", None)
+        columns = list(predicate.itercolumns()) if predicate is not None else []
+        if isinstance(current, relalg.Projection):
+            columns += [column for expression in current.columns for column in expression.itercolumns()]
+        if any(column.table == TAB_D for column in columns):
+            return True
+        stack.extend(current.children())
+    return False
+
+
+def recursive_push_down(node, domain):
+    """
+    Reference for the iterative engine: the recursive push-down before the cursor loop, one rule per recursion level
+    and the cross product with the domain below the last node with free variables.
+    """
+    cross_product = relalg.CrossProduct(left_input=domain.mutate(as_root=True), right_input=node.mutate(as_root=True))
+    if not references_domain(node):
+        return cross_product
+
+    if isinstance(node, relalg.Selection):
+        return node.mutate(as_root=True, input_node=recursive_push_down(node.input_node, domain))
+    if isinstance(node, (relalg.ThetaJoin, relalg.CrossProduct, LeftOuterJoin)):
+        left_has_free_variables = references_domain(node.left_input)
+        right_has_free_variables = references_domain(node.right_input)
+        if left_has_free_variables and right_has_free_variables:
+            return cross_product
+        if right_has_free_variables:
+            if isinstance(node, LeftOuterJoin):
+                return cross_product
+            return node.mutate(as_root=True, right_input=recursive_push_down(node.right_input, domain))
+        return node.mutate(as_root=True, left_input=recursive_push_down(node.left_input, domain))
+    if isinstance(node, (relalg.SemiJoin, relalg.AntiJoin)):
+        if references_domain(node.subquery_node):
+            return cross_product
+        return node.mutate(as_root=True, input_node=recursive_push_down(node.input_node, domain))
+    return cross_product
+
+
+def expected_tree(tree):
+    dependent_join = tree.input_node.right_input
+    reference = recursive_push_down(dependent_join.right_input, dependent_join.left_input)
+    return Utils.replace_input_node(dependent_join.parent_node, dependent_join, reference).root()
+
+
+def iterate_nodes(node):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(current.children())
+
+
+def contains_dependent_join(node):
+    return isinstance(node, DependentJoin) or any(contains_dependent_join(child) for child in node.children())
+
+
+class IterativePushDownTest(unittest.TestCase):
+
+    def push_down(self, tree):
+        # Ohne Elimination der Domain, die erst nach dem Wechsel auf die Schleife hinzugekommen ist
+        push_down, subquery_roots = PushDownManager(Utils(), domain_elimination=False).push_down(tree)
+        self.assertFalse(contains_dependent_join(push_down))
+        self.assertEqual(len(subquery_roots), 1)
+        return push_down
+
+    def test_deep_join_chain(self):
+        operators = ["selection", "join", "right_join", "semi_join", "outer_join"] * 30
+        tree = dependent_tree(dependent_node(operators))
+
+        self.assertEqual(self.push_down(tree), expected_tree(tree))
+
+    def test_dependent_semi_join_subquery(self):
+        # Hängt die Subquery des Semi-Joins von der Domain ab, bleibt der dependent-join über dem Semi-Join
+        other_relation, other_column = relation(1)
+        semi_join = relalg.SemiJoin(other_relation, dependent_node(["selection", "join"]),
+                                    equal(other_column, COL_BASE_ID))
+        tree = dependent_tree(relalg.Selection(semi_join, equal(other_column, COL_D_ID)))
+
+        push_down = self.push_down(tree)
+        self.assertEqual(push_down, expected_tree(tree))
+        selection = push_down.input_node.right_input
+        self.assertIsInstance(selection.input_node, relalg.CrossProduct)
+        self.assertIsInstance(selection.input_node.right_input, relalg.SemiJoin)
+
+    def test_outer_join_right_side(self):
+        # Die rechte Seite eines Left-Outer-Joins darf die Domain nicht erhalten, sonst gingen Tupel der linken Seite
+        # verloren
+        tree = dependent_tree(dependent_node(["selection", "join", "outer_join_right", "selection"]))
+        outer_join = tree.input_node.right_input.right_input.input_node
+        self.assertIsInstance(outer_join, LeftOuterJoin)
+        self.assertIsNone(PushDownManager(Utils())._push_down_rule_join(outer_join, TAB_D))
+
+        push_down = self.push_down(tree)
+        self.assertEqual(push_down, expected_tree(tree))
+        cross_product = push_down.input_node.right_input.input_node
+        self.assertIsInstance(cross_product, relalg.CrossProduct)
+        self.assertIsInstance(cross_product.right_input, LeftOuterJoin)
+
+    def test_outer_join_left_side(self):
+        tree = dependent_tree(dependent_node(["outer_join"]))
+        outer_join = tree.input_node.right_input.right_input
+
+        input_node, rebuild = PushDownManager(Utils())._push_down_rule_join(outer_join, TAB_D)
+        self.assertIs(input_node, outer_join.left_input)
+        self.assertEqual(rebuild(input_node), outer_join)
+        self.assertEqual(self.push_down(tree), expected_tree(tree))
+
+
+class DomainEliminationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.col_t1_year = base.ColumnReference("year", TAB_T1)
+        self.col_d_year = base.ColumnReference("year", TAB_D)
+        self.col_base_year = base.ColumnReference("year", TAB_BASE)
+        self.base_relation = relalg.Relation(TAB_BASE, [COL_BASE_ID, self.col_base_year])
+
+    def two_column_domain(self):
+        outer_relation = relalg.Relation(TAB_T1, [COL_T1_ID, self.col_t1_year])
+        rename = relalg.Rename(outer_relation, {COL_T1_ID: COL_D_ID, self.col_t1_year: self.col_d_year})
+        return relalg.Projection(rename, [expressions.ColumnExpression(COL_D_ID),
+                                          expressions.ColumnExpression(self.col_d_year)])
+
+    def test_equality_correlation(self):
+        selection = relalg.Selection(self.base_relation, equal(COL_D_ID, COL_BASE_ID))
+
+        eliminated = PushDownManager(Utils())._eliminate_domain(selection, domain_node(), TAB_D)
+
+        self.assertIsInstance(eliminated, relalg.Rename)
+        self.assertEqual(eliminated.mapping, {COL_BASE_ID: COL_D_ID})
+        self.assertEqual(eliminated.input_node, self.base_relation)
+
+    def test_equality_correlation_push_down(self):
+        tree = dependent_tree(dependent_node(["join", "selection"]))
+
+        push_down, _ = PushDownManager(Utils()).push_down(tree)
+
+        self.assertFalse(contains_dependent_join(push_down))
+        self.assertFalse(any(Utils.is_domain_node(node) for node in iterate_nodes(push_down.input_node.right_input)))
+        self.assertFalse(any(isinstance(node, relalg.CrossProduct) for node in iterate_nodes(push_down)))
+
+    def test_mixed_correlation_keeps_domain(self):
+        # Die Bereichsbedingung auf d.year lässt sich nicht durch eine Spalte der Subquery ersetzen
+        domain = self.two_column_domain()
+        mixed = predicates.CompoundPredicate.create_and([
+            equal(COL_D_ID, COL_BASE_ID),
+            predicates.as_predicate(self.col_base_year, expressions.LogicalSqlOperators.Greater, self.col_d_year)])
+        self.assertIsNone(PushDownManager(Utils())._eliminate_domain(relalg.Selection(self.base_relation, mixed),
+                                                                     domain, TAB_D))
+
+        # Auch mit nur einer Domain-Spalte bleibt die Domain bei einer zusätzlichen Bereichsbedingung erhalten
+        range_on_equated_column = predicates.CompoundPredicate.create_and([
+            equal(COL_D_ID, COL_BASE_ID),
+            predicates.as_predicate(self.col_base_year, expressions.LogicalSqlOperators.Less, COL_D_ID)])
+        self.assertIsNone(PushDownManager(Utils())._eliminate_domain(
+            relalg.Selection(self.base_relation, range_on_equated_column), domain_node(), TAB_D))
+
+    def test_mixed_correlation_push_down(self):
+        range_predicate = predicates.CompoundPredicate.create_and([
+            equal(COL_D_ID, COL_BASE_ID),
+            predicates.as_predicate(self.col_base_year, expressions.LogicalSqlOperators.Less, COL_D_ID)])
+        tree = dependent_tree(relalg.Selection(self.base_relation, range_predicate))
+
+        push_down, _ = PushDownManager(Utils()).push_down(tree)
+
+        selection = push_down.input_node.right_input
+        self.assertIsInstance(selection, relalg.Selection)
+        self.assertIsInstance(selection.input_node, relalg.CrossProduct)
+        self.assertTrue(Utils.is_domain_node(selection.input_node.left_input))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+import unittest
+
+from postbound.qal import parser, qal
+
+from src.main import optimize_subquery, rewrite_query
+from src.optimizer.optimizer import Optimizer
+from src.optimizer.outer_join import LeftOuterJoin
+from src.optimizer.push_down_manager import PushDownManager
+from src.parser.parser import Parser
+from src.query_generator.query_generator import CTE_MATERIALIZATION_MODES, QueryGenerator
+from src.utils.utils import Utils
+
+
+# Die Literale enthalten die Namen der CTEs, die Unteranfrage im EXISTS greift auf die Domain zu
+CTE_QUERY = """
+    WITH outerquery AS (SELECT s.id AS s_id, s.name AS s_name FROM students AS s
+                        WHERE s.name <> 'outerquery' AND s.major <> 'dup_elim_outerquery'),
+         dup_elim_outerquery AS (SELECT DISTINCT s_id FROM outerquery)
+    SELECT oq.s_name FROM outerquery AS oq
+    WHERE EXISTS (SELECT 1 FROM (SELECT d.s_id FROM dup_elim_outerquery AS d, exams AS e WHERE d.s_id = e.sid)
+                  AS subquery WHERE subquery.s_id = oq.s_id)"""
+
+NESTED_QUERY = """SELECT s.name, e.course FROM students s, exams e
+    WHERE s.id = e.sid AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid AND e2.grade > s.year)"""
+
+
+class CteMaterializationTest(unittest.TestCase):
+
+    def setUp(self):
+        query = parser.parse_query(CTE_QUERY)
+        self.cte_queries = list(query.cte_clause.queries)
+        self.main_query = qal.SqlQuery(select_clause=query.select_clause, from_clause=query.from_clause,
+                                       where_clause=query.where_clause)
+
+    def materialization(self, mode, estimated_rows=10):
+        query_generator = QueryGenerator(Utils(), cte_materialization=mode,
+                                         cardinality_estimator=lambda query: estimated_rows)
+        return {cte_query.target_name: cte_query.materialized
+                for cte_query in query_generator._apply_cte_materialization(self.cte_queries, self.main_query)}
+
+    def test_count_cte_references(self):
+        reference_counts = QueryGenerator._count_cte_references(self.cte_queries, self.main_query)
+
+        self.assertEqual(reference_counts, {"outerquery": 2, "dup_elim_outerquery": 1})
+
+    def test_materialization_modes(self):
+        expected = {"default": {"outerquery": None, "dup_elim_outerquery": None},
+                    "materialized": {"outerquery": True, "dup_elim_outerquery": True},
+                    "not_materialized": {"outerquery": False, "dup_elim_outerquery": False},
+                    "auto": {"outerquery": True, "dup_elim_outerquery": False}}
+        self.assertEqual(set(expected), set(CTE_MATERIALIZATION_MODES))
+
+        for mode in CTE_MATERIALIZATION_MODES:
+            self.assertEqual(self.materialization(mode), expected[mode], mode)
+
+    def test_auto_mode_thresholds(self):
+        # Mehrfach referenzierte CTEs über der Schranke werden nicht materialisiert, ohne Schätzung entscheidet
+        # PostgreSQL
+        self.assertEqual(self.materialization("auto", estimated_rows=10 ** 9),
+                         {"outerquery": False, "dup_elim_outerquery": False})
+        self.assertEqual(self.materialization("auto", estimated_rows=None),
+                         {"outerquery": None, "dup_elim_outerquery": False})
+
+    def test_generated_query_per_mode(self):
+        for mode in ("default", "materialized", "not_materialized"):
+            rewritten_query = optimize_subquery(Parser().parse_relalg(NESTED_QUERY), cte_materialization=mode)
+            materialized = {cte_query.materialized for cte_query in rewritten_query.cte_clause.queries}
+
+            self.assertEqual(materialized, {{"default": None, "materialized": True,
+                                             "not_materialized": False}[mode]}, mode)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            QueryGenerator(Utils(), cte_materialization="always")
+
+
+def normalized_sql(query) -> str:
+    return " ".join(str(query).lower().split())
+
+
+class DomainEliminationTest(unittest.TestCase):
+
+    def test_non_key_equality_column(self):
+        # e.curriculum ist kein Schlüssel: Ohne Domain wird nach e.curriculum statt nach den eindeutigen Werten von
+        # s.major gruppiert. Jede Gruppe wird über die Gleichheit genau einmal an jedes Tupel mit diesem s.major
+        # angebunden, wie zuvor über die Domain, die Duplikate der äußeren Anfrage bleiben daher unverändert
+        query = """SELECT s.name FROM students s
+            WHERE s.year > (SELECT avg(e.grade) FROM exams e WHERE e.curriculum = s.major)"""
+
+        sql = normalized_sql(optimize_subquery(Parser().parse_relalg(query)))
+
+        self.assertNotIn("dup_elim_outerquery", sql)
+        self.assertNotIn("distinct", sql)
+        self.assertIn("group by e.curriculum", sql)
+        self.assertIn("oq.major = subquery.major", sql)
+        self.assertEqual(sql.count("from exams"), 1)
+
+
+SEMI_JOIN_QUERY = """SELECT s.name FROM students s
+    WHERE {operator} (SELECT e.course FROM exams e WHERE e.sid = s.id AND e.grade < s.year)"""
+IN_QUERY = """SELECT s.name FROM students s WHERE s.id {operator} (SELECT e.sid FROM exams e WHERE e.grade < s.year)"""
+
+
+class SemiJoinGenerationTest(unittest.TestCase):
+
+    def generate(self, query):
+        return normalized_sql(optimize_subquery(Parser().parse_relalg(query)))
+
+    def test_exists(self):
+        sql = self.generate(SEMI_JOIN_QUERY.format(operator="EXISTS"))
+
+        self.assertIn("from outerquery as oq where exists (select 1 from (", sql)
+        self.assertNotIn("not exists", sql)
+        self.assertIn("dup_elim_outerquery as d", sql)
+
+    def test_not_exists_over_empty_subquery(self):
+        # Die Subquery steht nur im NOT EXISTS und nicht im FROM der Hauptabfrage: Ist sie leer, bleiben alle Tupel
+        # der äußeren Anfrage erhalten
+        sql = self.generate(SEMI_JOIN_QUERY.format(operator="NOT EXISTS"))
+
+        self.assertIn("from outerquery as oq where not exists (select 1 from (", sql)
+        self.assertEqual(sql.count(") as subquery"), 1)
+        self.assertNotIn("join", sql)
+
+    def test_in(self):
+        sql = self.generate(IN_QUERY.format(operator="IN"))
+
+        self.assertIn("where exists (select 1 from (", sql)
+        self.assertIn("oq.id = subquery.sid", sql)
+        self.assertNotIn(" in (", sql)
+
+    def test_not_in_is_not_rewritten(self):
+        # Die Semantik von NOT IN für NULL-Werte bleibt nur erhalten, wenn die Anfrage unverändert ausgeführt wird
+        query = IN_QUERY.format(operator="NOT IN")
+
+        self.assertIsNone(optimize_subquery(Parser().parse_relalg(query)))
+        self.assertEqual(rewrite_query(query, Parser().parse_relalg(query)), query)
+
+
+SCALAR_AGGREGATE_QUERY = """SELECT s.name FROM students s
+    WHERE s.year > (SELECT {aggregate}(e.grade) FROM exams e WHERE e.sid = s.id AND e.grade < s.year)"""
+
+
+class ScalarAggregateTest(unittest.TestCase):
+
+    def test_outer_join_subquery_root(self):
+        utils = Utils()
+        relalg_query = Parser().parse_relalg(SCALAR_AGGREGATE_QUERY.format(aggregate="count"))
+        unnested = Optimizer(utils).optimize_unnesting(relalg_query)
+
+        _, subquery_roots = PushDownManager(utils).push_down(unnested)
+
+        self.assertEqual(len(subquery_roots), 1)
+        self.assertIsInstance(subquery_roots[0], LeftOuterJoin)
+
+    def test_count_without_group_is_zero(self):
+        # Werte der Domain ohne passende Gruppe bleiben über den LEFT JOIN erhalten, COUNT liefert für sie 0
+        sql = normalized_sql(optimize_subquery(Parser().parse_relalg(SCALAR_AGGREGATE_QUERY.format(aggregate="count"))))
+
+        self.assertIn("left join (", sql)
+        self.assertIn("oq.year > coalesce(subquery.m1, 0)", sql)
+
+    def test_other_aggregates_stay_null(self):
+        for aggregate in ("min", "max", "sum"):
+            sql = normalized_sql(optimize_subquery(Parser().parse_relalg(
+                SCALAR_AGGREGATE_QUERY.format(aggregate=aggregate))))
+
+            self.assertIn("left join (", sql, aggregate)
+            self.assertIn("oq.year > subquery.m1", sql, aggregate)
+            self.assertNotIn("coalesce", sql, aggregate)
+
+    def test_rename_subquery(self):
+        for aggregate, outer_join, expected in (("count", True, "coalesce(subquery.m1, 0)"),
+                                                ("count", False, "subquery.m1"),
+                                                ("min", True, "subquery.m1"),
+                                                ("sum", True, "subquery.m1")):
+            main_query = parser.parse_query(f"""SELECT s.name FROM students AS s
+                WHERE s.year > (SELECT {aggregate}(e.grade) FROM exams AS e)""")
+            sub_query = parser.parse_query(f"SELECT {aggregate}(e.grade) AS m1 FROM exams AS e")
+            agg_mapping = {sub_query.select_clause.targets[0].expression: "m1"}
+
+            renamed = QueryGenerator._rename_subquery(main_query, agg_mapping, sub_query, outer_join=outer_join)
+
+            sql = normalized_sql(renamed)
+            self.assertIn(f"s.year > {expected}", sql, (aggregate, outer_join))
+            self.assertEqual("coalesce" in sql, expected.startswith("coalesce"), (aggregate, outer_join))
+
+
+if __name__ == '__main__':
+    unittest.main()
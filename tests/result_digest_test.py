@@ -0,0 +1,62 @@
+import decimal
+import unittest
+
+from src.execution.result_digest import StreamingResultVerifier, digest_rows
+
+
+class CursorStandIn:
+    """
+    Answers the cursor statements of the verifier like PostgreSQL, with a fixed result for every query.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.position = 0
+        self.chunk = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        if statement.startswith("DECLARE"):
+            self.position = 0
+        elif statement.startswith("FETCH"):
+            size = int(statement.split()[2])
+            self.chunk = self.rows[self.position:self.position + size]
+            self.position += size
+
+    def fetchall(self):
+        return self.chunk
+
+
+class ResultDigestTest(unittest.TestCase):
+
+    def test_digest_is_order_insensitive(self):
+        first = digest_rows([(1, "a"), (2, "b"), (3, None)])
+        second = digest_rows([(3, None), (1, "a"), (2, "b")])
+
+        self.assertEqual(first, second)
+        self.assertEqual(first.rows, 3)
+
+    def test_digest_counts_duplicates(self):
+        self.assertNotEqual(digest_rows([(1,), (1,), (2,)]), digest_rows([(1,), (2,), (2,)]))
+        self.assertNotEqual(digest_rows([(1,), (1,)]), digest_rows([(1,)]))
+
+    def test_numbers_are_compared_by_value(self):
+        self.assertEqual(digest_rows([(1, decimal.Decimal("2.50"))]), digest_rows([(1.0, 2.5)]))
+        self.assertNotEqual(digest_rows([("1",)]), digest_rows([(1,)]))
+
+    def test_streaming_in_chunks(self):
+        rows = [(i, f"title {i}") for i in range(25)]
+        cursor = CursorStandIn(rows)
+        verifier = StreamingResultVerifier(lambda: cursor, chunk_size=10)
+
+        result = verifier.execute("SELECT * FROM title;")
+
+        self.assertEqual(result, digest_rows(reversed(rows)))
+        self.assertEqual(sum(statement.startswith("FETCH") for statement in cursor.statements), 4)
+        self.assertEqual(cursor.statements[1], "DECLARE result_stream NO SCROLL CURSOR FOR SELECT * FROM title;")
+        self.assertEqual(cursor.statements[-1], "COMMIT;")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+from src.utils.rewrite_cache import RewriteCache, fingerprint_query
+
+
+def rewrite(query: str) -> str:
+    # Steht für das Entschachteln: die Literale werden an mehreren Stellen übernommen
+    return f"WITH outerquery AS ({query.rstrip(';')}) SELECT * FROM outerquery WHERE {query.count(chr(39))} > 0;"
+
+
+class RewriteCacheTest(unittest.TestCase):
+
+    def test_fingerprint_ignores_literals(self):
+        first = fingerprint_query("SELECT * FROM title t1 WHERE t1.production_year > 2005 AND t1.title LIKE '%a%'")
+        second = fingerprint_query("select *  from title t1\nwhere t1.production_year > 1990 and t1.title like 'b'")
+
+        self.assertEqual(first.fingerprint, second.fingerprint)
+        self.assertEqual(first.literals, ["2005", "'%a%'"])
+        self.assertEqual(second.literals, ["1990", "'b'"])
+
+    def test_hit_rebinds_literals(self):
+        cache = RewriteCache()
+        rewritten_queries = []
+
+        def counting_rewrite(query: str) -> str:
+            rewritten_queries.append(query)
+            return rewrite(query)
+
+        cache.rewrite("SELECT t.id FROM title t WHERE t.kind = 'movie' AND t.year = 2005", counting_rewrite)
+        result = cache.rewrite("SELECT t.id FROM title t WHERE t.kind = 'episode' AND t.year = 1990", counting_rewrite)
+
+        self.assertEqual(len(rewritten_queries), 1)
+        self.assertEqual(result, rewrite("SELECT t.id FROM title t WHERE t.kind = 'episode' AND t.year = 1990"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = RewriteCache(capacity=1)
+        cache.rewrite("SELECT a FROM r WHERE a = 1", rewrite)
+        cache.rewrite("SELECT b FROM r WHERE b = 1", rewrite)
+        cache.rewrite("SELECT a FROM r WHERE a = 2", rewrite)
+
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 3, "evictions": 2, "size": 1})
+
+    def test_prepared_statement(self):
+        cache = RewriteCache()
+        cache.rewrite("SELECT a FROM r WHERE a = 1 AND b = 'x'", rewrite)
+
+        statement = cache.prepared_statement("SELECT a FROM r WHERE a = 2 AND b = 'y'")
+        self.assertEqual(len(statement.setup), 1)
+        self.assertIn("a = $1 AND b = $2", statement.setup[0])
+        self.assertTrue(statement.execute.endswith("(2, 'y');"))
+
+        statement = cache.prepared_statement("SELECT a FROM r WHERE a = 3 AND b = 'z'")
+        self.assertEqual(statement.setup, [])
+
+    def test_prepared_statement_keeps_ordinals(self):
+        cache = RewriteCache()
+        cache.rewrite("SELECT a, b FROM r WHERE a = 1 ORDER BY 2 LIMIT 10", lambda query: query)
+
+        statement = cache.prepared_statement("SELECT a, b FROM r WHERE a = 5 ORDER BY 2 LIMIT 10")
+        self.assertEqual(statement.setup[0][statement.setup[0].index(" AS ") + 4:],
+                         "SELECT a, b FROM r WHERE a = $1 ORDER BY 2 LIMIT 10;")
+        self.assertTrue(statement.execute.endswith("(5);"))
+
+        # Eine andere Ordinalzahl ergibt ein eigenes Prepared Statement derselben Vorlage
+        statement = cache.prepared_statement("SELECT a, b FROM r WHERE a = 5 ORDER BY 1 LIMIT 10")
+        self.assertEqual(len(statement.setup), 1)
+        self.assertIn("ORDER BY 1 LIMIT 10", statement.setup[0])
+        self.assertEqual(statement.query, "SELECT a, b FROM r WHERE a = 5 ORDER BY 1 LIMIT 10")
+
+    def test_prepared_statement_keeps_select_list_constants(self):
+        cache = RewriteCache()
+        cache.rewrite("SELECT 'movie' AS kind, t.id FROM title t WHERE t.title LIKE 'a%'", lambda query: query)
+
+        statement = cache.prepared_statement("SELECT 'movie' AS kind, t.id FROM title t WHERE t.title LIKE 'b%'")
+        self.assertIn("SELECT 'movie' AS kind, t.id FROM title t WHERE t.title LIKE $1", statement.setup[0])
+        self.assertTrue(statement.execute.endswith("('b%');"))
+
+    def test_prepared_statement_string_against_non_text_column(self):
+        # Der Parameter bleibt ohne Typ, PostgreSQL leitet ihn aus der Spalte ab und wandelt das Literal beim EXECUTE
+        cache = RewriteCache()
+        cache.rewrite("SELECT t.id FROM title t WHERE t.production_year = '2005' AND '1990' < t.production_year "
+                      "AND t.kind_id IN ('1', '2')", rewrite)
+
+        statement = cache.prepared_statement("SELECT t.id FROM title t WHERE t.production_year = '2010' "
+                                             "AND '2000' < t.production_year AND t.kind_id IN ('3', '4')")
+        self.assertIn("t.production_year = $1 AND $2 < t.production_year AND t.kind_id IN ($3, $4)",
+                      statement.setup[0])
+        self.assertNotIn("::", statement.setup[0])
+        self.assertTrue(statement.execute.endswith("('2010', '2000', '3', '4');"))
+
+    def test_evicted_prepared_statements_are_deallocated(self):
+        cache = RewriteCache(capacity=1)
+        cache.rewrite("SELECT a FROM r WHERE a = 1 ORDER BY 1", lambda query: query)
+        cache.prepared_statement("SELECT a FROM r WHERE a = 1 ORDER BY 1")
+        cache.prepared_statement("SELECT a FROM r WHERE a = 1 ORDER BY 2")
+        cache.rewrite("SELECT b FROM r WHERE b = 1", lambda query: query)
+
+        statement = cache.prepared_statement("SELECT b FROM r WHERE b = 2")
+        self.assertEqual(sum(setup.startswith("DEALLOCATE") for setup in statement.setup), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
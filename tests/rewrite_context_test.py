@@ -0,0 +1,39 @@
+import unittest
+
+from postbound.qal import base, expressions, predicates, relalg
+
+from src.utils.rewrite_context import RewriteContext
+
+
+class RewriteContextTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tab_r = base.TableReference("R")
+        self.col_r_a = base.ColumnReference("a", self.tab_r)
+        self.tab_s = base.TableReference("S")
+        self.col_s_a = base.ColumnReference("a", self.tab_s)
+
+        join = relalg.ThetaJoin(relalg.Relation(self.tab_r, [self.col_r_a]),
+                                relalg.Relation(self.tab_s, [self.col_s_a]),
+                                predicates.as_predicate(self.col_r_a, expressions.LogicalSqlOperators.Equal,
+                                                        self.col_s_a))
+        self.projection = relalg.Projection(join, [expressions.ColumnExpression(self.col_r_a)])
+
+    def test_resolve_after_mutation(self):
+        rewrite_context = RewriteContext()
+        join = self.projection.input_node
+        provenance_id = rewrite_context.register(join)
+
+        mutated_projection = self.projection.mutate(targets=(expressions.ColumnExpression(self.col_s_a),))
+        resolved = rewrite_context.resolve(mutated_projection.root())
+
+        self.assertIs(resolved[provenance_id], mutated_projection.input_node)
+        self.assertEqual(rewrite_context.register(mutated_projection.input_node), provenance_id)
+
+    def test_register_requires_predicate(self):
+        with self.assertRaises(ValueError):
+            RewriteContext().register(self.projection)
+
+
+if __name__ == '__main__':
+    unittest.main()
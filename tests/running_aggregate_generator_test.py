@@ -0,0 +1,57 @@
+import unittest
+
+from postbound.qal import parser
+
+from src.query_generator.running_aggregate_generator import RunningAggregateGenerator
+
+
+class RunningAggregateGeneratorTest(unittest.TestCase):
+
+    def generate(self, aggregate: str, correlation: str) -> str:
+        query = parser.parse_query(f"""
+            SELECT t.title FROM title AS t
+            WHERE t.production_year < (SELECT {aggregate}(at_sub.production_year) FROM aka_title AS at_sub
+                                       WHERE {correlation} AND at_sub.kind_id < 4)""")
+        return RunningAggregateGenerator().generate(query)
+
+    def test_strict_operator_orders_domain_first(self):
+        rewritten = self.generate("max", "at_sub.production_year > t.production_year")
+
+        self.assertIn("MAX(m) OVER (ORDER BY key DESC, is_domain DESC)", rewritten)
+        self.assertIn("oq.t_production_year = ra.key", rewritten)
+
+    def test_non_strict_operator_orders_data_first(self):
+        rewritten = self.generate("max", "at_sub.production_year >= t.production_year")
+
+        self.assertIn("ORDER BY key DESC, is_domain ASC", rewritten)
+
+    def test_flipped_operands(self):
+        self.assertIn("ORDER BY key ASC, is_domain DESC",
+                      self.generate("min", "t.production_year > at_sub.production_year"))
+        self.assertIn("ORDER BY key ASC, is_domain ASC",
+                      self.generate("min", "at_sub.production_year <= t.production_year"))
+
+    def test_equality_correlations_partition(self):
+        rewritten = self.generate("max", "at_sub.production_year > t.production_year AND at_sub.movie_id = t.id")
+
+        self.assertIn("PARTITION BY p1 ORDER BY key DESC, is_domain DESC", rewritten)
+        self.assertIn("at_sub.movie_id AS p1", rewritten)
+        self.assertIn("oq.t_id = ra.p1", rewritten)
+
+    def test_avg_as_sum_and_count(self):
+        rewritten = self.generate("avg", "at_sub.production_year > t.production_year")
+
+        self.assertIn("SUM(at_sub.production_year) AS s, COUNT(at_sub.production_year) AS n", rewritten)
+        self.assertIn("NULL AS s, NULL AS n", rewritten)
+        self.assertIn("CAST(SUM(s) OVER (ORDER BY key DESC, is_domain DESC) AS numeric) / "
+                      "NULLIF(SUM(n) OVER (ORDER BY key DESC, is_domain DESC), 0)", rewritten)
+
+    def test_unsupported_shapes(self):
+        self.assertIsNone(self.generate("max", "at_sub.movie_id = t.id"))
+        self.assertIsNone(self.generate("max", "at_sub.production_year > t.production_year "
+                                               "AND at_sub.kind_id < t.kind_id"))
+        self.assertIsNone(self.generate("count", "at_sub.production_year > t.production_year"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import math
+import unittest
+
+from src.execution.stats import estimate_speedup, percentile, summarize
+
+
+class StatsTest(unittest.TestCase):
+
+    def test_percentile(self):
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 50), 2.5)
+        self.assertEqual(percentile([5.0], 95), 5.0)
+        self.assertTrue(math.isnan(percentile([], 50)))
+
+    def test_summary(self):
+        summary = summarize([1.0, 2.0, 3.0, 4.0, 5.0])
+
+        self.assertEqual(summary.samples, 5)
+        self.assertEqual(summary.median, 3.0)
+        self.assertEqual(summary.mean, 3.0)
+        self.assertAlmostEqual(summary.stddev, math.sqrt(2.5))
+        self.assertAlmostEqual(summary.p95, 4.8)
+        # t-Quantil für 4 Freiheitsgrade
+        self.assertAlmostEqual(summary.ci_high - summary.mean, 2.776 * math.sqrt(2.5) / math.sqrt(5))
+        self.assertLess(summary.ci_low, summary.mean)
+
+    def test_single_sample_has_no_interval(self):
+        summary = summarize([2.0])
+
+        self.assertEqual(summary.median, 2.0)
+        self.assertTrue(math.isnan(summary.stddev))
+        self.assertTrue(math.isnan(summary.ci_low))
+
+    def test_speedup_interval_contains_estimate(self):
+        original = [10.0, 10.5, 9.8, 10.2, 10.1]
+        rewritten = [2.0, 2.1, 1.9, 2.05, 2.0]
+
+        estimate = estimate_speedup(original, rewritten)
+
+        self.assertAlmostEqual(estimate.speedup, 10.1 / 2.0)
+        self.assertLessEqual(estimate.ci_low, estimate.speedup)
+        self.assertGreaterEqual(estimate.ci_high, estimate.speedup)
+        self.assertGreater(estimate.ci_low, 4.0)
+        self.assertEqual(estimate, estimate_speedup(original, rewritten))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from src.execution.throughput import ThroughputBenchmark, contention_report
+
+
+class ThroughputTest(unittest.TestCase):
+
+    def setUp(self):
+        # SQLite-Datenbank als lokaler Ersatz für PostgreSQL, jede Verbindung öffnet dieselbe Datei
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "kp.db")
+        with sqlite3.connect(self.path) as connection:
+            connection.execute("CREATE TABLE students (id INTEGER PRIMARY KEY, major TEXT)")
+            connection.executemany("INSERT INTO students VALUES (?, ?)",
+                                   [(i, "CS" if i % 2 else "Math") for i in range(100)])
+
+        self.queries = [("count", "SELECT COUNT(*) FROM students"),
+                        ("majors", "SELECT major, COUNT(*) FROM students GROUP BY major")]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def test_all_queries_executed_on_each_connection(self):
+        benchmark = ThroughputBenchmark(self.connect, connections=3, rounds=2)
+
+        result = benchmark.run("original", self.queries)
+
+        self.assertEqual(result.connections, 3)
+        self.assertEqual(result.executed, 3 * 2 * len(self.queries))
+        self.assertEqual(result.errors, 0)
+        self.assertGreater(result.queries_per_second, 0)
+        self.assertEqual(set(result.mean_latency_by_query), {"count", "majors"})
+        self.assertLessEqual(result.latency_percentiles[50], result.latency_percentiles[99])
+
+    def test_failing_queries_are_counted(self):
+        benchmark = ThroughputBenchmark(self.connect, connections=2)
+
+        result = benchmark.run("rewritten", self.queries + [("broken", "SELECT * FROM missing_table")])
+
+        self.assertEqual(result.executed, 2 * len(self.queries))
+        self.assertEqual(result.errors, 2)
+
+    def test_connection_failure(self):
+        def connect():
+            raise sqlite3.OperationalError("no database")
+
+        with self.assertRaises(RuntimeError):
+            ThroughputBenchmark(connect, connections=2).run("original", self.queries)
+
+    def test_cursor_failure(self):
+        class BrokenConnection:
+            def cursor(self):
+                raise sqlite3.OperationalError("connection lost")
+
+        connections = [self.connect(), BrokenConnection()]
+        benchmark = ThroughputBenchmark(lambda: connections.pop(), connections=2)
+
+        with self.assertRaises(RuntimeError):
+            benchmark.run("original", self.queries)
+
+    def test_contention(self):
+        baseline = ThroughputBenchmark(self.connect, connections=1).run("original", self.queries)
+        report = contention_report(baseline, baseline._replace(connections=2, mean_latency=2 * baseline.mean_latency))
+        self.assertAlmostEqual(report.slowdown, 2.0)
+        self.assertAlmostEqual(report.scaling_efficiency, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
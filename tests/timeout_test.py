@@ -0,0 +1,79 @@
+import threading
+import unittest
+
+from src.execution.benchmark_harness import BenchmarkHarness
+from src.execution.timeout import QueryTimeout, TimeoutGuard, is_query_canceled
+
+
+class QueryCanceled(Exception):
+    sqlstate = "57014"
+
+
+class TimeoutTest(unittest.TestCase):
+
+    def test_client_cancel_after_timeout(self):
+        # Steht für eine Anfrage, die der Server nicht selbst abbricht und erst durch cancel() endet
+        running = threading.Event()
+
+        def execute():
+            if not running.wait(timeout=5):
+                return "finished"
+            raise QueryCanceled("canceling statement due to user request")
+
+        guard = TimeoutGuard(0.05, running.set, grace=0.05)
+
+        with self.assertRaises(QueryTimeout):
+            guard.run(execute)
+        self.assertTrue(running.is_set())
+
+    def test_server_timeout_is_recognized(self):
+        guard = TimeoutGuard(10, lambda: None)
+
+        def execute():
+            try:
+                raise QueryCanceled("canceling statement due to statement timeout")
+            except QueryCanceled as e:
+                raise RuntimeError("query failed") from e
+
+        with self.assertRaises(QueryTimeout):
+            guard.run(execute)
+        self.assertEqual(guard.run(lambda: 42), 42)
+        self.assertFalse(is_query_canceled(ValueError("syntax error")))
+
+    def test_other_errors_are_raised(self):
+        guard = TimeoutGuard(10, lambda: None)
+
+        def execute():
+            raise ValueError("syntax error")
+
+        with self.assertRaises(ValueError):
+            guard.run(execute)
+
+    def test_server_timeout_only_during_execution(self):
+        settings = []
+        guard = TimeoutGuard(2.5, lambda: None, set_timeout=settings.append)
+
+        self.assertEqual(guard.run(lambda: settings[-1]), 2.5)
+        with self.assertRaises(ValueError):
+            guard.run(lambda: int("syntax error"))
+        self.assertEqual(settings, [2.5, None, 2.5, None])
+
+    def test_censored_measurement(self):
+        def execute():
+            raise QueryCanceled("canceling statement due to statement timeout")
+
+        guard = TimeoutGuard(300, lambda: None)
+        repeated = BenchmarkHarness(warmup=0, repetitions=3, timeout_guard=guard).measure(execute)
+        stopped = BenchmarkHarness(warmup=0, repetitions=3, timeout_guard=guard,
+                                   stop_on_timeout=True).measure(execute)
+
+        self.assertEqual(repeated.times, [300, 300, 300])
+        self.assertEqual(repeated.timeouts, 3)
+        self.assertTrue(repeated.censored)
+        self.assertIsNone(repeated.result)
+        self.assertEqual(stopped.times, [300])
+        self.assertTrue(stopped.censored)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from postbound.qal import base, clauses, expressions, parser
+
+from src.query_generator.window_function_generator import WindowFunctionGenerator
+
+
+class WindowFunctionGeneratorTest(unittest.TestCase):
+
+    def window_expressions(self, query):
+        inner_query = query.from_clause.items[0].query
+        return [target.expression for target in inner_query.select_clause.targets
+                if isinstance(target.expression, expressions.WindowExpression)]
+
+    def test_query1(self):
+        query = parser.parse_query("""
+            SELECT s.name, e.course FROM students s, exams e
+            WHERE s.id = e.sid AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid)""")
+
+        result = WindowFunctionGenerator().generate(query)
+
+        self.assertIsNotNone(result)
+        self.assertIsInstance(result.from_clause.items[0], clauses.SubqueryTableSource)
+        window_expressions = self.window_expressions(result)
+        self.assertEqual(len(window_expressions), 1)
+        self.assertEqual(window_expressions[0].partitioning, [
+            expressions.ColumnExpression(base.ColumnReference("sid", base.TableReference("exams", "e")))])
+
+    def test_same_column_correlation(self):
+        # Ohne Gleichheit auf e.sid würden Tupel mit e.sid IS NULL über die NULL-Partition aggregiert
+        unfiltered = parser.parse_query("""
+            SELECT e.course FROM exams e
+            WHERE e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE e2.sid = e.sid)""")
+        joined = parser.parse_query("""
+            SELECT s.name, e.course FROM students s, exams e
+            WHERE s.id = e.sid AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE e2.sid = e.sid)""")
+
+        self.assertIsNone(WindowFunctionGenerator().generate(unfiltered))
+        self.assertIsNotNone(WindowFunctionGenerator().generate(joined))
+
+    def test_filters_must_match(self):
+        matching = parser.parse_query("""
+            SELECT s.name, e.course FROM students s, exams e
+            WHERE s.id = e.sid AND e.curriculum = 'CS'
+                AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid AND e2.curriculum = 'CS')""")
+        outer_only = parser.parse_query("""
+            SELECT s.name, e.course FROM students s, exams e
+            WHERE s.id = e.sid AND e.curriculum = 'CS'
+                AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid)""")
+        inner_only = parser.parse_query("""
+            SELECT s.name, e.course FROM students s, exams e
+            WHERE s.id = e.sid
+                AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid AND e2.curriculum = 'CS')""")
+
+        self.assertIsNotNone(WindowFunctionGenerator().generate(matching))
+        self.assertIsNone(WindowFunctionGenerator().generate(outer_only))
+        self.assertIsNone(WindowFunctionGenerator().generate(inner_only))
+
+    def test_other_predicate_on_table(self):
+        query = parser.parse_query("""
+            SELECT s.name, e.course FROM students s, exams e
+            WHERE s.id = e.sid AND e.curriculum = s.major
+                AND e.grade = (SELECT min(e2.grade) FROM exams e2 WHERE s.id = e2.sid)""")
+
+        self.assertIsNone(WindowFunctionGenerator().generate(query))
+
+    def test_multiplicity_sensitive_aggregates(self):
+        for aggregate in ("count", "sum"):
+            query = parser.parse_query(f"""
+                SELECT s.name, e.course FROM students s, exams e
+                WHERE s.id = e.sid AND e.grade = (SELECT {aggregate}(e2.grade) FROM exams e2 WHERE s.id = e2.sid)""")
+
+            self.assertIsNone(WindowFunctionGenerator().generate(query), aggregate)
+
+
+if __name__ == '__main__':
+    unittest.main()